@@ -1,22 +1,47 @@
 from flask import Flask
 from flask_sqlalchemy import SQLAlchemy
-from flask_migrate import Migrate
 from flask_login import LoginManager
 from config import Config
 
 db = SQLAlchemy()
-migrate = Migrate()
 login = LoginManager()
 login.login_view = 'auth.login'
 login.login_message_category = 'info'
 
+def _init_db(app):
+    db.init_app(app)
+    from app import models
+    from app.services import dashboard, portal_stats, reference_data  # register their session hooks
+
+    from app import commands
+    commands.register(app)
+
+def create_db_app(config_class=Config):
+    """
+    App with only the database and the maintenance commands: no blueprints,
+    login manager, migrations or request hooks. For scripts, cron jobs and
+    workers that just need an app context (``FLASK_APP=app:create_db_app``).
+    """
+    app = Flask(__name__)
+    app.config.from_object(config_class)
+    _init_db(app)
+    return app
+
 def create_app(config_class=Config):
     app = Flask(__name__)
     app.config.from_object(config_class)
+    _init_db(app)
 
-    db.init_app(app)
-    from app import models
-    migrate.init_app(app, db)
+    # Alembic is the slowest import here and only the full app serves `flask db`
+    from flask_migrate import Migrate
+    Migrate(app, db)
+    from app import commands
+    commands.register_db_commands()
+
+    from app.services import images, profiling, query_audit
+    images.init_app(app)
+    query_audit.init_app(app)
+    profiling.init_app(app)
 
     from app.auth import bp as auth_bp
     app.register_blueprint(auth_bp, url_prefix='/auth')
@@ -27,12 +52,15 @@ def create_app(config_class=Config):
     from app.portal import bp as portal_bp
     app.register_blueprint(portal_bp, url_prefix='')
 
+    from app.api import bp as api_bp
+    app.register_blueprint(api_bp, url_prefix='/api')
+
     login.init_app(app)
 
-    from app.models import Users
+    from app.services import user_cache
     @login.user_loader
     def load_user(id):
-        return Users.query.get(int(id))
+        return user_cache.load_user(int(id))
 
     # Root route
     @app.route('/')
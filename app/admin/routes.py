@@ -1,51 +1,27 @@
-from flask import render_template, request, redirect, url_for, flash, current_app
-from flask_login import login_required
-from werkzeug.utils import secure_filename
-import os
+from flask import render_template, request, redirect, url_for, flash, current_app, jsonify, abort, Response, stream_with_context
+from flask_login import current_user, login_required
 from datetime import datetime
+import hmac
+import math
 from app.admin import bp
 from app import db
-from app.models import Contact, Product, Budget, AnalyticalAccount, PurchaseOrder, PurchaseOrderLine, VendorBill, VendorBillLine, Invoice, InvoiceLine, SaleOrder, SaleOrderLine, Users, AutoAnalyticalModel
+from app.models import Contact, Product, Budget, AnalyticalAccount, PurchaseOrder, PurchaseOrderLine, VendorBill, VendorBillLine, Invoice, InvoiceLine, SaleOrder, SaleOrderLine, Users, AutoAnalyticalModel, Payment
+from app.services import analytics_rules, budgeting, conversions, exports, images, imports, line_sync, loading, pagination, payments, profiling, reference_data, search, sequences
+from app.services import dashboard as dashboard_metrics
 from sqlalchemy.exc import IntegrityError
 
-def save_image(file):
-    if file and file.filename:
-        filename = secure_filename(file.filename)
-        # Ensure unique filename to prevent overwrites
-        import uuid
-        name, ext = os.path.splitext(filename)
-        filename = f"{name}_{uuid.uuid4().hex[:8]}{ext}"
-        
-        file_path = os.path.join(current_app.config['UPLOAD_FOLDER'], filename)
-        # Ensure directory exists
-        os.makedirs(os.path.dirname(file_path), exist_ok=True)
-        file.save(file_path)
-        return f"uploads/{filename}"
-    return None
-
 @bp.route('/dashboard')
 @login_required
 def dashboard():
-    portal_drafts_count = PurchaseOrder.query.filter(PurchaseOrder.user_id.isnot(None), PurchaseOrder.status == 'draft').count()
-    sales_drafts_count = SaleOrder.query.filter(SaleOrder.customer_id.isnot(None), SaleOrder.status == 'draft').count()
-    total_po_count = PurchaseOrder.query.count()
-    
-    # Financial Analytics for Admin Dashboard
-    balance_outstanding = db.session.query(db.func.sum(VendorBill.total_amount - VendorBill.amount_paid)).filter(VendorBill.payment_status != 'paid').scalar() or 0
-    total_purchases = db.session.query(db.func.sum(VendorBill.total_amount)).scalar() or 0
+    metrics = dashboard_metrics.get_metrics()
     
-    return render_template('admin/dashboard.html', 
-                           portal_drafts_count=portal_drafts_count,
-                           sales_drafts_count=sales_drafts_count,
-                           total_po_count=total_po_count,
-                           balance_outstanding=balance_outstanding,
-                           total_purchases=total_purchases)
+    return render_template('admin/dashboard.html', **metrics)
 
 @bp.route('/contacts')
 @login_required
 def contacts_list():
-    contacts = Contact.query.filter_by(is_archived=False).all()
-    return render_template('admin/contacts_list.html', contacts=contacts)
+    page = pagination.paginate(Contact.query.filter_by(is_archived=False), Contact.id)
+    return render_template('admin/contacts_list.html', contacts=page.items, page=page)
 
 @bp.route('/contact/new', methods=['GET', 'POST'])
 @login_required
@@ -55,7 +31,7 @@ def contact_new():
             image_url = None
             if 'image' in request.files:
                 file = request.files['image']
-                saved_path = save_image(file)
+                saved_path = images.save_upload(file)
                 if saved_path:
                     image_url = saved_path
 
@@ -93,7 +69,7 @@ def contact_detail(id):
             
             if 'image' in request.files:
                 file = request.files['image']
-                saved_path = save_image(file)
+                saved_path = images.save_upload(file)
                 if saved_path:
                     contact.image_url = saved_path
                     
@@ -108,21 +84,36 @@ def contact_detail(id):
             flash(f'An unexpected error occurred: {str(e)}', 'danger')
     return render_template('admin/contact_form.html', contact=contact)
 
+def _money_form_value(name):
+    # Blank is no amount; anything else must be a plain number
+    raw = (request.form.get(name) or '').strip()
+    if not raw:
+        return None
+    value = float(raw)
+    if not math.isfinite(value):
+        raise ValueError(f"Not an amount: {raw!r}")
+    return value
+
 @bp.route('/products')
 @login_required
 def products_list():
-    products = Product.query.filter_by(is_archived=False).all()
-    return render_template('admin/products_list.html', products=products)
+    page = pagination.paginate(Product.query.filter_by(is_archived=False), Product.id)
+    return render_template('admin/products_list.html', products=page.items, page=page)
 
 @bp.route('/product/new', methods=['GET', 'POST'])
 @login_required
 def product_new():
     if request.method == 'POST':
+        try:
+            sales_price, purchase_price = _money_form_value('sales_price'), _money_form_value('purchase_price')
+        except ValueError:
+            flash('Prices must be numbers, e.g. 1250.50.', 'danger')
+            return render_template('admin/product_form.html', product=None)
         product = Product(
             name=request.form['name'],
             category=request.form.get('category', ''),
-            sales_price=request.form.get('sales_price', ''),
-            purchase_price=request.form.get('purchase_price', '')
+            sales_price=sales_price,
+            purchase_price=purchase_price
         )
         db.session.add(product) 
         db.session.commit()
@@ -135,10 +126,15 @@ def product_new():
 def product_detail(id):
     product = Product.query.get_or_404(id)
     if request.method == 'POST': 
+        try:
+            sales_price, purchase_price = _money_form_value('sales_price'), _money_form_value('purchase_price')
+        except ValueError:
+            flash('Prices must be numbers, e.g. 1250.50.', 'danger')
+            return render_template('admin/product_form.html', product=product)
         product.name = request.form.get('name')
         product.category = request.form.get('category')
-        product.sales_price = request.form.get('sales_price')
-        product.purchase_price = request.form.get('purchase_price')
+        product.sales_price = sales_price
+        product.purchase_price = purchase_price
         db.session.commit()
         flash('Product updated successfully!', 'success')
         return redirect(url_for('admin.products_list'))
@@ -147,8 +143,8 @@ def product_detail(id):
 @bp.route('/analytical-accounts')
 @login_required
 def analytical_accounts_list():
-    accounts = AnalyticalAccount.query.filter_by(is_archived=False).all()
-    return render_template('admin/analytical_accounts_list.html', accounts=accounts)
+    page = pagination.paginate(AnalyticalAccount.query.filter_by(is_archived=False), AnalyticalAccount.id)
+    return render_template('admin/analytical_accounts_list.html', accounts=page.items, page=page)
 
 @bp.route('/analytical-account/new', methods=['GET', 'POST'])
 @login_required
@@ -183,8 +179,8 @@ def analytical_account_detail(id):
 @bp.route('/auto-analytical-models')
 @login_required
 def auto_analytical_models_list():
-    models = AutoAnalyticalModel.query.all()
-    return render_template('admin/auto_analytical_models_list.html', models=models)
+    page = pagination.paginate(AutoAnalyticalModel.query, AutoAnalyticalModel.id)
+    return render_template('admin/auto_analytical_models_list.html', models=page.items, page=page)
 
 @bp.route('/auto-analytical-model/new', methods=['GET', 'POST'])
 @login_required
@@ -204,14 +200,28 @@ def auto_analytical_model_new():
         flash('Auto Analytical Model created successfully!', 'success')
         return redirect(url_for('admin.auto_analytical_models_list'))
     
-    products = Product.query.all()
-    vendors = Contact.query.all()
-    analytical_accounts = AnalyticalAccount.query.all()
+    products = reference_data.products()
+    vendors = reference_data.contacts()
+    analytical_accounts = reference_data.analytical_accounts()
     return render_template('admin/auto_analytical_model_form.html', 
                            products=products, 
                            vendors=vendors, 
                            analytical_accounts=analytical_accounts)
 
+@bp.route('/auto-analytical-model/match')
+@login_required
+def auto_analytical_model_match():
+    account = analytics_rules.resolve_analytics(None, request.args.get('product'), request.args.get('vendor'))
+    return jsonify({'account': account})
+
+@bp.route('/search/<kind>')
+@login_required
+def typeahead(kind):
+    if kind not in search.SEARCHES:
+        abort(404)
+    results = search.typeahead(kind, request.args.get('q'), request.args.get('limit', type=int))
+    return jsonify({'results': results})
+
 @bp.route('/auto-analytical-model/delete/<int:id>')
 @login_required
 def auto_analytical_model_delete(id):
@@ -224,30 +234,35 @@ def auto_analytical_model_delete(id):
 @bp.route('/budgets')
 @login_required
 def budgets_list():
-    budgets = Budget.query.filter_by(is_archived=False).all()
-    return render_template('admin/budgets_list.html', budgets=budgets)
+    page = pagination.paginate(Budget.query.filter_by(is_archived=False), Budget.id)
+    return render_template('admin/budgets_list.html', budgets=page.items, page=page)
 
 @bp.route('/budget/revised')
 @login_required
 def budget_revised():
-    return render_template('admin/budget_vs_actual.html')
+    return budget_vs_actual()
 
 @bp.route('/budget/explanation')
 @login_required
 def budget_explanation():
-    return render_template('admin/budget_achievement_lines.html')
+    return budget_achievement_lines()
 
 @bp.route('/budget/new', methods=['GET', 'POST'])
 @login_required
 def budget_new():
-    analytical_accounts = AnalyticalAccount.query.filter_by(is_archived=False).all()
+    analytical_accounts = reference_data.analytical_accounts()
     if request.method == 'POST':
+        try:
+            total_amount = _money_form_value('total_amount')
+        except ValueError:
+            flash('The budget amount must be a number, e.g. 50000.', 'danger')
+            return render_template('admin/budget_detail.html', budget=None, analytical_accounts=analytical_accounts)
         budget = Budget(
             name=request.form.get('name'),
             period_start=request.form.get('period_start') or None,
             period_end=request.form.get('period_end') or None,
             analytical_account=request.form.get('analytical_account'),
-            total_amount=request.form.get('total_amount'),
+            total_amount=total_amount,
             description=request.form.get('description')
         )
         db.session.add(budget)
@@ -260,13 +275,18 @@ def budget_new():
 @login_required
 def budget_detail(id):
     budget = Budget.query.get_or_404(id)
-    analytical_accounts = AnalyticalAccount.query.filter_by(is_archived=False).all()
+    analytical_accounts = reference_data.analytical_accounts()
     if request.method == 'POST':
+        try:
+            total_amount = _money_form_value('total_amount')
+        except ValueError:
+            flash('The budget amount must be a number, e.g. 50000.', 'danger')
+            return render_template('admin/budget_detail.html', budget=budget, analytical_accounts=analytical_accounts)
         budget.name = request.form.get('name')
         budget.period_start = request.form.get('period_start') or None
         budget.period_end = request.form.get('period_end') or None
         budget.analytical_account = request.form.get('analytical_account')
-        budget.total_amount = request.form.get('total_amount')
+        budget.total_amount = total_amount
         budget.description = request.form.get('description')
         db.session.commit()
         flash('Budget updated successfully!', 'success')
@@ -276,40 +296,33 @@ def budget_detail(id):
 @bp.route('/budget/revised')
 @login_required
 def budget_vs_actual():
-    return render_template('admin/budget_vs_actual.html')
+    rows = budgeting.budget_report()
+    return render_template('admin/budget_vs_actual.html', rows=rows)
 
 @bp.route('/budget/explanation')
 @login_required
 def budget_achievement_lines():
-    return render_template('admin/budget_achievement_lines.html')
+    budget_id = request.args.get('budget_id', type=int)
+    budget = Budget.query.get_or_404(budget_id) if budget_id else None
+    row = budgeting.build_rows([budget])[0] if budget else None
+    lines = budgeting.achievement_lines(budget, row.account_type) if budget else []
+    return render_template('admin/budget_achievement_lines.html', budget=budget, row=row, lines=lines)
 
 @bp.route('/purchase-orders')
 @login_required
 def po_list():
-    purchase_orders = PurchaseOrder.query.filter_by(is_archived=False).all()
-    return render_template('admin/po_list.html', purchase_orders=purchase_orders)
+    page = pagination.paginate(loading.query(PurchaseOrder, 'list').filter_by(is_archived=False), PurchaseOrder.id, PurchaseOrder.order_date)
+    return render_template('admin/po_list.html', purchase_orders=page.items, page=page)
 
 @bp.route('/purchase-order/new', methods=['GET', 'POST'])
 @login_required
 def po_new():
-    vendors = Contact.query.filter_by(is_archived=False).all()
-    analytical_accounts = AnalyticalAccount.query.filter_by(is_archived=False).all()
-    products = Product.query.filter_by(is_archived=False).all()
+    vendors = reference_data.contacts()
+    analytical_accounts = reference_data.analytical_accounts()
     
-    # Generate next serial PO Number
-    last_po = PurchaseOrder.query.order_by(PurchaseOrder.id.desc()).first()
-    if last_po and last_po.order_number and last_po.order_number.startswith('PO'):
-        try:
-            last_num = int(last_po.order_number[2:])
-            order_number = f"PO{last_num + 1:04d}"
-        except ValueError:
-            order_number = "PO0001"
-    else:
-        order_number = "PO0001"
-        
     if request.method == 'POST':
         po = PurchaseOrder(
-            order_number=request.form.get('order_number'),
+            order_number=sequences.next_number('PO'),
             reference=request.form.get('reference'),
             vendor_name=request.form.get('vendor_name'),
             order_date=datetime.strptime(request.form.get('order_date'), '%Y-%m-%d').date() if request.form.get('order_date') else None,
@@ -329,47 +342,27 @@ def po_new():
         db.session.add(po)
         db.session.flush() # Get PO ID
         
-        # Handle Line Items
-        line_products = request.form.getlist('product_name[]')
-        line_analytics = request.form.getlist('budget_analytics[]')
-        line_qtys = request.form.getlist('quantity[]')
-        line_prices = request.form.getlist('unit_price[]')
-        
-        total_amount = 0.0
-        for i in range(len(line_products)):
-            if not line_products[i]: continue
-            qty = float(line_qtys[i] or 0)
-            price = float(line_prices[i] or 0)
-            line_total = qty * price
-            total_amount += line_total
-            
-            line = PurchaseOrderLine(
-                po_id=po.id,
-                product_name=line_products[i],
-                budget_analytics=line_analytics[i],
-                quantity=qty,
-                unit_price=price,
-                total=line_total
-            )
-            db.session.add(line)
-            
-        po.total_amount = total_amount
-        db.session.commit()
-        flash('Purchase Order created successfully!', 'success')
-        return redirect(url_for('admin.po_list'))
+        # Save line items (only changed lines are written)
+        try:
+            lines, by_id = line_sync.parse_lines(request.form, po.vendor_name)
+        except line_sync.LineError as e:
+            db.session.rollback()
+            flash(str(e), 'danger')
+        else:
+            po.total_amount = line_sync.sync_lines(po, lines, by_id).total_amount
+            db.session.commit()
+            flash('Purchase Order created successfully!', 'success')
+            return redirect(url_for('admin.po_list'))
         
-    auto_models = AutoAnalyticalModel.query.filter_by(is_active=True).all()
-    return render_template('admin/po_form.html', po=None, order_number=order_number, 
-                           vendors=vendors, analytical_accounts=analytical_accounts, products=products,
-                           auto_models=auto_models)
+    return render_template('admin/po_form.html', po=None, order_number=sequences.peek_number('PO'), 
+                           vendors=vendors, analytical_accounts=analytical_accounts)
 
 @bp.route('/purchase-order/<int:id>', methods=['GET', 'POST'])
 @login_required
 def po_detail(id):
-    po = PurchaseOrder.query.get_or_404(id)
-    vendors = Contact.query.filter_by(is_archived=False).all()
-    analytical_accounts = AnalyticalAccount.query.filter_by(is_archived=False).all()
-    products = Product.query.filter_by(is_archived=False).all()
+    po = loading.query(PurchaseOrder, 'detail').get_or_404(id)
+    vendors = reference_data.contacts()
+    analytical_accounts = reference_data.analytical_accounts()
 
     if request.method == 'POST':
         # Update header
@@ -390,41 +383,20 @@ def po_detail(id):
         else:
             po.vendor_id = None
         
-        # Clear existing lines and re-add
-        PurchaseOrderLine.query.filter_by(po_id=po.id).delete()
-        
-        line_products = request.form.getlist('product_name[]')
-        line_analytics = request.form.getlist('budget_analytics[]')
-        line_qtys = request.form.getlist('quantity[]')
-        line_prices = request.form.getlist('unit_price[]')
-        
-        total_amount = 0.0
-        for i in range(len(line_products)):
-            if not line_products[i]: continue
-            qty = float(line_qtys[i] or 0)
-            price = float(line_prices[i] or 0)
-            line_total = qty * price
-            total_amount += line_total
-            
-            line = PurchaseOrderLine(
-                po_id=po.id,
-                product_name=line_products[i],
-                budget_analytics=line_analytics[i],
-                quantity=qty,
-                unit_price=price,
-                total=line_total
-            )
-            db.session.add(line)
-            
-        po.total_amount = total_amount
-        db.session.commit()
-        flash('Purchase Order updated successfully!', 'success')
-        return redirect(url_for('admin.po_list'))
+        # Save line items (only changed lines are written)
+        try:
+            lines, by_id = line_sync.parse_lines(request.form, po.vendor_name)
+        except line_sync.LineError as e:
+            db.session.rollback()
+            flash(str(e), 'danger')
+        else:
+            po.total_amount = line_sync.sync_lines(po, lines, by_id).total_amount
+            db.session.commit()
+            flash('Purchase Order updated successfully!', 'success')
+            return redirect(url_for('admin.po_list'))
         
-    auto_models = AutoAnalyticalModel.query.filter_by(is_active=True).all()
     return render_template('admin/po_form.html', po=po, order_number=po.order_number, 
-                           vendors=vendors, analytical_accounts=analytical_accounts, products=products,
-                           auto_models=auto_models)
+                           vendors=vendors, analytical_accounts=analytical_accounts)
 
 @bp.route('/purchase-order/<int:id>/status/<status>')
 @login_required
@@ -441,49 +413,25 @@ def po_update_status(id, status):
 def po_create_bill(id):
     po = PurchaseOrder.query.get_or_404(id)
     
-    # Generate Bill Number
-    last_bill = VendorBill.query.order_by(VendorBill.id.desc()).first()
-    if last_bill and last_bill.bill_number and last_bill.bill_number.startswith('Bill'):
-        try:
-            last_num = int(last_bill.bill_number.split('/')[-1])
-            bill_number = f"Bill/{datetime.now().year}/{last_num + 1:04d}"
-        except (ValueError, IndexError):
-            bill_number = f"Bill/{datetime.now().year}/0001"
-    else:
-        bill_number = f"Bill/{datetime.now().year}/0001"
-        
-    bill = VendorBill(
-        bill_number=bill_number,
-        vendor_name=po.vendor_name,
-        bill_date=datetime.now().date(),
-        reference=po.order_number,
-        total_amount=po.total_amount,
-        po_id=po.id,
-        status='draft'
-    )
-    db.session.add(bill)
-    db.session.flush()
-    
-    for line in po.lines:
-        bill_line = VendorBillLine(
-            bill_id=bill.id,
-            product_name=line.product_name,
-            budget_analytics=line.budget_analytics,
-            quantity=line.quantity,
-            unit_price=line.unit_price,
-            total=line.total
-        )
-        db.session.add(bill_line)
-        
+    bill = conversions.bill_purchase_orders([po])[0]
     db.session.commit()
     flash('Vendor Bill created from Purchase Order!', 'success')
     return redirect(url_for('admin.vendor_bill_detail', id=bill.id))
 
+@bp.route('/purchase-orders/bill', methods=['POST'])
+@login_required
+def po_bill_batch():
+    # Bill the selected purchase orders, or every confirmed one without a bill
+    po_ids = request.form.getlist('po_id[]', type=int) or None
+    bill_ids = conversions.bill_purchase_orders_in_batches(po_ids)
+    flash(f'{len(bill_ids)} vendor bills created from purchase orders.', 'success' if bill_ids else 'info')
+    return redirect(url_for('admin.vendor_bills_list'))
+
 @bp.route('/vendor-bills')
 @login_required
 def vendor_bills_list():
-    bills = VendorBill.query.filter_by(is_archived=False).all()
-    return render_template('admin/vendor_bills_list.html', bills=bills)
+    page = pagination.paginate(loading.query(VendorBill, 'list').filter_by(is_archived=False), VendorBill.id, VendorBill.bill_date)
+    return render_template('admin/vendor_bills_list.html', bills=page.items, page=page)
 
 @bp.route('/vendor-bill/new', methods=['GET', 'POST'])
 @login_required
@@ -494,21 +442,103 @@ def vendor_bill_new():
 @bp.route('/vendor-bill/<int:id>', methods=['GET', 'POST'])
 @login_required
 def vendor_bill_detail(id):
-    bill = VendorBill.query.get_or_404(id)
+    bill = loading.query(VendorBill, 'detail').get_or_404(id)
     if request.method == 'POST':
         # Logic to update bill if needed
         pass
     return render_template('admin/vendor_bill_form.html', bill=bill)
 
+def _payment_form_values():
+    # Raises PaymentError: a blank or mistyped amount must not settle the whole balance
+    amount = payments.parse_amount(request.form.get('amount'))
+    payment_date = datetime.strptime(request.form.get('payment_date'), '%Y-%m-%d').date() if request.form.get('payment_date') else None
+    return amount, payment_date, request.form.get('payment_method', 'bank'), request.form.get('memo')
+
+@bp.route('/export/<kind>.<fmt>')
+@login_required
+def export(kind, fmt):
+    if kind not in exports.EXPORTS or fmt not in exports.FORMATS:
+        abort(404)
+    try:
+        date_from = datetime.strptime(request.args.get('from'), '%Y-%m-%d').date() if request.args.get('from') else None
+        date_to = datetime.strptime(request.args.get('to'), '%Y-%m-%d').date() if request.args.get('to') else None
+    except ValueError:
+        abort(400, description='from/to must be dates in YYYY-MM-DD format')
+    chunks = exports.stream(kind, fmt, date_from=date_from, date_to=date_to)
+    filename = f"{kind}-{datetime.utcnow():%Y%m%d}.{fmt}"
+    return Response(stream_with_context(chunks), mimetype=exports.FORMATS[fmt],
+                    headers={'Content-Disposition': f'attachment; filename="{filename}"'})
+
 @bp.route('/vendor-bill/payment/<int:id>', methods=['GET', 'POST'])
 @login_required
 def payment_detail(id):
-    return render_template('admin/vendor_bill_detail.html')
+    bill = VendorBill.query.get_or_404(id)
+    if request.method == 'POST':
+        try:
+            amount, payment_date, method, memo = _payment_form_values()
+            posted = payments.pay_bills([bill.id], amount, payment_date, method, memo)
+            db.session.commit()
+            flash(f'Payment {posted.payment_number} of {posted.total:,.2f} posted!', 'success')
+            return redirect(url_for('admin.vendor_bill_detail', id=bill.id))
+        except payments.PaymentError as e:
+            db.session.rollback()
+            flash(str(e), 'warning')
+    amount_due = max((bill.total_amount or 0.0) - (bill.amount_paid or 0.0), 0.0)
+    return render_template('admin/vendor_bill_detail.html', bill=bill, amount_due=amount_due,
+                           payment_number=sequences.peek_number(f"PAY/{datetime.utcnow().year}"))
+
+@bp.route('/import', methods=['GET', 'POST'])
+@login_required
+def data_import():
+    kind = request.values.get('kind', 'contacts')
+    if kind not in imports.IMPORTS:
+        abort(404)
+    result = None
+    if request.method == 'POST':
+        file = request.files.get('file')
+        if not file or not file.filename:
+            flash('Choose a CSV file to import.', 'warning')
+        else:
+            dry_run = bool(request.form.get('dry_run'))
+            try:
+                result = imports.import_csv(kind, file.stream, dry_run=dry_run)
+                flash(f"{'Checked' if dry_run else 'Imported'}: {result.inserted} new, {result.updated} updated, "
+                      f"{len(result.errors)} rejected.", 'success' if not result.errors else 'warning')
+            except imports.ImportFileError as e:
+                flash(str(e), 'danger')
+    return render_template('admin/import_form.html', kind=kind, kinds=list(imports.IMPORTS),
+                           columns=list(imports.IMPORTS[kind][3]), result=result)
 
 @bp.route('/payments')
 @login_required
 def payments_list():
-    return render_template('admin/payments_list.html')
+    payment_rows = db.session.query(
+        Payment.payment_number,
+        Payment.payment_type,
+        db.func.min(Payment.payment_date).label('payment_date'),
+        db.func.min(Payment.partner_name).label('partner_name'),
+        db.func.count(db.distinct(Payment.partner_name)).label('partner_count'),
+        db.func.count(Payment.id).label('document_count'),
+        db.func.sum(Payment.amount).label('amount'),
+    ).filter(Payment.status == 'posted').group_by(Payment.payment_number, Payment.payment_type).order_by(db.func.max(Payment.id).desc()).all()
+    return render_template('admin/payments_list.html', payments=payment_rows)
+
+@bp.route('/payments/run', methods=['POST'])
+@login_required
+def payment_run():
+    # Pay the selected bills in full, or every confirmed bill due by the given date
+    bill_ids = request.form.getlist('bill_id[]', type=int)
+    due_before = datetime.strptime(request.form.get('due_before'), '%Y-%m-%d').date() if request.form.get('due_before') else None
+    if not bill_ids:
+        bill_ids = payments.due_bill_ids(due_before)
+    try:
+        posted = payments.pay_bills(bill_ids, None, datetime.utcnow().date(), request.form.get('payment_method', 'bank'), request.form.get('memo'))
+        db.session.commit()
+        flash(f'Payment run {posted.payment_number} settled {len(posted.allocations)} bills for {posted.total:,.2f}.', 'success')
+    except payments.PaymentError as e:
+        db.session.rollback()
+        flash(str(e), 'warning')
+    return redirect(url_for('admin.payments_list'))
 
 @bp.route('/invoices')
 @login_required
@@ -528,38 +558,40 @@ def invoice_detail(id):
 @bp.route('/invoice/pay/<int:id>', methods=['GET', 'POST'])
 @login_required
 def invoice_pay(id):
-    return render_template('admin/invoice_pay.html')
+    invoice = Invoice.query.get_or_404(id)
+    if request.method == 'POST':
+        try:
+            amount, payment_date, method, memo = _payment_form_values()
+            posted = payments.pay_invoices([invoice.id], amount, payment_date, method, memo)
+            db.session.commit()
+            flash(f'Payment {posted.payment_number} of {posted.total:,.2f} received!', 'success')
+            return redirect(url_for('admin.payments_list'))
+        except payments.PaymentError as e:
+            db.session.rollback()
+            flash(str(e), 'warning')
+    amount_due = max((invoice.total_amount or 0.0) - (invoice.paid_amount or 0.0), 0.0)
+    today = datetime.utcnow().date()
+    return render_template('admin/invoice_pay.html', invoice=invoice, amount_due=amount_due, today=today,
+                           payment_number=sequences.peek_number(f"PAY/{today.year}"))
 
 @bp.route('/sale-orders')
 @login_required
 def so_list():
-    sale_orders = SaleOrder.query.filter_by(is_archived=False).all()
-    return render_template('admin/so_list.html', sale_orders=sale_orders)
+    page = pagination.paginate(loading.query(SaleOrder, 'list').filter_by(is_archived=False), SaleOrder.id, SaleOrder.order_date)
+    return render_template('admin/so_list.html', sale_orders=page.items, page=page)
 
 @bp.route('/sale-order/new', methods=['GET', 'POST'])
 @login_required
 def so_new():
-    customers = Users.query.filter_by(role='portal').all()
-    products = Product.query.filter_by(is_archived=False).all()
-    analytical_accounts = AnalyticalAccount.query.filter_by(is_archived=False).all()
+    customers = reference_data.portal_users()
+    analytical_accounts = reference_data.analytical_accounts()
     
-    # Generate next serial SO Number
-    last_so = SaleOrder.query.order_by(SaleOrder.id.desc()).first()
-    if last_so and last_so.order_number and last_so.order_number.startswith('SO'):
-        try:
-            last_num = int(last_so.order_number[2:])
-            order_number = f"SO{last_num + 1:04d}"
-        except ValueError:
-            order_number = "SO0001"
-    else:
-        order_number = "SO0001"
-        
     if request.method == 'POST':
         customer_id = request.form.get('customer_id')
         customer = Users.query.get(customer_id)
         
         so = SaleOrder(
-            order_number=request.form.get('order_number'),
+            order_number=sequences.next_number('SO'),
             customer_id=customer_id,
             customer_name=customer.name or customer.username,
             order_date=datetime.strptime(request.form.get('order_date'), '%Y-%m-%d').date() if request.form.get('order_date') else None,
@@ -570,45 +602,27 @@ def so_new():
         db.session.add(so)
         db.session.flush()
         
-        # Handle Line Items
-        line_products = request.form.getlist('product_name[]')
-        line_analytics = request.form.getlist('budget_analytics[]')
-        line_qtys = request.form.getlist('quantity[]')
-        line_prices = request.form.getlist('unit_price[]')
-        
-        total_amount = 0.0
-        for i in range(len(line_products)):
-            if not line_products[i]: continue
-            qty = float(line_qtys[i] or 0)
-            price = float(line_prices[i] or 0)
-            line_total = qty * price
-            total_amount += line_total
-            
-            line = SaleOrderLine(
-                so_id=so.id,
-                product_name=line_products[i],
-                budget_analytics=line_analytics[i] if i < len(line_analytics) else None,
-                quantity=qty,
-                unit_price=price,
-                total=line_total
-            )
-            db.session.add(line)
-            
-        so.total_amount = total_amount
-        db.session.commit()
-        flash('Sale Order created successfully!', 'success')
-        return redirect(url_for('admin.so_list'))
+        # Save line items (only changed lines are written)
+        try:
+            lines, by_id = line_sync.parse_lines(request.form, so.customer_name)
+        except line_sync.LineError as e:
+            db.session.rollback()
+            flash(str(e), 'danger')
+        else:
+            so.total_amount = line_sync.sync_lines(so, lines, by_id).total_amount
+            db.session.commit()
+            flash('Sale Order created successfully!', 'success')
+            return redirect(url_for('admin.so_list'))
         
-    return render_template('admin/so_form.html', so=None, order_number=order_number, 
-                           customers=customers, products=products, analytical_accounts=analytical_accounts)
+    return render_template('admin/so_form.html', so=None, order_number=sequences.peek_number('SO'), 
+                           customers=customers, analytical_accounts=analytical_accounts)
 
 @bp.route('/sale-order/<int:id>', methods=['GET', 'POST'])
 @login_required
 def so_detail(id):
-    so = SaleOrder.query.get_or_404(id)
-    customers = Users.query.filter_by(role='portal').all()
-    products = Product.query.filter_by(is_archived=False).all()
-    analytical_accounts = AnalyticalAccount.query.filter_by(is_archived=False).all()
+    so = loading.query(SaleOrder, 'detail').get_or_404(id)
+    customers = reference_data.portal_users()
+    analytical_accounts = reference_data.analytical_accounts()
 
     if request.method == 'POST':
         customer_id = request.form.get('customer_id')
@@ -619,39 +633,29 @@ def so_detail(id):
         so.order_date = datetime.strptime(request.form.get('order_date'), '%Y-%m-%d').date() if request.form.get('order_date') else None
         so.notes = request.form.get('notes')
         
-        # Clear existing lines and re-add
-        SaleOrderLine.query.filter_by(so_id=so.id).delete()
-        
-        line_products = request.form.getlist('product_name[]')
-        line_analytics = request.form.getlist('budget_analytics[]')
-        line_qtys = request.form.getlist('quantity[]')
-        line_prices = request.form.getlist('unit_price[]')
-        
-        total_amount = 0.0
-        for i in range(len(line_products)):
-            if not line_products[i]: continue
-            qty = float(line_qtys[i] or 0)
-            price = float(line_prices[i] or 0)
-            line_total = qty * price
-            total_amount += line_total
-            
-            line = SaleOrderLine(
-                so_id=so.id,
-                product_name=line_products[i],
-                budget_analytics=line_analytics[i] if i < len(line_analytics) else None,
-                quantity=qty,
-                unit_price=price,
-                total=line_total
-            )
-            db.session.add(line)
-            
-        so.total_amount = total_amount
-        db.session.commit()
-        flash('Sale Order updated successfully!', 'success')
-        return redirect(url_for('admin.so_list'))
+        # Save line items (only changed lines are written)
+        try:
+            lines, by_id = line_sync.parse_lines(request.form, so.customer_name)
+        except line_sync.LineError as e:
+            db.session.rollback()
+            flash(str(e), 'danger')
+        else:
+            so.total_amount = line_sync.sync_lines(so, lines, by_id).total_amount
+            db.session.commit()
+            flash('Sale Order updated successfully!', 'success')
+            return redirect(url_for('admin.so_list'))
         
     return render_template('admin/so_form.html', so=so, order_number=so.order_number, 
-                           customers=customers, products=products, analytical_accounts=analytical_accounts)
+                           customers=customers, analytical_accounts=analytical_accounts)
+
+@bp.route('/sale-orders/invoice', methods=['POST'])
+@login_required
+def so_invoice_batch():
+    # Invoice the selected sale orders, or every confirmed one
+    so_ids = request.form.getlist('so_id[]', type=int) or None
+    invoice_ids = conversions.invoice_sale_orders_in_batches(so_ids)
+    flash(f'{len(invoice_ids)} invoices generated from confirmed sale orders.', 'success' if invoice_ids else 'info')
+    return redirect(url_for('admin.so_list'))
 
 @bp.route('/sale-order/<int:id>/send')
 @login_required
@@ -663,48 +667,33 @@ def so_send(id):
         flash('Sale Order already sent!', 'warning')
         return redirect(url_for('admin.so_detail', id=so.id))
         
-    # Generate Invoice from SO
-    # Generate next serial Invoice Number
-    last_inv = Invoice.query.order_by(Invoice.id.desc()).first()
-    if last_inv and last_inv.invoice_number and last_inv.invoice_number.startswith('INV'):
-        try:
-            last_num = int(last_inv.invoice_number[4:])
-            invoice_number = f"INV-{last_num + 1:04d}"
-        except ValueError:
-            invoice_number = f"INV-{len(Invoice.query.all()) + 1:04d}"
-    else:
-        invoice_number = "INV-0001"
-
-    invoice = Invoice(
-        invoice_number=invoice_number,
-        customer_id=so.customer_id,
-        customer_name=so.customer_name,
-        invoice_date=datetime.utcnow().date(),
-        due_date=datetime.utcnow().date(), # Default to today, can be changed
-        subtotal=so.total_amount,
-        tax_amount=0.0,
-        total_amount=so.total_amount,
-        paid_amount=0.0,
-        balance_due=so.total_amount,
-        status='sent',
-        notes=f"Generated from Sale Order {so.order_number}"
-    )
-    db.session.add(invoice)
-    db.session.flush()
-    
-    # Add Invoice Lines
-    for so_line in so.lines:
-        inv_line = InvoiceLine(
-            invoice_id=invoice.id,
-            product_name=so_line.product_name,
-            quantity=so_line.quantity,
-            unit_price=so_line.unit_price,
-            total=so_line.total
-        )
-        db.session.add(inv_line)
-        
-    so.status = 'sent'
+    # Generate Invoice from SO (lines copied in one INSERT ... SELECT)
+    invoice = conversions.invoice_sale_orders([so])[0]
     db.session.commit()
     
-    flash(f'Sale Order sent successfully! Invoice {invoice_number} generated.', 'success')
+    flash(f'Sale Order sent successfully! Invoice {invoice.invoice_number} generated.', 'success')
     return redirect(url_for('admin.so_detail', id=so.id))
+
+def _require_admin():
+    if current_user.role != 'admin':
+        abort(403)
+
+@bp.route('/_perf')
+@login_required
+def perf():
+    _require_admin()
+    return render_template('admin/perf.html', enabled=current_app.config.get('PROFILING_ENABLED', False),
+                           sample_rate=current_app.config.get('PROFILING_SAMPLE_RATE', profiling.DEFAULT_SAMPLE_RATE),
+                           stats=profiling.summary(), quantiles=profiling.QUANTILES)
+
+@bp.route('/_perf/metrics')
+def perf_metrics():
+    # Scrapers authenticate with PROFILING_METRICS_TOKEN as a bearer token; people with an admin session
+    token = current_app.config.get('PROFILING_METRICS_TOKEN')
+    supplied = request.headers.get('Authorization', '').removeprefix('Bearer ').strip()
+    # Compared as bytes: compare_digest rejects non-ASCII str with a TypeError
+    if not (token and hmac.compare_digest(supplied.encode(), token.encode())):
+        if not current_user.is_authenticated:
+            abort(401)
+        _require_admin()
+    return Response(profiling.prometheus_text(), mimetype='text/plain; version=0.0.4')
@@ -0,0 +1,48 @@
+from flask import current_app, request
+from flask_login import current_user
+import hmac
+from app.api import bp
+from app.services import json_encoding, projections
+
+DEFAULT_PAGE_SIZE = 1000
+MAX_PAGE_SIZE = 10000
+
+
+def _error(status, message):
+    return json_encoding.response({'error': message}, status=status)
+
+
+@bp.before_request
+def authenticate():
+    # Integrations send API_TOKEN as a bearer token; people need an admin session
+    token = current_app.config.get('API_TOKEN')
+    supplied = request.headers.get('Authorization', '').removeprefix('Bearer ').strip()
+    # Compared as bytes: compare_digest rejects non-ASCII str with a TypeError
+    if token and hmac.compare_digest(supplied.encode(), token.encode()):
+        return None
+    if not current_user.is_authenticated:
+        return _error(401, 'authentication required')
+    if current_user.role != 'admin':
+        return _error(403, 'admin access required')
+    return None
+
+
+@bp.route('/<kind>')
+def resource_list(kind):
+    if kind not in projections.RESOURCES:
+        return _error(404, f"unknown resource '{kind}'")
+    limit = request.args.get('limit', current_app.config.get('API_PAGE_SIZE', DEFAULT_PAGE_SIZE), type=int)
+    limit = max(1, min(limit, current_app.config.get('API_MAX_PAGE_SIZE', MAX_PAGE_SIZE)))
+    include_archived = request.args.get('include_archived', '').lower() in ('1', 'true', 'yes')
+    page = projections.page(kind, include_archived=include_archived, per_page=limit)
+    return json_encoding.response({'items': page.items, 'next': page.next_cursor, 'prev': page.prev_cursor})
+
+
+@bp.route('/<kind>/<int:id>')
+def resource_detail(kind, id):
+    if kind not in projections.RESOURCES:
+        return _error(404, f"unknown resource '{kind}'")
+    record = projections.get(kind, id)
+    if record is None:
+        return _error(404, f"{kind} {id} not found")
+    return json_encoding.response(record)
@@ -3,6 +3,7 @@ from flask_login import login_user, logout_user, login_required, current_user
 from app.auth import bp
 from app import db
 from app.models import Users
+from app.services import passwords
 
 @bp.route('/forgot-password')
 def forgot_password():
@@ -23,7 +24,9 @@ def login():
             flash('Please create your new user account first.', 'warning')
             return redirect(url_for('auth.create_user'))
             
-        if user and user.check_password(password):
+        if user and passwords.verify(user, password):
+            if user in db.session.dirty:
+                db.session.commit()  # hash upgraded to the current parameters
             login_user(user)
             # Role-based redirection
             if user.role == 'admin':
@@ -0,0 +1,178 @@
+# CLI commands
+"""
+Maintenance commands registered on ``flask``.
+
+    flask metrics reconcile                recompute the cached admin dashboard metrics
+    flask documents invoice-sale-orders    invoice every confirmed sale order (nightly)
+    flask documents bill-purchase-orders   bill every confirmed, unbilled purchase order
+    flask images thumbnails                generate missing thumbnails for stored uploads
+    flask search reindex                   create missing typeahead indexes and rebuild them
+    flask data import KIND FILE            bulk import contacts, products or analytical accounts from CSV
+    flask data generate --scale N          fill every table with synthetic data (scale 100 = 100k contacts)
+    flask indexes check                    EXPLAIN the hot queries and fail if one stops using its index
+    flask db doctor [--fix]                diff the live schema against the models and add what is missing
+"""
+import click
+from flask.cli import AppGroup
+from app import db
+
+metrics_cli = AppGroup('metrics', help='Admin dashboard metrics.')
+
+
+@metrics_cli.command('reconcile')
+def metrics_reconcile():
+    """Recompute every dashboard metric from the base tables."""
+    from app.services import dashboard
+    values = dashboard.reconcile()
+    db.session.commit()
+    for name, value in values.items():
+        click.echo(f"{name}: {value}")
+
+
+documents_cli = AppGroup('documents', help='Batch document conversion.')
+
+
+@documents_cli.command('invoice-sale-orders')
+@click.option('--batch-size', type=int, default=None, help='Orders per transaction.')
+def invoice_sale_orders(batch_size):
+    """Generate invoices for all confirmed sale orders."""
+    from app.services import conversions
+    invoice_ids = conversions.invoice_sale_orders_in_batches(batch_size=batch_size)
+    click.echo(f"{len(invoice_ids)} invoices generated")
+
+
+@documents_cli.command('bill-purchase-orders')
+@click.option('--batch-size', type=int, default=None, help='Orders per transaction.')
+def bill_purchase_orders(batch_size):
+    """Generate vendor bills for confirmed purchase orders without one."""
+    from app.services import conversions
+    bill_ids = conversions.bill_purchase_orders_in_batches(batch_size=batch_size)
+    click.echo(f"{len(bill_ids)} vendor bills created")
+
+
+images_cli = AppGroup('images', help='Uploaded images.')
+
+
+@images_cli.command('thumbnails')
+def image_thumbnails():
+    """Generate missing thumbnails for every stored upload."""
+    from app.services import images
+    count = images.backfill_thumbnails()
+    click.echo(f"{count} images checked")
+
+
+search_cli = AppGroup('search', help='Typeahead search indexes.')
+
+
+@search_cli.command('reindex')
+def search_reindex():
+    """Create missing typeahead indexes (e.g. after create_all) and rebuild the SQLite ones."""
+    from app.services import search
+    search.ensure_indexes()
+    db.session.commit()
+    click.echo(f"{len(search.SEARCHES)} search indexes ready")
+
+
+data_cli = AppGroup('data', help='Bulk data loading.')
+
+
+@data_cli.command('import')
+@click.argument('kind', type=click.Choice(['contacts', 'products', 'analytical-accounts']))
+@click.argument('file', type=click.File('rb'))
+@click.option('--batch-size', type=int, default=None, help='Rows per transaction.')
+@click.option('--errors', 'errors_file', type=click.File('w'), default=None, help='Write rejected rows here as CSV.')
+@click.option('--dry-run', is_flag=True, help='Validate and roll back.')
+def data_import(kind, file, batch_size, errors_file, dry_run):
+    """Upsert KIND rows from the CSV FILE."""
+    from app.services import imports
+    try:
+        result = imports.import_csv(kind, file, batch_size=batch_size, dry_run=dry_run)
+    except imports.ImportFileError as e:
+        raise click.ClickException(str(e))
+    if errors_file:
+        imports.write_errors(result.errors, errors_file)
+    else:
+        for error in result.errors[:20]:
+            click.echo(f"row {error.row}: {error.message}", err=True)
+    prefix = 'dry run: ' if dry_run else ''
+    click.echo(f"{prefix}{result.inserted} inserted, {result.updated} updated, {len(result.errors)} rejected")
+
+
+@data_cli.command('generate')
+@click.option('--scale', type=float, default=1.0, show_default=True,
+              help='Multiple of the base volume (1 = 1k contacts, 2k purchase and 2k sale orders).')
+@click.option('--seed', type=int, default=0, show_default=True, help='Random seed.')
+@click.option('--days', type=int, default=None, help='Spread document dates over this many past days.')
+@click.option('--batch-size', type=int, default=None, help='Documents per INSERT and transaction.')
+def data_generate(scale, seed, days, batch_size):
+    """Write synthetic contacts, products, documents and payments."""
+    from app.services import synthetic
+    result = synthetic.generate(scale, seed=seed, days=days or synthetic.DEFAULT_DAYS, batch_size=batch_size,
+                                echo=click.echo)
+    for table, count in sorted(result.counts.items()):
+        click.echo(f"{table}: {count}")
+    click.echo(f"{sum(result.counts.values())} rows in {result.seconds:.1f}s")
+
+
+indexes_cli = AppGroup('indexes', help='Database indexes.')
+
+
+@indexes_cli.command('check')
+@click.option('--verbose', is_flag=True, help='Print every plan.')
+def indexes_check(verbose):
+    """Check that each hot query's plan uses the index meant for it."""
+    from app.services import query_plans
+    results = query_plans.run()
+    for result in results:
+        click.echo(f"{'ok  ' if result.ok else 'FAIL'} {result.name}: {result.index}")
+        if verbose or not result.ok:
+            click.echo('     ' + result.plan.replace('\n', '\n     '))
+    failed = [result for result in results if not result.ok]
+    if failed:
+        raise click.ClickException(f"{len(failed)} of {len(results)} queries do not use their index")
+
+
+@click.command('doctor')
+@click.option('--fix', is_flag=True, help='Apply every fixable difference in one transaction.')
+@click.option('--sql', is_flag=True, help='Print the statements that --fix would run.')
+def db_doctor(fix, sql):
+    """Check the live schema against the models: missing tables, columns, indexes and foreign keys."""
+    import time
+    from app.services import schema_doctor
+    started = time.perf_counter()
+    issues = schema_doctor.check()
+    click.echo(f"{len(db.metadata.tables)} tables checked in {(time.perf_counter() - started) * 1000:.0f} ms")
+    for issue in issues:
+        fixable = '' if issue.statements else ' (not fixable here)'
+        click.echo(f"{issue.kind:<9}{issue.table}.{issue.name}: {issue.detail}{fixable}")
+        if sql:
+            for statement in issue.statements:
+                click.echo('    ' + statement.strip().replace('\n', '\n    ') + ';')
+    if not issues:
+        click.echo('schema matches the models')
+        return
+    if not fix:
+        hint = 'run with --fix to repair' if any(issue.statements for issue in issues) else 'they need a migration'
+        raise click.ClickException(f"{len(issues)} difference(s); {hint}")
+    try:
+        applied, unfixable = schema_doctor.repair(issues)
+    except Exception as e:
+        raise click.ClickException(f"repair rolled back: {e}")
+    click.echo(f"{len(applied)} difference(s) repaired")
+    if unfixable:
+        raise click.ClickException(f"{len(unfixable)} difference(s) need a migration")
+
+
+def register_db_commands():
+    """Add ``doctor`` to Flask-Migrate's ``flask db`` group (only the full app loads Flask-Migrate)."""
+    from flask_migrate.cli import db as db_cli
+    db_cli.add_command(db_doctor)
+
+
+def register(app):
+    app.cli.add_command(metrics_cli)
+    app.cli.add_command(documents_cli)
+    app.cli.add_command(images_cli)
+    app.cli.add_command(search_cli)
+    app.cli.add_command(data_cli)
+    app.cli.add_command(indexes_cli)
@@ -1,13 +1,95 @@
+import operator
 from datetime import datetime
+from decimal import Decimal, InvalidOperation, ROUND_HALF_UP
+from sqlalchemy import literal
 from werkzeug.security import generate_password_hash, check_password_hash
+from flask import current_app, has_app_context
 from flask_login import UserMixin
 from app import db
 
+
+class Money(db.TypeDecorator):
+    """
+    Amount stored as a BIGINT number of cents.
+
+    Values are rounded half-up to whole cents on the way in and come back as
+    floats in currency units (whole cents divided by 100), so
+    ``sum()``/``+``/``-`` in SQL work on whole numbers and only the final
+    result is scaled. On PostgreSQL (and SQLite
+    databases built by ``create_all``) the columns are BIGINT and that is
+    exact integer arithmetic; SQLite databases upgraded by migration
+    e7a25c9f13b4 keep REAL columns holding whole cents, which stay exact only
+    while values and sums are below 2**53 cents. Arithmetic on money columns
+    keeps this type (``total_amount - amount_paid`` is money, as is
+    ``unit_price * quantity``); ratios of two amounts are plain floats.
+
+    Values that are not numbers raise ``ValueError``; routes validate form
+    input before assigning it.
+    """
+    impl = db.BigInteger
+    cache_ok = True
+
+    _SCALE = Decimal(100)
+
+    class comparator_factory(db.TypeDecorator.Comparator):
+        def _adapt_expression(self, op, other_comparator):
+            other_is_money = isinstance(other_comparator.type, Money)
+            if op in (operator.add, operator.sub):
+                return op, self.type
+            if op in (operator.mul, operator.truediv):
+                return op, (db.Float() if other_is_money else self.type)
+            return super()._adapt_expression(op, other_comparator)
+
+    def coerce_compared_value(self, op, value):
+        # Compared and added values are amounts; factors and divisors are not
+        if op in (operator.mul, operator.truediv, operator.floordiv, operator.mod):
+            return literal(value).type
+        return self
+
+    @classmethod
+    def cents(cls, value):
+        """``value`` as the whole number of cents it is stored as (None for no amount)."""
+        if value is None or value == '':
+            return None
+        try:
+            amount = Decimal(str(value))
+        except InvalidOperation:
+            raise ValueError(f"Not an amount: {value!r}") from None
+        if not amount.is_finite():
+            raise ValueError(f"Not an amount: {value!r}")
+        return int((amount * cls._SCALE).to_integral_value(ROUND_HALF_UP))
+
+    def process_bind_param(self, value, dialect):
+        return self.cents(value)
+
+    def process_result_value(self, value, dialect):
+        if value is None:
+            return None
+        return float(Decimal(value) / self._SCALE)
+
+
+def _active_index(name, *columns, newest_first=None):
+    """
+    Partial index over non-archived rows on ``columns``, followed by
+    ``(newest_first DESC NULLS LAST, id DESC)`` when ``newest_first`` names
+    a date column: the order in which the keyset-paginated lists read them.
+    """
+    ops = {}
+    if newest_first:
+        columns += (newest_first, 'id')
+        ops = {newest_first: 'DESC NULLS LAST', 'id': 'DESC'}
+    # SQLite sorts NULLs first, so an ascending index read backwards already
+    # yields DESC NULLS LAST; the WHERE clauses match how each dialect renders is_archived == False
+    return db.Index(name, *columns, postgresql_ops=ops,
+                    postgresql_where=db.text('is_archived = false'),
+                    sqlite_where=db.text('is_archived = 0'))
+
+
 class Contact(db.Model):
     __tablename__ = 'contacts'
     
     id = db.Column(db.Integer, primary_key=True)
-    name = db.Column(db.String(25), nullable=False)
+    name = db.Column(db.String(25), nullable=False, index=True)  # po_new links vendors by name
     email = db.Column(db.String(255), unique=True, index=True)
     phone = db.Column(db.Numeric(10))
     company = db.Column(db.String(255))
@@ -39,10 +121,10 @@ class Product(db.Model):
     name = db.Column(db.String(128), nullable=False)
     category = db.Column(db.String(128))
     description = db.Column(db.Text)
-    sales_price = db.Column(db.Float)
-    purchase_price = db.Column(db.Float)
-    price = db.Column(db.Float)  # Keep for backward compatibility
-    cost = db.Column(db.Float)   # Keep for backward compatibility
+    sales_price = db.Column(Money)
+    purchase_price = db.Column(Money)
+    price = db.Column(Money)  # Keep for backward compatibility
+    cost = db.Column(Money)   # Keep for backward compatibility
     quantity = db.Column(db.Integer, default=0)
     image_url = db.Column(db.String(255))
     is_archived = db.Column(db.Boolean, default=False)
@@ -89,7 +171,7 @@ class Budget(db.Model):
     period_start = db.Column(db.Date)
     period_end = db.Column(db.Date)
     analytical_account = db.Column(db.String(128))
-    total_amount = db.Column(db.Float)
+    total_amount = db.Column(Money)
     description = db.Column(db.Text)
     is_archived = db.Column(db.Boolean, default=False)
     created_at = db.Column(db.DateTime, default=datetime.utcnow)
@@ -123,7 +205,8 @@ class Users(UserMixin, db.Model):
     created_at = db.Column(db.DateTime, default=datetime.utcnow)
 
     def set_password(self, password):
-        self.password_hash = generate_password_hash(password)
+        method = current_app.config.get('PASSWORD_HASH_METHOD') if has_app_context() else None
+        self.password_hash = generate_password_hash(password, method=method or 'scrypt')
 
     def check_password(self, password):
         return check_password_hash(self.password_hash, password)
@@ -133,6 +216,12 @@ class Users(UserMixin, db.Model):
 
 class PurchaseOrder(db.Model):
     __tablename__ = 'purchase_orders'
+    __table_args__ = (
+        _active_index('ix_purchase_orders_active_list', newest_first='order_date'),
+        _active_index('ix_purchase_orders_user_status', 'user_id', 'status', newest_first='order_date'),
+        _active_index('ix_purchase_orders_vendor_status', 'vendor_id', 'status', newest_first='order_date'),
+        db.Index('ix_purchase_orders_status', 'status'),
+    )
     
     id = db.Column(db.Integer, primary_key=True)
     order_number = db.Column(db.String(50), unique=True)
@@ -140,7 +229,7 @@ class PurchaseOrder(db.Model):
     vendor_name = db.Column(db.String(128), nullable=False)
     order_date = db.Column(db.Date)
     expected_delivery = db.Column(db.Date)
-    total_amount = db.Column(db.Float, default=0.0)
+    total_amount = db.Column(Money, default=0.0)
     status = db.Column(db.String(20), default='draft')  # draft, confirmed, received, cancelled
     notes = db.Column(db.Text)
     user_id = db.Column(db.Integer, db.ForeignKey('users.id'), nullable=True)
@@ -175,12 +264,12 @@ class PurchaseOrderLine(db.Model):
     __tablename__ = 'purchase_order_lines'
     
     id = db.Column(db.Integer, primary_key=True)
-    po_id = db.Column(db.Integer, db.ForeignKey('purchase_orders.id'), nullable=False)
+    po_id = db.Column(db.Integer, db.ForeignKey('purchase_orders.id'), nullable=False, index=True)
     product_name = db.Column(db.String(128))
     budget_analytics = db.Column(db.String(128))
     quantity = db.Column(db.Float, default=1.0)
-    unit_price = db.Column(db.Float, default=0.0)
-    total = db.Column(db.Float, default=0.0)
+    unit_price = db.Column(Money, default=0.0)
+    total = db.Column(Money, default=0.0)
     
     def to_dict(self):
         return {
@@ -194,6 +283,10 @@ class PurchaseOrderLine(db.Model):
 
 class VendorBill(db.Model):
     __tablename__ = 'vendor_bills'
+    __table_args__ = (
+        _active_index('ix_vendor_bills_active_list', newest_first='bill_date'),
+        _active_index('ix_vendor_bills_vendor_payment_status', 'vendor_id', 'payment_status'),
+    )
     
     id = db.Column(db.Integer, primary_key=True)
     bill_number = db.Column(db.String(50), unique=True)
@@ -201,11 +294,11 @@ class VendorBill(db.Model):
     bill_date = db.Column(db.Date)
     due_date = db.Column(db.Date)
     reference = db.Column(db.String(128))
-    total_amount = db.Column(db.Float, default=0.0)
-    amount_paid = db.Column(db.Float, default=0.0)
+    total_amount = db.Column(Money, default=0.0)
+    amount_paid = db.Column(Money, default=0.0)
     status = db.Column(db.String(20), default='draft')  # draft, confirmed, cancelled
     payment_status = db.Column(db.String(20), default='not_paid')  # not_paid, partial, paid
-    po_id = db.Column(db.Integer, db.ForeignKey('purchase_orders.id'), nullable=True)
+    po_id = db.Column(db.Integer, db.ForeignKey('purchase_orders.id'), nullable=True, index=True)
     vendor_id = db.Column(db.Integer, db.ForeignKey('users.id'), nullable=True)
     is_archived = db.Column(db.Boolean, default=False)
     created_at = db.Column(db.DateTime, default=datetime.utcnow)
@@ -222,15 +315,19 @@ class VendorBillLine(db.Model):
     __tablename__ = 'vendor_bill_lines'
     
     id = db.Column(db.Integer, primary_key=True)
-    bill_id = db.Column(db.Integer, db.ForeignKey('vendor_bills.id'), nullable=False)
+    bill_id = db.Column(db.Integer, db.ForeignKey('vendor_bills.id'), nullable=False, index=True)
     product_name = db.Column(db.String(128))
     budget_analytics = db.Column(db.String(128))
     quantity = db.Column(db.Float, default=1.0)
-    unit_price = db.Column(db.Float, default=0.0)
-    total = db.Column(db.Float, default=0.0)
+    unit_price = db.Column(Money, default=0.0)
+    total = db.Column(Money, default=0.0)
 
 class Invoice(db.Model):
     __tablename__ = 'invoices'
+    __table_args__ = (
+        _active_index('ix_invoices_customer_list', 'customer_id', newest_first='invoice_date'),
+        db.Index('ix_invoices_status', 'status'),
+    )
     
     id = db.Column(db.Integer, primary_key=True)
     invoice_number = db.Column(db.String(50), unique=True, nullable=False)
@@ -238,11 +335,11 @@ class Invoice(db.Model):
     customer_name = db.Column(db.String(128), nullable=False)
     invoice_date = db.Column(db.Date, nullable=False)
     due_date = db.Column(db.Date)
-    subtotal = db.Column(db.Float, default=0.0)
-    tax_amount = db.Column(db.Float, default=0.0)
-    total_amount = db.Column(db.Float, default=0.0)
-    paid_amount = db.Column(db.Float, default=0.0)
-    balance_due = db.Column(db.Float, default=0.0)
+    subtotal = db.Column(Money, default=0.0)
+    tax_amount = db.Column(Money, default=0.0)
+    total_amount = db.Column(Money, default=0.0)
+    paid_amount = db.Column(Money, default=0.0)
+    balance_due = db.Column(Money, default=0.0)
     status = db.Column(db.String(20), default='draft')  # draft, sent, paid, partial, overdue, cancelled
     payment_terms = db.Column(db.String(128))
     notes = db.Column(db.Text)
@@ -281,20 +378,22 @@ class InvoiceLine(db.Model):
     __tablename__ = 'invoice_lines'
     
     id = db.Column(db.Integer, primary_key=True)
-    invoice_id = db.Column(db.Integer, db.ForeignKey('invoices.id'), nullable=False)
+    invoice_id = db.Column(db.Integer, db.ForeignKey('invoices.id'), nullable=False, index=True)
     product_name = db.Column(db.String(128), nullable=False)
     description = db.Column(db.Text)
+    budget_analytics = db.Column(db.String(128))
     quantity = db.Column(db.Float, default=1.0)
-    unit_price = db.Column(db.Float, default=0.0)
+    unit_price = db.Column(Money, default=0.0)
     tax_rate = db.Column(db.Float, default=0.0)
-    tax_amount = db.Column(db.Float, default=0.0)
-    total = db.Column(db.Float, default=0.0)
+    tax_amount = db.Column(Money, default=0.0)
+    total = db.Column(Money, default=0.0)
     
     def to_dict(self):
         return {
             'id': self.id,
             'product_name': self.product_name,
             'description': self.description,
+            'budget_analytics': self.budget_analytics,
             'quantity': self.quantity,
             'unit_price': self.unit_price,
             'tax_rate': self.tax_rate,
@@ -304,13 +403,18 @@ class InvoiceLine(db.Model):
 
 class SaleOrder(db.Model):
     __tablename__ = 'sale_orders'
+    __table_args__ = (
+        _active_index('ix_sale_orders_active_list', newest_first='order_date'),
+        _active_index('ix_sale_orders_customer_list', 'customer_id', newest_first='order_date'),
+        db.Index('ix_sale_orders_status', 'status'),
+    )
     
     id = db.Column(db.Integer, primary_key=True)
     order_number = db.Column(db.String(50), unique=True, nullable=False)
     customer_id = db.Column(db.Integer, db.ForeignKey('users.id'), nullable=False)
     customer_name = db.Column(db.String(128), nullable=False)
     order_date = db.Column(db.Date, nullable=False)
-    total_amount = db.Column(db.Float, default=0.0)
+    total_amount = db.Column(Money, default=0.0)
     status = db.Column(db.String(20), default='draft')  # draft, confirmed, sent, cancelled
     notes = db.Column(db.Text)
     is_archived = db.Column(db.Boolean, default=False)
@@ -342,12 +446,12 @@ class SaleOrderLine(db.Model):
     __tablename__ = 'sale_order_lines'
     
     id = db.Column(db.Integer, primary_key=True)
-    so_id = db.Column(db.Integer, db.ForeignKey('sale_orders.id'), nullable=False)
+    so_id = db.Column(db.Integer, db.ForeignKey('sale_orders.id'), nullable=False, index=True)
     product_name = db.Column(db.String(128), nullable=False)
     budget_analytics = db.Column(db.String(128))
     quantity = db.Column(db.Float, default=1.0)
-    unit_price = db.Column(db.Float, default=0.0)
-    total = db.Column(db.Float, default=0.0)
+    unit_price = db.Column(Money, default=0.0)
+    total = db.Column(Money, default=0.0)
     
     def to_dict(self):
         return {
@@ -359,6 +463,74 @@ class SaleOrderLine(db.Model):
             'total': self.total
         }
 
+class Payment(db.Model):
+    __tablename__ = 'payments'
+    
+    id = db.Column(db.Integer, primary_key=True)
+    payment_number = db.Column(db.String(50), index=True, nullable=False)  # shared by every allocation of one payment
+    payment_type = db.Column(db.String(20), nullable=False)  # send (vendor bills), receive (invoices)
+    partner_id = db.Column(db.Integer, db.ForeignKey('users.id'), nullable=True)
+    partner_name = db.Column(db.String(128))
+    bill_id = db.Column(db.Integer, db.ForeignKey('vendor_bills.id'), nullable=True, index=True)
+    invoice_id = db.Column(db.Integer, db.ForeignKey('invoices.id'), nullable=True, index=True)
+    amount = db.Column(Money, nullable=False, default=0.0)
+    payment_date = db.Column(db.Date, nullable=False)
+    payment_method = db.Column(db.String(20), default='bank')  # bank, cash
+    memo = db.Column(db.Text)
+    status = db.Column(db.String(20), default='posted')  # posted, cancelled
+    created_at = db.Column(db.DateTime, default=datetime.utcnow)
+    
+    bill = db.relationship('VendorBill', backref='payments', lazy=True)
+    invoice = db.relationship('Invoice', backref='payments', lazy=True)
+    
+    def __repr__(self):
+        return f'<Payment {self.payment_number}>'
+    
+    def to_dict(self):
+        return {
+            'id': self.id,
+            'payment_number': self.payment_number,
+            'payment_type': self.payment_type,
+            'partner_id': self.partner_id,
+            'partner_name': self.partner_name,
+            'bill_id': self.bill_id,
+            'invoice_id': self.invoice_id,
+            'amount': self.amount,
+            'payment_date': self.payment_date.isoformat() if self.payment_date else None,
+            'payment_method': self.payment_method,
+            'memo': self.memo,
+            'status': self.status
+        }
+
+class Sequence(db.Model):
+    __tablename__ = 'sequences'
+    
+    name = db.Column(db.String(64), primary_key=True)  # PO, PPO, SO, PSO, INV-, Bill/2026, PAY/2026
+    next_value = db.Column(db.BigInteger, nullable=False, default=1)
+    
+    def __repr__(self):
+        return f'<Sequence {self.name}={self.next_value}>'
+
+class DashboardMetric(db.Model):
+    __tablename__ = 'dashboard_metrics'
+
+    name = db.Column(db.String(64), primary_key=True)  # portal_drafts_count, total_purchases, ...
+    value = db.Column(Money, nullable=False, default=0.0)  # amount metrics (balance_outstanding, total_purchases)
+    count = db.Column(db.BigInteger, nullable=False, default=0)  # count metrics (*_count)
+    reconciled_at = db.Column(db.DateTime)
+
+    def __repr__(self):
+        return f'<DashboardMetric {self.name}={self.value}>'
+
+class CacheVersion(db.Model):
+    __tablename__ = 'cache_versions'
+
+    name = db.Column(db.String(64), primary_key=True)  # contacts, products, analytical_accounts, portal_users
+    version = db.Column(db.BigInteger, nullable=False, default=0)
+
+    def __repr__(self):
+        return f'<CacheVersion {self.name}={self.version}>'
+
 class AutoAnalyticalModel(db.Model):
     __tablename__ = 'auto_analytical_models'
     
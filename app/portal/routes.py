@@ -1,8 +1,9 @@
-from flask import render_template, request, redirect, url_for, flash
+from flask import render_template, request, redirect, url_for, flash, jsonify
 from flask_login import login_required, current_user
 from app.portal import bp
 from app import db
 from app.models import PurchaseOrder, PurchaseOrderLine, Contact, Product, AnalyticalAccount, Invoice, Users, SaleOrder, VendorBill, SaleOrderLine
+from app.services import analytics_rules, conversions, line_sync, loading, pagination, portal_stats, reference_data, search, sequences
 from datetime import datetime
 
 @bp.route('/')
@@ -12,71 +13,49 @@ def index():
 @bp.route('/home')
 @login_required
 def home():
-    # Get invoice statistics for the user
-    total_invoices = Invoice.query.filter_by(customer_id=current_user.id, is_archived=False).count()
-    paid_invoices = Invoice.query.filter_by(customer_id=current_user.id, status='paid', is_archived=False).count()
-    unpaid_invoices = Invoice.query.filter_by(customer_id=current_user.id, is_archived=False).filter(Invoice.status.in_(['sent', 'partial', 'overdue'])).count()
-    
-    total_amount_due = db.session.query(db.func.sum(Invoice.balance_due)).filter_by(customer_id=current_user.id, is_archived=False).scalar() or 0
-    total_payments_made = db.session.query(db.func.sum(Invoice.paid_amount)).filter_by(customer_id=current_user.id, is_archived=False).scalar() or 0
-    
-    # Financials for Vendor Perspective
-    # Pending Payments: Amount Admin owes to this vendor (Unpaid Bills)
-    pending_vendor_payments = db.session.query(db.func.sum(VendorBill.total_amount - VendorBill.amount_paid)).filter_by(vendor_id=current_user.id, is_archived=False).filter(VendorBill.payment_status != 'paid').scalar() or 0
-    # Total Sales: Total amount of bills sent by this vendor
-    total_vendor_sales = db.session.query(db.func.sum(VendorBill.total_amount)).filter_by(vendor_id=current_user.id, is_archived=False).scalar() or 0
-    
-    # Active orders from SaleOrder model (Customer perspective)
-    active_sale_orders = SaleOrder.query.filter_by(customer_id=current_user.id, status='sent', is_archived=False).count()
-    # Received POs (Vendor perspective) - Only 'sent' or 'received' status
-    new_purchase_orders = PurchaseOrder.query.filter_by(vendor_id=current_user.id, is_archived=False).filter(PurchaseOrder.status.in_(['sent'])).count()
-    
-    return render_template('portal/user.html', 
-                         total_invoices=total_invoices,
-                         paid_invoices=paid_invoices,
-                         unpaid_invoices=unpaid_invoices,
-                         total_amount_due=total_amount_due,
-                         total_payments_made=total_payments_made,
-                         active_orders=active_sale_orders,
-                         pending_vendor_payments=pending_vendor_payments,
-                         total_vendor_sales=total_vendor_sales,
-                         new_purchase_orders=new_purchase_orders)
+    # Invoice, bill and order figures for the user (cached briefly per user)
+    stats = portal_stats.get_stats(current_user.id)
+    return render_template('portal/user.html', **stats._asdict())
 
 @bp.route('/invoices')
 @login_required
 def invoices_list():
-    # Get all invoices for the current user (lifetime)
-    invoices = Invoice.query.filter_by(customer_id=current_user.id, is_archived=False).order_by(Invoice.invoice_date.desc()).all()
+    # Invoices for the current user (lifetime), one page at a time
+    user_invoices = loading.query(Invoice, 'list').filter_by(customer_id=current_user.id, is_archived=False)
+    page = pagination.paginate(user_invoices, Invoice.id, Invoice.invoice_date)
     
-    # Calculate summary statistics
-    total_invoices = len(invoices)
-    paid_count = sum(1 for inv in invoices if inv.status == 'paid')
-    unpaid_count = sum(1 for inv in invoices if inv.status in ['sent', 'partial', 'overdue'])
-    total_amount = sum(inv.total_amount for inv in invoices)
-    total_paid = sum(inv.paid_amount for inv in invoices)
-    total_due = sum(inv.balance_due for inv in invoices)
+    # Summary statistics over all of the user's invoices, computed in the database
+    total_invoices, paid_count, unpaid_count, total_amount, total_paid, total_due = db.session.query(
+        db.func.count(Invoice.id),
+        db.func.sum(db.case((Invoice.status == 'paid', 1), else_=0)),
+        db.func.sum(db.case((Invoice.status.in_(['sent', 'partial', 'overdue']), 1), else_=0)),
+        db.func.sum(Invoice.total_amount),
+        db.func.sum(Invoice.paid_amount),
+        db.func.sum(Invoice.balance_due),
+    ).filter_by(customer_id=current_user.id, is_archived=False).one()
     
     return render_template('portal/invoice_list.html', 
-                         invoices=invoices,
+                         invoices=page.items,
+                         page=page,
                          total_invoices=total_invoices,
-                         paid_count=paid_count,
-                         unpaid_count=unpaid_count,
-                         total_amount=total_amount,
-                         total_paid=total_paid,
-                         total_due=total_due)
+                         paid_count=paid_count or 0,
+                         unpaid_count=unpaid_count or 0,
+                         total_amount=total_amount or 0,
+                         total_paid=total_paid or 0,
+                         total_due=total_due or 0)
 
 @bp.route('/invoice/<int:invoice_id>')
 @login_required
 def invoice_detail(invoice_id):
-    invoice = Invoice.query.filter_by(id=invoice_id, customer_id=current_user.id).first_or_404()
+    invoice = loading.query(Invoice, 'detail').filter_by(id=invoice_id, customer_id=current_user.id).first_or_404()
     return render_template('portal/invoice_detail.html', invoice=invoice)
 
 @bp.route('/orders')
 @login_required
 def so_list():
     # Get all sale orders for the current user (Purchases from their perspective)
-    orders = SaleOrder.query.filter_by(customer_id=current_user.id, is_archived=False).order_by(SaleOrder.order_date.desc()).all()
-    return render_template('portal/so_list.html', orders=orders)
+    page = pagination.paginate(loading.query(SaleOrder, 'list').filter_by(customer_id=current_user.id, is_archived=False), SaleOrder.id, SaleOrder.order_date)
+    return render_template('portal/so_list.html', orders=page.items, page=page)
 
 @bp.route('/invoice/<int:invoice_id>/pay')
 @login_required
@@ -97,32 +76,30 @@ def payment_history():
 @login_required
 def po_list():
     # Show POs where this user is either the creator (Portal Drafts) -> Only Drafts
-    draft_pos = PurchaseOrder.query.filter_by(user_id=current_user.id, is_archived=False, status='draft').all()
+    draft_page = pagination.paginate(loading.query(PurchaseOrder, 'list').filter_by(user_id=current_user.id, is_archived=False, status='draft'),
+                                     PurchaseOrder.id, PurchaseOrder.order_date, arg_prefix='draft_')
     # Vendor sees orders only when they are SENT by Admin
-    received_pos = PurchaseOrder.query.filter_by(vendor_id=current_user.id, is_archived=False).filter(PurchaseOrder.status.in_(['sent', 'received'])).all()
-    return render_template('portal/po_list.html', draft_pos=draft_pos, received_pos=received_pos)
+    received_page = pagination.paginate(loading.query(PurchaseOrder, 'list').filter_by(vendor_id=current_user.id, is_archived=False).filter(PurchaseOrder.status.in_(['sent', 'received'])),
+                                        PurchaseOrder.id, PurchaseOrder.order_date, arg_prefix='received_')
+    return render_template('portal/po_list.html', draft_pos=draft_page.items, received_pos=received_page.items,
+                           draft_page=draft_page, received_page=received_page)
+
+@bp.route('/search/products')
+@login_required
+def product_typeahead():
+    results = search.typeahead('products', request.args.get('q'), request.args.get('limit', type=int))
+    return jsonify({'results': results})
 
 @bp.route('/purchase-order/new', methods=['GET', 'POST'])
 @login_required
 def po_new():
-    vendors = Contact.query.filter_by(is_archived=False).all()
-    analytical_accounts = AnalyticalAccount.query.filter_by(is_archived=False).all()
-    products = Product.query.filter_by(is_archived=False).all()
+    vendors = reference_data.contacts()
+    analytical_accounts = reference_data.analytical_accounts()
     
     if request.method == 'POST':
-        # Generate next serial PO Number (prefixed with P- for Portal Draft)
-        last_po = PurchaseOrder.query.order_by(PurchaseOrder.id.desc()).first()
-        if last_po and last_po.order_number and last_po.order_number.startswith('PPO'):
-            try:
-                last_num = int(last_po.order_number[3:])
-                order_number = f"PPO{last_num + 1:04d}"
-            except ValueError:
-                order_number = "PPO0001"
-        else:
-            order_number = "PPO0001"
-
+        # Portal drafts are numbered PPO0001, PPO0002, ...
         po = PurchaseOrder(
-            order_number=order_number,
+            order_number=sequences.next_number('PPO'),
             reference=request.form.get('reference'),
             vendor_name=request.form.get('vendor_name'),
             order_date=datetime.strptime(request.form.get('order_date'), '%Y-%m-%d').date() if request.form.get('order_date') else None,
@@ -135,43 +112,26 @@ def po_new():
         db.session.add(po)
         db.session.flush() # Get PO ID
         
-        # Handle Line Items
-        line_products = request.form.getlist('product_name[]')
-        line_analytics = request.form.getlist('budget_analytics[]')
-        line_qtys = request.form.getlist('quantity[]')
-        line_prices = request.form.getlist('unit_price[]')
-        
-        total_amount = 0.0
-        for i in range(len(line_products)):
-            if not line_products[i]: continue
-            qty = float(line_qtys[i] or 0)
-            price = float(line_prices[i] or 0)
-            line_total = qty * price
-            total_amount += line_total
-            
-            line = PurchaseOrderLine(
-                po_id=po.id,
-                product_name=line_products[i],
-                budget_analytics=line_analytics[i],
-                quantity=qty,
-                unit_price=price,
-                total=line_total
-            )
-            db.session.add(line)
-            
-        po.total_amount = total_amount
-        db.session.commit()
-        flash('Purchase Draft created successfully and sent for review!', 'success')
-        return redirect(url_for('portal.po_list'))
+        # Save line items (only changed lines are written)
+        try:
+            lines, by_id = line_sync.parse_lines(request.form, po.vendor_name)
+        except line_sync.LineError as e:
+            db.session.rollback()
+            flash(str(e), 'danger')
+        else:
+            po.total_amount = line_sync.sync_lines(po, lines, by_id).total_amount
+            db.session.commit()
+            flash('Purchase Draft created successfully and sent for review!', 'success')
+            return redirect(url_for('portal.po_list'))
         
     return render_template('portal/po_form.html', po=None, 
-                           vendors=vendors, analytical_accounts=analytical_accounts, products=products)
+                           vendors=vendors, analytical_accounts=analytical_accounts)
 
 @bp.route('/purchase-order/<int:id>', methods=['GET'])
 @login_required
 def po_detail(id):
     # Check if the user is the creator or the vendor
-    po = PurchaseOrder.query.filter(
+    po = loading.query(PurchaseOrder, 'detail').filter(
         (PurchaseOrder.id == id) & 
         ((PurchaseOrder.user_id == current_user.id) | (PurchaseOrder.vendor_id == current_user.id))
     ).first_or_404()
@@ -193,41 +153,10 @@ def po_accept(id):
         flash('Only SENT Purchase Orders can be accepted.', 'warning')
         return redirect(url_for('portal.po_detail', id=po.id))
         
-    # Generate Vendor Bill for Admin
-    last_bill = VendorBill.query.order_by(VendorBill.id.desc()).first()
-    if last_bill and last_bill.bill_number and last_bill.bill_number.startswith('Bill'):
-        try:
-            last_num = int(last_bill.bill_number.split('/')[-1])
-            bill_number = f"Bill/{po.order_number}/{last_num + 1:04d}"
-        except (ValueError, IndexError):
-            bill_number = f"Bill/{po.order_number}/0001"
-    else:
-        bill_number = f"Bill/{po.order_number}/0001"
+    # Generate Vendor Bill for Admin (shares the yearly bill counter)
+    bill_number = f"Bill/{po.order_number}/{sequences.next_value(f'Bill/{datetime.now().year}'):04d}"
         
-    bill = VendorBill(
-        bill_number=bill_number,
-        vendor_name=current_user.name or current_user.username,
-        vendor_id=current_user.id,
-        bill_date=datetime.now().date(),
-        reference=po.order_number,
-        total_amount=po.total_amount,
-        po_id=po.id,
-        status='confirmed' # Automatically confirmed since it's from an accepted PO
-    )
-    db.session.add(bill)
-    db.session.flush()
-    
-    from app.models import VendorBillLine
-    for line in po.lines:
-        bill_line = VendorBillLine(
-            bill_id=bill.id,
-            product_name=line.product_name,
-            budget_analytics=line.budget_analytics,
-            quantity=line.quantity,
-            unit_price=line.unit_price,
-            total=line.total
-        )
-        db.session.add(bill_line)
+    bill = conversions.bill_purchase_orders([po], status='confirmed', vendor=current_user, bill_numbers=[bill_number])[0]
         
     po.status = 'received' # Admin marks as received/processed
     db.session.commit()
@@ -241,29 +170,19 @@ def po_accept(id):
 @login_required
 def sales_orders_list():
     # Show sales orders where the current user is the customer
-    sales_orders = SaleOrder.query.filter_by(customer_id=current_user.id, is_archived=False).order_by(SaleOrder.order_date.desc()).all()
-    return render_template('portal/so_form_list.html', sales_orders=sales_orders)
+    page = pagination.paginate(loading.query(SaleOrder, 'list').filter_by(customer_id=current_user.id, is_archived=False), SaleOrder.id, SaleOrder.order_date)
+    return render_template('portal/so_form_list.html', sales_orders=page.items, page=page)
 
 @bp.route('/sale-order/new', methods=['GET', 'POST'])
 @login_required
 def so_new():
-    products = Product.query.filter_by(is_archived=False).all()
-    analytical_accounts = AnalyticalAccount.query.filter_by(is_archived=False).all()
+    products = reference_data.products()
+    analytical_accounts = reference_data.analytical_accounts()
     
     if request.method == 'POST':
-        # Generate next serial SO Number (prefixed with PSO for Portal Sale Order)
-        last_so = SaleOrder.query.filter(SaleOrder.order_number.like('PSO%')).order_by(SaleOrder.id.desc()).first()
-        if last_so and last_so.order_number and last_so.order_number.startswith('PSO'):
-            try:
-                last_num = int(last_so.order_number[3:])
-                order_number = f"PSO{last_num + 1:04d}"
-            except ValueError:
-                order_number = "PSO0001"
-        else:
-            order_number = "PSO0001"
-
+        # Portal sale orders are numbered PSO0001, PSO0002, ...
         so = SaleOrder(
-            order_number=order_number,
+            order_number=sequences.next_number('PSO'),
             customer_id=current_user.id,
             customer_name=current_user.name or current_user.username,
             order_date=datetime.strptime(request.form.get('order_date'), '%Y-%m-%d').date() if request.form.get('order_date') else datetime.now().date(),
@@ -274,34 +193,17 @@ def so_new():
         db.session.add(so)
         db.session.flush() # Get SO ID
         
-        # Handle Line Items
-        line_products = request.form.getlist('product_name[]')
-        line_analytics = request.form.getlist('budget_analytics[]')
-        line_qtys = request.form.getlist('quantity[]')
-        line_prices = request.form.getlist('unit_price[]')
-        
-        total_amount = 0.0
-        for i in range(len(line_products)):
-            if not line_products[i]: continue
-            qty = float(line_qtys[i] or 0)
-            price = float(line_prices[i] or 0)
-            line_total = qty * price
-            total_amount += line_total
-            
-            line = SaleOrderLine(
-                so_id=so.id,
-                product_name=line_products[i],
-                budget_analytics=line_analytics[i] if i < len(line_analytics) else None,
-                quantity=qty,
-                unit_price=price,
-                total=line_total
-            )
-            db.session.add(line)
-            
-        so.total_amount = total_amount
-        db.session.commit()
-        flash('Sales Draft created successfully and sent for review!', 'success')
-        return redirect(url_for('portal.sales_orders_list'))
+        # Save line items (only changed lines are written)
+        try:
+            lines, by_id = line_sync.parse_lines(request.form, so.customer_name)
+        except line_sync.LineError as e:
+            db.session.rollback()
+            flash(str(e), 'danger')
+        else:
+            so.total_amount = line_sync.sync_lines(so, lines, by_id).total_amount
+            db.session.commit()
+            flash('Sales Draft created successfully and sent for review!', 'success')
+            return redirect(url_for('portal.sales_orders_list'))
         
     return render_template('portal/so_form_create.html', so=None, 
                            products=products, analytical_accounts=analytical_accounts)
@@ -309,5 +211,5 @@ def so_new():
 @bp.route('/sale-order/<int:id>', methods=['GET'])
 @login_required
 def so_detail(id):
-    so = SaleOrder.query.filter_by(id=id, customer_id=current_user.id).first_or_404()
+    so = loading.query(SaleOrder, 'detail').filter_by(id=id, customer_id=current_user.id).first_or_404()
     return render_template('portal/so_form_detail.html', so=so)
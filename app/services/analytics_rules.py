@@ -1 +1,128 @@
 # Analytics rules service logic
+"""
+Server-side evaluation of ``AutoAnalyticalModel`` rules.
+
+Active rules are compiled into an Aho-Corasick automaton over their product
+substrings plus a hash on vendor name, so matching a line costs
+O(len(product_name)) no matter how many rules exist. Rule priority follows
+rule id: the oldest matching rule wins, like the old in-browser scan.
+
+The compiled matcher is cached per process and tagged with the
+``analytics_rules`` version from ``reference_data``, which every insert,
+update or delete of a rule bumps; it is rebuilt when that version moves.
+"""
+from collections import deque
+from threading import Lock
+from app.services import reference_data
+
+
+def _normalize(value):
+    return (value or '').strip().lower()
+
+
+class RuleMatcher:
+    """Compiled, immutable view of a set of auto-analytical rules."""
+
+    def __init__(self, rules):
+        # Trie as parallel lists: goto transitions, failure links, outputs
+        self._goto = [{}]
+        self._fail = [0]
+        # (rule_id, account, required vendor or None) per product pattern
+        self._out = [[]]
+        # Rules without a product pattern: vendor -> (rule_id, account) of the first one
+        self._vendor_only = {}
+        self._size = 0
+
+        for rule in sorted(rules, key=lambda r: r.id):
+            product = _normalize(rule.product_name)
+            vendor = _normalize(rule.vendor_name) or None
+            if not product and not vendor:
+                continue
+            self._size += 1
+            if not product:
+                self._vendor_only.setdefault(vendor, (rule.id, rule.analytical_account_name))
+                continue
+            self._add_pattern(product, (rule.id, rule.analytical_account_name, vendor))
+
+        self._build_failure_links()
+
+    def __len__(self):
+        return self._size
+
+    def _add_pattern(self, pattern, payload):
+        state = 0
+        for char in pattern:
+            nxt = self._goto[state].get(char)
+            if nxt is None:
+                nxt = len(self._goto)
+                self._goto[state][char] = nxt
+                self._goto.append({})
+                self._fail.append(0)
+                self._out.append([])
+            state = nxt
+        self._out[state].append(payload)
+
+    def _build_failure_links(self):
+        queue = deque(self._goto[0].values())
+        while queue:
+            state = queue.popleft()
+            for char, nxt in self._goto[state].items():
+                queue.append(nxt)
+                fallback = self._fail[state]
+                while fallback and char not in self._goto[fallback]:
+                    fallback = self._fail[fallback]
+                target = self._goto[fallback].get(char, 0)
+                self._fail[nxt] = target if target != nxt else 0
+                self._out[nxt] = self._out[nxt] + self._out[self._fail[nxt]]
+
+    def match(self, product_name, vendor_name=None):
+        """Return the analytical account name for a line, or None."""
+        vendor = _normalize(vendor_name) or None
+        best = self._vendor_only.get(vendor) if vendor else None
+
+        text = _normalize(product_name)
+        state = 0
+        for char in text:
+            while state and char not in self._goto[state]:
+                state = self._fail[state]
+            state = self._goto[state].get(char, 0)
+            for rule_id, account, required_vendor in self._out[state]:
+                if required_vendor is not None and required_vendor != vendor:
+                    continue
+                if best is None or rule_id < best[0]:
+                    best = (rule_id, account)
+
+        return best[1] if best else None
+
+
+_cache = {'version': None, 'matcher': None}
+_cache_lock = Lock()
+
+
+def get_matcher():
+    """Return the compiled matcher for the currently active rules."""
+    version = reference_data.version('analytics_rules')
+    matcher = _cache['matcher']
+    if matcher is not None and _cache['version'] == version:
+        return matcher
+
+    with _cache_lock:
+        if _cache['matcher'] is not None and _cache['version'] == version:
+            return _cache['matcher']
+        matcher = RuleMatcher(reference_data.get('analytics_rules'))
+        # Rules changed in this (uncommitted) transaction may still be rolled back
+        if version is not None and not reference_data.is_pending():
+            _cache['matcher'] = matcher
+            _cache['version'] = version
+        return matcher
+
+
+def resolve_analytics(analytics, product_name, partner_name, matcher=None):
+    """Keep an explicitly chosen analytic, otherwise apply the rules."""
+    if analytics:
+        return analytics
+    if not product_name and not partner_name:
+        return None
+    if matcher is None:
+        matcher = get_matcher()
+    return matcher.match(product_name, partner_name)
@@ -1 +1,181 @@
 # Budgeting service logic
+"""
+Budget vs actual computation.
+
+Actuals are aggregated from document lines tagged with ``budget_analytics``:
+vendor bill lines count against expense budgets, invoice lines against income
+budgets, and lines of confirmed (not yet invoiced) sale orders are reported
+separately as ordered amounts. All budgets are resolved in one grouped query.
+"""
+from collections import namedtuple
+from app import db
+from app.models import (Budget, AnalyticalAccount, VendorBill, VendorBillLine,
+                        Invoice, InvoiceLine, SaleOrder, SaleOrderLine)
+
+BILL_EXCLUDED_STATUSES = ('cancelled',)
+INVOICE_EXCLUDED_STATUSES = ('draft', 'cancelled')
+SALE_ORDER_OPEN_STATUSES = ('confirmed',)
+
+BudgetActual = namedtuple('BudgetActual', ['billed', 'invoiced', 'ordered'])
+BudgetActual.__new__.__defaults__ = (0.0, 0.0, 0.0)
+
+BudgetRow = namedtuple('BudgetRow', [
+    'budget', 'account_type', 'budgeted', 'achieved', 'achieved_pct',
+    'to_achieve', 'ordered'
+])
+
+AchievementLine = namedtuple('AchievementLine', [
+    'source', 'document_id', 'document_number', 'document_date',
+    'product_name', 'total'
+])
+
+
+def _source_lines():
+    """UNION ALL of every analytic-tagged line with its document date."""
+    bills = db.select(
+        VendorBillLine.budget_analytics.label('analytics'),
+        VendorBill.bill_date.label('doc_date'),
+        VendorBillLine.total.label('total'),
+        db.literal('bill').label('source'),
+    ).join(VendorBill, VendorBill.id == VendorBillLine.bill_id).where(
+        VendorBillLine.budget_analytics.isnot(None),
+        VendorBill.status.notin_(BILL_EXCLUDED_STATUSES),
+        VendorBill.is_archived.isnot(True),
+    )
+    invoices = db.select(
+        InvoiceLine.budget_analytics.label('analytics'),
+        Invoice.invoice_date.label('doc_date'),
+        InvoiceLine.total.label('total'),
+        db.literal('invoice').label('source'),
+    ).join(Invoice, Invoice.id == InvoiceLine.invoice_id).where(
+        InvoiceLine.budget_analytics.isnot(None),
+        Invoice.status.notin_(INVOICE_EXCLUDED_STATUSES),
+        Invoice.is_archived.isnot(True),
+    )
+    sale_orders = db.select(
+        SaleOrderLine.budget_analytics.label('analytics'),
+        SaleOrder.order_date.label('doc_date'),
+        SaleOrderLine.total.label('total'),
+        db.literal('sale_order').label('source'),
+    ).join(SaleOrder, SaleOrder.id == SaleOrderLine.so_id).where(
+        SaleOrderLine.budget_analytics.isnot(None),
+        SaleOrder.status.in_(SALE_ORDER_OPEN_STATUSES),
+        SaleOrder.is_archived.isnot(True),
+    )
+    return db.union_all(bills, invoices, sale_orders).subquery('budget_lines')
+
+
+def _in_period(date_col):
+    return db.and_(
+        db.or_(Budget.period_start.is_(None), date_col >= Budget.period_start),
+        db.or_(Budget.period_end.is_(None), date_col <= Budget.period_end),
+    )
+
+
+def compute_actuals(budget_ids=None):
+    """
+    Return ``{budget_id: BudgetActual}`` for the given budgets (all budgets
+    when ``budget_ids`` is None). Budgets without matching lines are absent.
+    """
+    lines = _source_lines()
+
+    def source_sum(source):
+        return db.func.coalesce(db.func.sum(
+            db.case((lines.c.source == source, lines.c.total), else_=0)
+        ), 0)
+
+    query = db.select(
+        Budget.id,
+        source_sum('bill'),
+        source_sum('invoice'),
+        source_sum('sale_order'),
+    ).join(lines, db.and_(
+        lines.c.analytics == Budget.analytical_account,
+        _in_period(lines.c.doc_date),
+    )).group_by(Budget.id)
+
+    if budget_ids is not None:
+        if not budget_ids:
+            return {}
+        query = query.where(Budget.id.in_(list(budget_ids)))
+
+    return {
+        row[0]: BudgetActual(float(row[1]), float(row[2]), float(row[3]))
+        for row in db.session.execute(query)
+    }
+
+
+def _account_types(names):
+    if not names:
+        return {}
+    rows = db.session.execute(
+        db.select(AnalyticalAccount.name, AnalyticalAccount.account_type)
+        .where(AnalyticalAccount.name.in_(names))
+    )
+    return {name: account_type for name, account_type in rows}
+
+
+def build_rows(budgets):
+    """Combine budgets with their actuals into report rows."""
+    budgets = list(budgets)
+    actuals = compute_actuals([b.id for b in budgets])
+    account_types = _account_types({b.analytical_account for b in budgets if b.analytical_account})
+
+    rows = []
+    for budget in budgets:
+        actual = actuals.get(budget.id, BudgetActual())
+        account_type = account_types.get(budget.analytical_account) or 'income'
+        achieved = actual.billed if account_type == 'expense' else actual.invoiced
+        budgeted = budget.total_amount or 0.0
+        rows.append(BudgetRow(
+            budget=budget,
+            account_type=account_type,
+            budgeted=budgeted,
+            achieved=achieved,
+            achieved_pct=(achieved / budgeted * 100) if budgeted else None,
+            to_achieve=budgeted - achieved,
+            ordered=actual.ordered,
+        ))
+    return rows
+
+
+def budget_report(include_archived=False):
+    """Report rows for every budget, computed in a single grouped pass."""
+    query = Budget.query
+    if not include_archived:
+        query = query.filter_by(is_archived=False)
+    return build_rows(query.order_by(Budget.period_start.desc(), Budget.id.desc()).all())
+
+
+def achievement_lines(budget, account_type=None):
+    """List the bill or invoice lines that make up a budget's achieved amount."""
+    if account_type is None:
+        account_type = _account_types([budget.analytical_account]).get(budget.analytical_account) or 'income'
+
+    if account_type == 'expense':
+        query = db.select(
+            VendorBill.id, VendorBill.bill_number, VendorBill.bill_date,
+            VendorBillLine.product_name, VendorBillLine.total,
+        ).join(VendorBill, VendorBill.id == VendorBillLine.bill_id).where(
+            VendorBillLine.budget_analytics == budget.analytical_account,
+            VendorBill.status.notin_(BILL_EXCLUDED_STATUSES),
+            VendorBill.is_archived.isnot(True),
+        )
+        date_col, id_col, source = VendorBill.bill_date, VendorBill.id, 'bill'
+    else:
+        query = db.select(
+            Invoice.id, Invoice.invoice_number, Invoice.invoice_date,
+            InvoiceLine.product_name, InvoiceLine.total,
+        ).join(Invoice, Invoice.id == InvoiceLine.invoice_id).where(
+            InvoiceLine.budget_analytics == budget.analytical_account,
+            Invoice.status.notin_(INVOICE_EXCLUDED_STATUSES),
+            Invoice.is_archived.isnot(True),
+        )
+        date_col, id_col, source = Invoice.invoice_date, Invoice.id, 'invoice'
+
+    if budget.period_start:
+        query = query.where(date_col >= budget.period_start)
+    if budget.period_end:
+        query = query.where(date_col <= budget.period_end)
+
+    return [AchievementLine(source, *row) for row in db.session.execute(query.order_by(date_col, id_col))]
@@ -0,0 +1,166 @@
+# Document conversion service logic
+"""
+Turning orders into billing documents: purchase orders into vendor bills and
+sale orders into customer invoices.
+
+Headers are created through the ORM in one flush (so the dashboard and
+portal hooks see them), document numbers are reserved in one round-trip,
+and the lines of every order in the call are copied with a single
+``INSERT ... SELECT``, so converting 500 orders costs a handful of
+statements rather than one flush per line. Callers commit, except for the
+``*_in_batches`` helpers which commit once per batch.
+"""
+from datetime import datetime
+from flask import current_app
+from app import db
+from app.models import (PurchaseOrder, PurchaseOrderLine, VendorBill, VendorBillLine,
+                        SaleOrder, SaleOrderLine, Invoice, InvoiceLine)
+from app.services import sequences
+
+LINE_FIELDS = ('product_name', 'budget_analytics', 'quantity', 'unit_price', 'total')
+
+DEFAULT_BATCH_SIZE = 500
+
+
+def _clone_lines(source_model, source_fk, target_model, target_fk, targets):
+    """Copy the lines of every source document to its target ``{source_id: target_id}``."""
+    source_id = getattr(source_model, source_fk)
+    lines = db.select(
+        db.case(targets, value=source_id),
+        *[getattr(source_model, name) for name in LINE_FIELDS],
+    ).where(source_id.in_(list(targets))).order_by(source_id, source_model.id)
+    db.session.execute(
+        target_model.__table__.insert().from_select([target_fk, *LINE_FIELDS], lines)
+    )
+
+
+def bill_purchase_orders(orders, status='draft', vendor=None, bill_numbers=None):
+    """
+    Create one vendor bill per purchase order with a copy of its lines.
+    ``vendor`` is the portal user issuing the bills (portal acceptance);
+    ``bill_numbers`` overrides the yearly ``Bill/`` numbering.
+    """
+    orders = list(orders)
+    if not orders:
+        return []
+    today = datetime.now().date()
+    bill_numbers = bill_numbers or sequences.next_numbers(f"Bill/{today.year}", len(orders))
+
+    bills = [
+        VendorBill(
+            bill_number=bill_number,
+            vendor_name=(vendor.name or vendor.username) if vendor else po.vendor_name,
+            vendor_id=vendor.id if vendor else None,
+            bill_date=today,
+            reference=po.order_number,
+            total_amount=po.total_amount,
+            po_id=po.id,
+            status=status
+        )
+        for po, bill_number in zip(orders, bill_numbers)
+    ]
+    db.session.add_all(bills)
+    db.session.flush()
+
+    _clone_lines(PurchaseOrderLine, 'po_id', VendorBillLine, 'bill_id',
+                 {po.id: bill.id for po, bill in zip(orders, bills)})
+    for bill in bills:
+        db.session.expire(bill, ['lines'])
+    return bills
+
+
+def invoice_sale_orders(orders):
+    """Create one sent invoice per sale order with a copy of its lines and mark the orders sent."""
+    orders = list(orders)
+    if not orders:
+        return []
+    today = datetime.utcnow().date()
+    invoice_numbers = sequences.next_numbers('INV-', len(orders))
+
+    invoices = [
+        Invoice(
+            invoice_number=invoice_number,
+            customer_id=so.customer_id,
+            customer_name=so.customer_name,
+            invoice_date=today,
+            due_date=today,  # Default to today, can be changed
+            subtotal=so.total_amount,
+            tax_amount=0.0,
+            total_amount=so.total_amount,
+            paid_amount=0.0,
+            balance_due=so.total_amount,
+            status='sent',
+            notes=f"Generated from Sale Order {so.order_number}"
+        )
+        for so, invoice_number in zip(orders, invoice_numbers)
+    ]
+    db.session.add_all(invoices)
+    for so in orders:
+        so.status = 'sent'
+    db.session.flush()
+
+    _clone_lines(SaleOrderLine, 'so_id', InvoiceLine, 'invoice_id',
+                 {so.id: invoice.id for so, invoice in zip(orders, invoices)})
+    for invoice in invoices:
+        db.session.expire(invoice, ['lines'])
+    return invoices
+
+
+def confirmed_sale_order_ids():
+    return db.session.execute(
+        db.select(SaleOrder.id).where(
+            SaleOrder.status == 'confirmed',
+            SaleOrder.is_archived.isnot(True),
+        ).order_by(SaleOrder.id)
+    ).scalars().all()
+
+
+def unbilled_purchase_order_ids():
+    """Confirmed purchase orders that have no vendor bill yet."""
+    billed = db.select(VendorBill.id).where(VendorBill.po_id == PurchaseOrder.id).exists()
+    return db.session.execute(
+        db.select(PurchaseOrder.id).where(
+            PurchaseOrder.status == 'confirmed',
+            PurchaseOrder.is_archived.isnot(True),
+            ~billed,
+        ).order_by(PurchaseOrder.id)
+    ).scalars().all()
+
+
+def _in_batches(ids, load, convert, batch_size):
+    batch_size = batch_size or current_app.config.get('CONVERSION_BATCH_SIZE', DEFAULT_BATCH_SIZE)
+    converted = []
+    for start in range(0, len(ids), batch_size):
+        orders = load(ids[start:start + batch_size])
+        converted.extend(doc.id for doc in convert(orders))
+        db.session.commit()
+    return converted
+
+
+def invoice_sale_orders_in_batches(so_ids=None, batch_size=None):
+    """
+    Invoice confirmed sale orders (all of them when ``so_ids`` is None), one
+    transaction per batch. Orders that stopped being confirmed meanwhile are
+    skipped. Returns the new invoice ids.
+    """
+    ids = list(so_ids) if so_ids is not None else confirmed_sale_order_ids()
+
+    def load(chunk):
+        return SaleOrder.query.filter(
+            SaleOrder.id.in_(chunk), SaleOrder.status == 'confirmed'
+        ).order_by(SaleOrder.id).with_for_update().all()
+
+    return _in_batches(ids, load, invoice_sale_orders, batch_size)
+
+
+def bill_purchase_orders_in_batches(po_ids=None, batch_size=None):
+    """Bill confirmed purchase orders without a bill, one transaction per batch."""
+    ids = list(po_ids) if po_ids is not None else unbilled_purchase_order_ids()
+    billed = db.select(VendorBill.id).where(VendorBill.po_id == PurchaseOrder.id).exists()
+
+    def load(chunk):
+        return PurchaseOrder.query.filter(
+            PurchaseOrder.id.in_(chunk), PurchaseOrder.status == 'confirmed', ~billed
+        ).order_by(PurchaseOrder.id).with_for_update().all()
+
+    return _in_batches(ids, load, bill_purchase_orders, batch_size)
@@ -0,0 +1,240 @@
+# Dashboard metrics service logic
+"""
+Precomputed admin dashboard figures.
+
+The figures live in the ``dashboard_metrics`` table, one row per metric, so
+the dashboard reads them with a single primary-key scan. Counts are kept in
+its integer ``count`` column and amounts in its money ``value`` column. They are kept
+current incrementally: an ``after_flush`` hook diffs every inserted, updated
+or deleted purchase order, sale order and vendor bill against its previous
+state and adds the difference to the affected rows inside the same
+transaction. Set-based writes that bypass the ORM (e.g. payment posting)
+report their own deltas through ``record_deltas``.
+
+A full reconciliation recomputes every metric from the base tables. It runs
+when the stored figures are older than ``DASHBOARD_RECONCILE_SECONDS`` and
+from ``flask metrics reconcile`` (meant for cron), which corrects any drift.
+"""
+from collections import defaultdict
+from datetime import datetime, timedelta
+from flask import current_app
+from sqlalchemy import event, inspect
+from sqlalchemy.dialects import postgresql, sqlite
+from sqlalchemy.orm import attributes
+from app import db
+from app.models import DashboardMetric, PurchaseOrder, SaleOrder, VendorBill
+
+METRICS = (
+    'portal_drafts_count',
+    'sales_drafts_count',
+    'total_po_count',
+    'balance_outstanding',
+    'total_purchases',
+)
+COUNT_METRICS = ('portal_drafts_count', 'sales_drafts_count', 'total_po_count')
+
+DEFAULT_RECONCILE_SECONDS = 3600
+
+
+def _purchase_order(get):
+    return {
+        'total_po_count': 1,
+        'portal_drafts_count': int(get('user_id') is not None and get('status') == 'draft'),
+    }
+
+
+def _sale_order(get):
+    return {
+        'sales_drafts_count': int(get('customer_id') is not None and get('status') == 'draft'),
+    }
+
+
+def _vendor_bill(get):
+    total, paid = get('total_amount') or 0.0, get('amount_paid') or 0.0
+    # Same NULL handling as compute_metrics(): no payment status is unpaid, nothing paid is 0
+    unpaid = (get('payment_status') or 'not_paid') != 'paid'
+    return {
+        'total_purchases': total,
+        'balance_outstanding': (total - paid) if unpaid else 0.0,
+    }
+
+
+# Model -> (attributes the metrics depend on, contribution of one row)
+_TRACKED = {
+    PurchaseOrder: (('user_id', 'status'), _purchase_order),
+    SaleOrder: (('customer_id', 'status'), _sale_order),
+    VendorBill: (('total_amount', 'amount_paid', 'payment_status'), _vendor_bill),
+}
+
+
+def _current(obj):
+    return lambda key: getattr(obj, key)
+
+
+def _previous(obj):
+    def get(key):
+        history = attributes.get_history(obj, key)
+        if history.deleted:
+            return history.deleted[0]
+        if history.unchanged:
+            return history.unchanged[0]
+        return getattr(obj, key)
+    return get
+
+
+def _changed(obj, keys):
+    state = inspect(obj)
+    return any(state.attrs[key].history.has_changes() for key in keys)
+
+
+def _flush_deltas(session):
+    deltas = defaultdict(float)
+
+    def add(contribution, sign):
+        for name, value in contribution.items():
+            deltas[name] += sign * value
+
+    for obj in session.new:
+        tracked = _TRACKED.get(type(obj))
+        if tracked:
+            add(tracked[1](_current(obj)), 1)
+    for obj in session.deleted:
+        tracked = _TRACKED.get(type(obj))
+        if tracked:
+            add(tracked[1](_previous(obj)), -1)
+    for obj in session.dirty:
+        tracked = _TRACKED.get(type(obj))
+        if tracked and _changed(obj, tracked[0]):
+            add(tracked[1](_current(obj)), 1)
+            add(tracked[1](_previous(obj)), -1)
+    return {name: value for name, value in deltas.items() if value}
+
+
+def _columns(name, value, amount_key='value', count_key='count'):
+    """``value`` of metric ``name`` split over the money and count columns."""
+    if name in COUNT_METRICS:
+        return {amount_key: 0.0, count_key: int(round(value))}
+    return {amount_key: value, count_key: 0}
+
+
+def apply_deltas(connection, deltas):
+    """Add ``{metric: delta}`` to the stored figures in one executemany."""
+    if not deltas:
+        return
+    table = DashboardMetric.__table__
+    connection.execute(
+        table.update()
+        .where(table.c.name == db.bindparam('metric'))
+        .values(value=table.c.value + db.bindparam('amount'), count=table.c.count + db.bindparam('rows')),
+        [{'metric': name, **_columns(name, delta, amount_key='amount', count_key='rows')}
+         for name, delta in deltas.items()],
+    )
+
+
+def record_deltas(**deltas):
+    """For set-based writes the flush hook cannot see, e.g. ``balance_outstanding=-100.0``."""
+    apply_deltas(db.session.connection(), {k: v for k, v in deltas.items() if v})
+
+
+@event.listens_for(db.session, 'before_flush')
+def _load_deleted(session, flush_context, instances):
+    # Deleted rows are gone by after_flush; make sure their values are loaded
+    for obj in session.deleted:
+        tracked = _TRACKED.get(type(obj))
+        if tracked:
+            for key in tracked[0]:
+                getattr(obj, key)
+
+
+@event.listens_for(db.session, 'after_flush')
+def _track_flush(session, flush_context):
+    deltas = _flush_deltas(session)
+    if deltas:
+        apply_deltas(session.connection(), deltas)
+
+
+def _keep_old_value(target, value, oldvalue, initiator):
+    pass
+
+
+# Load the old value of tracked columns before they are overwritten, so the
+# previous contribution is known even when the attribute was expired
+for _model, (_keys, _) in _TRACKED.items():
+    for _key in _keys:
+        event.listen(getattr(_model, _key), 'set', _keep_old_value, active_history=True)
+
+
+def compute_metrics():
+    """Every metric straight from the base tables (one query per table)."""
+    po_count, portal_drafts = db.session.query(
+        db.func.count(PurchaseOrder.id),
+        db.func.sum(db.case(
+            (db.and_(PurchaseOrder.user_id.isnot(None), PurchaseOrder.status == 'draft'), 1),
+            else_=0,
+        )),
+    ).one()
+    sales_drafts = db.session.query(db.func.count(SaleOrder.id)).filter(
+        SaleOrder.customer_id.isnot(None), SaleOrder.status == 'draft'
+    ).scalar()
+    balance_outstanding, total_purchases = db.session.query(
+        db.func.sum(db.case(
+            (db.func.coalesce(VendorBill.payment_status, 'not_paid') != 'paid',
+             db.func.coalesce(VendorBill.total_amount, 0) - db.func.coalesce(VendorBill.amount_paid, 0)),
+        )),
+        db.func.sum(VendorBill.total_amount),
+    ).one()
+    return {
+        'portal_drafts_count': portal_drafts or 0,
+        'sales_drafts_count': sales_drafts or 0,
+        'total_po_count': po_count or 0,
+        'balance_outstanding': balance_outstanding or 0.0,
+        'total_purchases': total_purchases or 0.0,
+    }
+
+
+def _upsert(rows):
+    """Insert metric ``rows``, overwriting rows that exist (one ``INSERT ... ON CONFLICT``)."""
+    table = DashboardMetric.__table__
+    dialect = postgresql if db.session.get_bind().dialect.name == 'postgresql' else sqlite
+    insert = dialect.insert(table)
+    db.session.execute(
+        insert.on_conflict_do_update(
+            index_elements=[table.c.name],
+            set_={column: insert.excluded[column] for column in ('value', 'count', 'reconciled_at')},
+        ),
+        rows,
+    )
+
+
+def reconcile():
+    """
+    Recompute and store every metric. The metric rows are locked first, so
+    writers flushing meanwhile wait and their changes are either counted by
+    the scan or applied as deltas afterwards; missing rows are upserted, so
+    two first-time reconciles do not collide. Callers commit.
+    """
+    db.session.execute(db.select(DashboardMetric.name).with_for_update()).all()
+    values = compute_metrics()
+    now = datetime.utcnow()
+    _upsert([{'name': name, 'reconciled_at': now, **_columns(name, value)} for name, value in values.items()])
+    return values
+
+
+def _is_stale(rows):
+    if set(rows) != set(METRICS):
+        return True
+    max_age = current_app.config.get('DASHBOARD_RECONCILE_SECONDS', DEFAULT_RECONCILE_SECONDS)
+    if not max_age:
+        return False
+    cutoff = datetime.utcnow() - timedelta(seconds=max_age)
+    return any(row.reconciled_at is None or row.reconciled_at < cutoff for row in rows.values())
+
+
+def get_metrics():
+    """``{metric: value}`` for the dashboard, reconciling first when stale."""
+    rows = {row.name: row for row in DashboardMetric.query.all()}
+    if _is_stale(rows):
+        values = reconcile()
+        db.session.commit()
+        return values
+    return {name: rows[name].count if name in COUNT_METRICS else rows[name].value for name in METRICS}
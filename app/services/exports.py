@@ -0,0 +1,201 @@
+# Export service logic
+"""
+Streaming CSV/XLSX exports of purchase orders, vendor bills, invoices and
+sale orders, one row per document line (documents without lines get one row
+with empty line columns).
+
+Documents are read with ``yield_per`` (a server-side cursor on PostgreSQL),
+so only ``EXPORT_BATCH_SIZE`` documents are in memory at a time, and their
+lines come from the ``export`` loader profile, one ``IN`` query per batch.
+``stream`` is a generator of encoded chunks: the first bytes go out as soon
+as the first batch is read, whatever the size of the export.
+
+XLSX files are written with the standard library only: a minimal
+SpreadsheetML workbook with inline strings, zipped on the fly into a
+non-seekable sink.
+"""
+import csv
+import io
+import re
+import zipfile
+from datetime import date, datetime
+from xml.sax.saxutils import escape
+from flask import current_app
+from app.models import PurchaseOrder, VendorBill, Invoice, SaleOrder
+from app.services import loading
+
+DEFAULT_BATCH_SIZE = 1000
+FLUSH_BYTES = 64 * 1024
+
+_LINE_COLUMNS = ['product_name', 'budget_analytics', 'quantity', 'unit_price', 'total']
+
+# Export name -> (model, document date column, header columns, line columns)
+EXPORTS = {
+    'purchase-orders': (PurchaseOrder, PurchaseOrder.order_date,
+                        ['order_number', 'reference', 'vendor_name', 'order_date', 'expected_delivery',
+                         'status', 'total_amount'],
+                        _LINE_COLUMNS),
+    'vendor-bills': (VendorBill, VendorBill.bill_date,
+                     ['bill_number', 'reference', 'vendor_name', 'bill_date', 'due_date', 'status',
+                      'payment_status', 'total_amount', 'amount_paid'],
+                     _LINE_COLUMNS),
+    'invoices': (Invoice, Invoice.invoice_date,
+                 ['invoice_number', 'customer_name', 'invoice_date', 'due_date', 'status', 'payment_terms',
+                  'subtotal', 'tax_amount', 'total_amount', 'paid_amount', 'balance_due'],
+                 ['product_name', 'description', 'budget_analytics', 'quantity', 'unit_price', 'tax_rate',
+                  'tax_amount', 'total']),
+    'sale-orders': (SaleOrder, SaleOrder.order_date,
+                    ['order_number', 'customer_name', 'order_date', 'status', 'total_amount'],
+                    _LINE_COLUMNS),
+}
+
+FORMATS = {
+    'csv': 'text/csv; charset=utf-8',
+    'xlsx': 'application/vnd.openxmlformats-officedocument.spreadsheetml.sheet',
+}
+
+
+def columns(kind):
+    _, _, header_columns, line_columns = EXPORTS[kind]
+    return header_columns + ['line_' + name for name in line_columns]
+
+
+def rows(kind, date_from=None, date_to=None, include_archived=False):
+    """Yield one list of values per exported line of ``kind``."""
+    model, date_column, header_columns, line_columns = EXPORTS[kind]
+    batch_size = current_app.config.get('EXPORT_BATCH_SIZE', DEFAULT_BATCH_SIZE)
+
+    query = loading.query(model, 'export')
+    if not include_archived:
+        query = query.filter(model.is_archived == False)  # noqa: E712
+    if date_from:
+        query = query.filter(date_column >= date_from)
+    if date_to:
+        query = query.filter(date_column <= date_to)
+    query = query.order_by(model.id).yield_per(batch_size)
+
+    empty_line = [None] * len(line_columns)
+    for doc in query:
+        header = [getattr(doc, name) for name in header_columns]
+        if not doc.lines:
+            yield header + empty_line
+        for line in doc.lines:
+            yield header + [getattr(line, name) for name in line_columns]
+
+
+def _csv_chunks(kind, records):
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    writer.writerow(columns(kind))
+    for record in records:
+        writer.writerow(record)
+        if buffer.tell() >= FLUSH_BYTES:
+            yield buffer.getvalue().encode('utf-8')
+            buffer.seek(0)
+            buffer.truncate()
+    yield buffer.getvalue().encode('utf-8')
+
+
+class _Sink:
+    """Write-only file object whose contents are drained by the generator."""
+
+    def __init__(self):
+        self.chunks = []
+
+    def write(self, data):
+        self.chunks.append(bytes(data))
+        return len(data)
+
+    def flush(self):
+        pass
+
+    def drain(self):
+        data = b''.join(self.chunks)
+        self.chunks.clear()
+        return data
+
+
+_ILLEGAL_XML = re.compile('[\x00-\x08\x0b\x0c\x0e-\x1f]')
+
+_CONTENT_TYPES = (
+    '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>'
+    '<Types xmlns="http://schemas.openxmlformats.org/package/2006/content-types">'
+    '<Default Extension="rels" ContentType="application/vnd.openxmlformats-package.relationships+xml"/>'
+    '<Default Extension="xml" ContentType="application/xml"/>'
+    '<Override PartName="/xl/workbook.xml" '
+    'ContentType="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet.main+xml"/>'
+    '<Override PartName="/xl/worksheets/sheet1.xml" '
+    'ContentType="application/vnd.openxmlformats-officedocument.spreadsheetml.worksheet+xml"/>'
+    '</Types>'
+)
+_ROOT_RELS = (
+    '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>'
+    '<Relationships xmlns="http://schemas.openxmlformats.org/package/2006/relationships">'
+    '<Relationship Id="rId1" Target="xl/workbook.xml" '
+    'Type="http://schemas.openxmlformats.org/officeDocument/2006/relationships/officeDocument"/>'
+    '</Relationships>'
+)
+_WORKBOOK = (
+    '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>'
+    '<workbook xmlns="http://schemas.openxmlformats.org/spreadsheetml/2006/main" '
+    'xmlns:r="http://schemas.openxmlformats.org/officeDocument/2006/relationships">'
+    '<sheets><sheet name="{name}" sheetId="1" r:id="rId1"/></sheets></workbook>'
+)
+_WORKBOOK_RELS = (
+    '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>'
+    '<Relationships xmlns="http://schemas.openxmlformats.org/package/2006/relationships">'
+    '<Relationship Id="rId1" Target="worksheets/sheet1.xml" '
+    'Type="http://schemas.openxmlformats.org/officeDocument/2006/relationships/worksheet"/>'
+    '</Relationships>'
+)
+
+
+def _xlsx_cell(value):
+    if value is None:
+        return '<c/>'
+    if isinstance(value, bool):
+        return f'<c t="b"><v>{int(value)}</v></c>'
+    if isinstance(value, (int, float)):
+        return f'<c><v>{value!r}</v></c>'
+    if isinstance(value, (date, datetime)):
+        value = value.isoformat()
+    text = escape(_ILLEGAL_XML.sub('', str(value)))
+    return f'<c t="inlineStr"><is><t xml:space="preserve">{text}</t></is></c>'
+
+
+def _xlsx_row(values):
+    return '<row>' + ''.join(_xlsx_cell(value) for value in values) + '</row>'
+
+
+def _xlsx_chunks(kind, records):
+    sink = _Sink()
+    with zipfile.ZipFile(sink, 'w', compression=zipfile.ZIP_DEFLATED) as archive:
+        archive.writestr('[Content_Types].xml', _CONTENT_TYPES)
+        archive.writestr('_rels/.rels', _ROOT_RELS)
+        archive.writestr('xl/workbook.xml', _WORKBOOK.format(name=kind[:31]))
+        archive.writestr('xl/_rels/workbook.xml.rels', _WORKBOOK_RELS)
+        with archive.open('xl/worksheets/sheet1.xml', 'w') as sheet:
+            sheet.write(b'<?xml version="1.0" encoding="UTF-8" standalone="yes"?>'
+                        b'<worksheet xmlns="http://schemas.openxmlformats.org/spreadsheetml/2006/main">'
+                        b'<sheetData>')
+            sheet.write(_xlsx_row(columns(kind)).encode('utf-8'))
+            pending = 0
+            for record in records:
+                data = _xlsx_row(record).encode('utf-8')
+                sheet.write(data)
+                pending += len(data)
+                if pending >= FLUSH_BYTES:
+                    pending = 0
+                    chunk = sink.drain()
+                    if chunk:
+                        yield chunk
+            sheet.write(b'</sheetData></worksheet>')
+    yield sink.drain()
+
+
+def stream(kind, fmt, **filters):
+    """Encoded chunks of export ``kind`` in ``fmt`` (``csv`` or ``xlsx``)."""
+    records = rows(kind, **filters)
+    if fmt == 'xlsx':
+        return _xlsx_chunks(kind, records)
+    return _csv_chunks(kind, records)
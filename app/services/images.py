@@ -0,0 +1,173 @@
+# Image upload service logic
+"""
+Upload pipeline for contact and product images.
+
+Uploads are streamed to disk in fixed-size chunks while being hashed, and
+stored under their content hash (``uploads/<sha256>.jpg``), so uploading the
+same picture again reuses the existing file. Thumbnails in the sizes listed
+in ``IMAGE_THUMBNAIL_SIZES`` are generated by a background worker thread into
+``uploads/thumbs/``; until they exist the original is served.
+
+Templates resolve a stored ``image_url`` with the ``image_src`` filter:
+``{{ contact.image_url|image_src('small') }}``. Thumbnails known to exist are
+remembered per process (they are never removed), for the most recently used
+``THUMBNAIL_STATE_SIZE`` names; missing ones are looked up again at most
+every ``MISSING_THUMBNAIL_RECHECK`` seconds.
+
+Thumbnails need Pillow; without it uploads still work and the originals are
+served at every size.
+"""
+import hashlib
+import os
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from flask import current_app, url_for
+from werkzeug.utils import secure_filename
+from app.services.caching import LRUCache
+
+try:
+    from PIL import Image
+except ImportError:  # thumbnails are optional
+    Image = None
+
+CHUNK_SIZE = 64 * 1024
+THUMBS_DIR = 'thumbs'
+DEFAULT_THUMBNAIL_SIZES = {'small': 64, 'medium': 256}
+MISSING_THUMBNAIL_RECHECK = 30
+THUMBNAIL_STATE_SIZE = 10000
+
+# Thumbnail name -> True once it exists, else the monotonic time to look again
+_thumbnail_state = LRUCache(maxsize=THUMBNAIL_STATE_SIZE)
+
+_executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix='thumbnails')
+
+
+def _upload_folder():
+    return current_app.config['UPLOAD_FOLDER']
+
+
+def _thumbnail_sizes():
+    return current_app.config.get('IMAGE_THUMBNAIL_SIZES', DEFAULT_THUMBNAIL_SIZES)
+
+
+def _thumbnail_name(filename, size):
+    stem, ext = os.path.splitext(filename)
+    return f"{THUMBS_DIR}/{stem}_{size}{ext}"
+
+
+def save_upload(file):
+    """
+    Store an uploaded ``FileStorage`` and return its path relative to the
+    static folder (``uploads/<hash><ext>``), or None when nothing was sent.
+    """
+    if not file or not file.filename:
+        return None
+    ext = os.path.splitext(secure_filename(file.filename))[1].lower()
+    folder = _upload_folder()
+    os.makedirs(folder, exist_ok=True)
+
+    digest = hashlib.sha256()
+    # Created like any other file (0666 less the umask), unlike mkstemp's 0600
+    tmp_path = os.path.join(folder, f".upload-{uuid.uuid4().hex}")
+    fd = os.open(tmp_path, os.O_WRONLY | os.O_CREAT | os.O_EXCL, 0o666)
+    try:
+        with os.fdopen(fd, 'wb') as out:
+            while True:
+                chunk = file.stream.read(CHUNK_SIZE)
+                if not chunk:
+                    break
+                digest.update(chunk)
+                out.write(chunk)
+        filename = f"{digest.hexdigest()}{ext}"
+        final_path = os.path.join(folder, filename)
+        if os.path.exists(final_path):
+            os.remove(tmp_path)
+        else:
+            os.replace(tmp_path, final_path)
+    except BaseException:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+        raise
+
+    schedule_thumbnails(filename)
+    return f"uploads/{filename}"
+
+
+def schedule_thumbnails(filename):
+    """Queue thumbnail generation for an uploaded file (name relative to the upload folder)."""
+    if Image is None:
+        return None
+    folder = os.path.abspath(_upload_folder())
+    return _executor.submit(make_thumbnails, folder, filename, dict(_thumbnail_sizes()),
+                            current_app.logger)
+
+
+def make_thumbnails(folder, filename, sizes, logger=None):
+    """Write the missing thumbnails of ``filename``; runs without an app context."""
+    source = os.path.join(folder, filename)
+    try:
+        os.makedirs(os.path.join(folder, THUMBS_DIR), exist_ok=True)
+        with Image.open(source) as img:
+            for name, size in sizes.items():
+                thumb_name = _thumbnail_name(filename, name)
+                target = os.path.join(folder, thumb_name)
+                if os.path.exists(target):
+                    _thumbnail_state.set(thumb_name, True)
+                    continue
+                thumb = img.copy()
+                thumb.thumbnail((size, size))
+                if img.format == 'JPEG' and thumb.mode not in ('RGB', 'L'):
+                    thumb = thumb.convert('RGB')
+                tmp_target = f"{target}.tmp"
+                thumb.save(tmp_target, format=img.format)
+                os.replace(tmp_target, target)
+                _thumbnail_state.set(thumb_name, True)
+    except Exception:
+        if logger is not None:
+            logger.exception('Thumbnail generation failed for %s', filename)
+
+
+def _thumbnail_exists(thumb_name):
+    state = _thumbnail_state.get(thumb_name)
+    if state is True:
+        return True
+    now = time.monotonic()
+    if state is not None and now < state:
+        return False
+    exists = os.path.exists(os.path.join(current_app.static_folder, 'uploads', thumb_name))
+    _thumbnail_state.set(thumb_name, True if exists else now + MISSING_THUMBNAIL_RECHECK)
+    return exists
+
+
+def image_src(image_url, size=None):
+    """URL for a stored ``image_url``, using the ``size`` thumbnail once it exists."""
+    if not image_url:
+        return ''
+    if image_url.startswith(('http://', 'https://', '/')):
+        return image_url
+    if size and image_url.startswith('uploads/'):
+        thumb_name = _thumbnail_name(image_url[len('uploads/'):], size)
+        if _thumbnail_exists(thumb_name):
+            return url_for('static', filename=f"uploads/{thumb_name}")
+    return url_for('static', filename=image_url)
+
+
+def backfill_thumbnails():
+    """Generate missing thumbnails for every stored upload; returns the number of files."""
+    if Image is None:
+        raise RuntimeError('Pillow is required to generate thumbnails')
+    folder = os.path.abspath(_upload_folder())
+    if not os.path.isdir(folder):
+        return 0
+    count = 0
+    for filename in sorted(os.listdir(folder)):
+        if filename.startswith('.') or not os.path.isfile(os.path.join(folder, filename)):
+            continue
+        make_thumbnails(folder, filename, dict(_thumbnail_sizes()), current_app.logger)
+        count += 1
+    return count
+
+
+def init_app(app):
+    app.add_template_filter(image_src, 'image_src')
@@ -0,0 +1,280 @@
+# Bulk import service logic
+"""
+CSV import of contacts, products and analytical accounts.
+
+The file is read as a stream and handled ``IMPORT_BATCH_SIZE`` rows at a
+time: every row of a batch is validated, the batch's keys are looked up with
+one ``IN`` query, and the rows are written with one executemany ``UPDATE``
+and one ``INSERT`` (``COPY`` on PostgreSQL). Each batch is committed, so an
+import of any size runs in bounded memory.
+
+Rows are matched on the import's key column (contacts by email, analytical
+accounts by code, products by name); a matched row is updated, an unmatched
+or key-less one inserted. Only columns present in the file are written, so a
+file of ``email,phone`` updates phone numbers and leaves the rest alone; in
+the same way a blank cell leaves the stored value alone on update.
+Invalid rows are skipped and reported as ``RowError(row, column, message)``
+with ``row`` the line number in the file.
+"""
+import csv
+import io
+from collections import namedtuple
+from datetime import datetime
+from flask import current_app
+from sqlalchemy import bindparam, func
+from app import db
+from app.models import Contact, Product, AnalyticalAccount
+from app.services import reference_data
+
+DEFAULT_BATCH_SIZE = 5000
+
+RowError = namedtuple('RowError', ['row', 'column', 'message'])
+ImportResult = namedtuple('ImportResult', ['inserted', 'updated', 'errors'])
+
+
+class ImportFileError(Exception):
+    """The file as a whole cannot be imported (e.g. a required column is missing)."""
+
+
+def _text(max_length=None, required=False):
+    def parse(value):
+        value = (value or '').strip()
+        if not value:
+            if required:
+                raise ValueError('is required')
+            return None
+        if max_length and len(value) > max_length:
+            raise ValueError(f'is longer than {max_length} characters')
+        return value
+    parse.required = required
+    return parse
+
+
+def _email(value):
+    value = _text(255)(value)
+    if value is not None and '@' not in value:
+        raise ValueError('is not an email address')
+    return value
+
+
+def _phone(value):
+    value = (value or '').strip()
+    if not value:
+        return None
+    digits = ''.join(ch for ch in value if ch.isdigit())
+    if not digits or len(digits) > 10:
+        raise ValueError('must have at most 10 digits')
+    return int(digits)
+
+
+def _number(cast=float):
+    def parse(value):
+        value = (value or '').strip().replace(',', '')
+        if not value:
+            return None
+        try:
+            return cast(value)
+        except ValueError:
+            raise ValueError('is not a number') from None
+    return parse
+
+
+def _choice(*choices):
+    def parse(value):
+        value = (value or '').strip().lower() or choices[0]
+        if value not in choices:
+            raise ValueError(f"must be one of {', '.join(choices)}")
+        return value
+    return parse
+
+
+# Import name -> (model, key column, reference data cache, {column: parser})
+IMPORTS = {
+    'contacts': (Contact, 'email', 'contacts', {
+        'name': _text(25, required=True),
+        'email': _email,
+        'phone': _phone,
+        'company': _text(255),
+        'address': _text(),
+    }),
+    'products': (Product, 'name', 'products', {
+        'name': _text(128, required=True),
+        'category': _text(128),
+        'description': _text(),
+        'sales_price': _number(),
+        'purchase_price': _number(),
+        'quantity': _number(int),
+    }),
+    'analytical-accounts': (AnalyticalAccount, 'code', 'analytical_accounts', {
+        'name': _text(128, required=True),
+        'code': _text(32),
+        'description': _text(),
+        'account_type': _choice('income', 'expense'),
+    }),
+}
+
+
+def _required(kind):
+    _, _, _, parsers = IMPORTS[kind]
+    return [name for name, parse in parsers.items() if getattr(parse, 'required', False)]
+
+
+def _columns(kind, fieldnames):
+    _, key, _, parsers = IMPORTS[kind]
+    present = [(name or '').strip().lower() for name in fieldnames or []]
+    columns = [name for name in parsers if name in present]
+    if not columns:
+        raise ImportFileError(f"No known columns; expected some of: {', '.join(parsers)}")
+    # Without the key column every row is an insert
+    missing = [name for name in _required(kind) if name not in columns]
+    if missing and key not in columns:
+        raise ImportFileError(f"Missing required column(s): {', '.join(missing)}")
+    return columns
+
+
+def _validate(kind, columns, batch, errors):
+    """``(row, values)`` of the valid rows of ``batch`` by import key (row for key-less rows); last one wins."""
+    _, key, _, parsers = IMPORTS[kind]
+    valid = {}
+    for row_number, record in batch:
+        values, ok = {}, True
+        for column in columns:
+            try:
+                values[column] = parsers[column](record.get(column))
+            except ValueError as e:
+                errors.append(RowError(row_number, column, f'{column} {e}'))
+                ok = False
+        if ok:
+            valid[values.get(key) or ('row', row_number)] = (row_number, values)
+    return valid
+
+
+def _copy_buffer(table, columns, rows, dialect):
+    """``rows`` as the CSV text of a ``COPY ... FROM STDIN WITH (FORMAT csv)``."""
+    # COPY skips SQLAlchemy's type handling, so apply it here (e.g. money to cents)
+    processors = [table.c[column].type.bind_processor(dialect) or (lambda value: value) for column in columns]
+    buffer = io.StringIO()
+    # Unquoted empty fields are NULL, quoted ones empty strings: the csv module
+    # writes None unquoted and only quotes values that need it (parsers never
+    # return an empty string, blank cells are None)
+    writer = csv.writer(buffer, quoting=csv.QUOTE_MINIMAL)
+    for row in rows:
+        writer.writerow([process(row[column]) for process, column in zip(processors, columns)])
+    buffer.seek(0)
+    return buffer
+
+
+def _copy_rows(table, columns, rows):
+    """Insert ``rows`` with ``COPY ... FROM STDIN``; False when the driver cannot."""
+    cursor = db.session.connection().connection.dbapi_connection.cursor()
+    if not hasattr(cursor, 'copy_expert'):
+        return False
+    buffer = _copy_buffer(table, columns, rows, db.engine.dialect)
+    cursor.copy_expert(f"COPY {table.name} ({', '.join(columns)}) FROM STDIN WITH (FORMAT csv)", buffer)
+    return True
+
+
+def _write(kind, columns, valid, errors):
+    model, key, _, _ = IMPORTS[kind]
+    table = model.__table__
+    key_column = table.c[key]
+
+    keys = [k for k in valid if not isinstance(k, tuple)]
+    existing = {}
+    if keys and key in columns:
+        existing = dict(db.session.execute(db.select(key_column, table.c.id).where(key_column.in_(keys))).all())
+
+    now = datetime.utcnow()
+    missing = [name for name in _required(kind) if name not in columns]
+    updates, inserts = [], []
+    for k, (row_number, values) in valid.items():
+        if k in existing:
+            updates.append({'_id': existing[k], **{'_' + name: value for name, value in values.items()}})
+        elif missing:
+            errors.append(RowError(row_number, key, f"{key} matches nothing to update and "
+                                                    f"{', '.join(missing)} is missing for a new row"))
+        else:
+            inserts.append(values)
+
+    if updates:
+        # Bind names must differ from the column names in a SET clause; a blank
+        # cell (None) keeps the stored value
+        values = {column: func.coalesce(bindparam('_' + column, type_=table.c[column].type), table.c[column])
+                  for column in columns}
+        if 'updated_at' in table.c:
+            values['updated_at'] = now
+        db.session.execute(
+            table.update().where(table.c.id == bindparam('_id')).values(values),
+            updates,
+        )
+    if inserts:
+        defaults = {'is_archived': False}
+        for stamp in ('created_at', 'updated_at'):
+            if stamp in table.c:
+                defaults[stamp] = now
+        rows = [{**defaults, **dict.fromkeys(columns), **values} for values in inserts]
+        insert_columns = list(rows[0])
+        if db.engine.dialect.name != 'postgresql' or not _copy_rows(table, insert_columns, rows):
+            db.session.execute(table.insert(), rows)
+    return len(inserts), len(updates)
+
+
+def _batches(reader, size):
+    batch = []
+    for record in reader:
+        record = {(name or '').strip().lower(): value for name, value in record.items()}
+        batch.append((reader.line_num, record))
+        if len(batch) >= size:
+            yield batch
+            batch = []
+    if batch:
+        yield batch
+
+
+def import_csv(kind, stream, batch_size=None, dry_run=False):
+    """
+    Import the CSV in binary ``stream`` as ``kind`` (see ``IMPORTS``),
+    committing each batch (rolling back instead when ``dry_run``).
+    """
+    if kind not in IMPORTS:
+        raise ImportFileError(f"Unknown import {kind!r}")
+    _, _, cache_kind, _ = IMPORTS[kind]
+    batch_size = batch_size or current_app.config.get('IMPORT_BATCH_SIZE', DEFAULT_BATCH_SIZE)
+
+    text = io.TextIOWrapper(stream, encoding='utf-8-sig', newline='')
+    reader = csv.DictReader(text)
+
+    inserted = updated = 0
+    errors = []
+    try:
+        # Reading the header decodes the first line
+        columns = _columns(kind, reader.fieldnames)
+        for batch in _batches(reader, batch_size):
+            valid = _validate(kind, columns, batch, errors)
+            if not valid:
+                continue
+            batch_inserted, batch_updated = _write(kind, columns, valid, errors)
+            inserted += batch_inserted
+            updated += batch_updated
+            if dry_run:
+                continue
+            reference_data.bump(cache_kind)
+            db.session.commit()
+    except UnicodeDecodeError:
+        db.session.rollback()
+        raise ImportFileError('The file is not UTF-8 encoded CSV') from None
+    except Exception:
+        db.session.rollback()
+        raise
+    finally:
+        text.detach()
+    if dry_run:
+        db.session.rollback()
+    return ImportResult(inserted, updated, errors)
+
+
+def write_errors(errors, fp):
+    """Write ``errors`` to the text file ``fp`` as a CSV report."""
+    writer = csv.writer(fp)
+    writer.writerow(['row', 'column', 'message'])
+    writer.writerows(errors)
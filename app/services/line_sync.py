@@ -0,0 +1,147 @@
+# Line sync service logic
+"""
+Saving the line items of purchase and sale orders.
+
+The submitted lines are diffed against the lines already stored for the
+order: lines whose values did not change are left alone, changed lines are
+updated in place, and only the remainder is inserted or deleted, each group
+with one executemany. Line ids therefore stay stable across saves and a
+500-line order that had one quantity edited costs a single UPDATE.
+
+Forms send a ``line_id[]`` per row (empty for rows added in the browser).
+When a form does not send ids, the rows are matched to the stored lines by
+position.
+"""
+from collections import namedtuple
+import math
+from app import db
+from app.models import Money, PurchaseOrder, PurchaseOrderLine, SaleOrder, SaleOrderLine
+from app.services import analytics_rules
+
+# Parent model -> (line model, foreign key column name)
+LINE_MODELS = {
+    PurchaseOrder: (PurchaseOrderLine, 'po_id'),
+    SaleOrder: (SaleOrderLine, 'so_id'),
+}
+
+FIELDS = ('product_name', 'budget_analytics', 'quantity', 'unit_price', 'total')
+
+SyncResult = namedtuple('SyncResult', ['inserted', 'updated', 'deleted', 'total_amount'])
+
+
+class LineError(ValueError):
+    """A submitted line has a quantity or unit price that is not a number."""
+
+
+def _field(values, i):
+    return values[i] if i < len(values) else None
+
+
+def _number(values, i, label, row):
+    # Blank is zero; anything else must be a plain finite number
+    raw = (_field(values, i) or '').strip()
+    if not raw:
+        return 0.0
+    try:
+        value = float(raw)
+    except ValueError:
+        value = math.nan
+    if not math.isfinite(value):
+        raise LineError(f"Line {row}: {label} must be a number, e.g. 12.50.")
+    return value
+
+
+def parse_lines(form, partner_name, matcher=None):
+    """
+    Read the ``product_name[]``/``budget_analytics[]``/``quantity[]``/
+    ``unit_price[]`` (and optional ``line_id[]``) form lists into line dicts.
+    Rows without a product are skipped; missing analytics are filled in from
+    the auto-analytical rules. Raises ``LineError`` when a quantity or unit
+    price is not a number.
+    """
+    line_ids = form.getlist('line_id[]')
+    line_products = form.getlist('product_name[]')
+    line_analytics = form.getlist('budget_analytics[]')
+    line_qtys = form.getlist('quantity[]')
+    line_prices = form.getlist('unit_price[]')
+
+    if matcher is None:
+        matcher = analytics_rules.get_matcher()
+    lines = []
+    for i in range(len(line_products)):
+        if not line_products[i]: continue
+        qty = _number(line_qtys, i, 'quantity', i + 1)
+        price = _number(line_prices, i, 'unit price', i + 1)
+        line_id = _field(line_ids, i)
+        lines.append({
+            'id': int(line_id) if line_id and line_id.isdigit() else None,
+            'product_name': line_products[i],
+            'budget_analytics': analytics_rules.resolve_analytics(
+                _field(line_analytics, i), line_products[i], partner_name, matcher),
+            'quantity': qty,
+            'unit_price': price,
+            'total': qty * price,
+        })
+    return lines, bool(line_ids)
+
+
+def _stored(column, value):
+    # Money columns keep whole cents, so compare what would be stored (3 x 0.10 is 0.30)
+    return Money.cents(value) if isinstance(column.type, Money) else value
+
+
+def _match(existing, lines, by_id):
+    """Pair submitted lines with stored rows; returns (pairs, new lines, unmatched rows)."""
+    if by_id:
+        stored = {row.id: row for row in existing}
+        pairs, new = [], []
+        for line in lines:
+            row = stored.pop(line['id'], None) if line['id'] is not None else None
+            if row is None:
+                new.append(line)
+            else:
+                pairs.append((row, line))
+        return pairs, new, list(stored.values())
+
+    paired = min(len(existing), len(lines))
+    return list(zip(existing[:paired], lines[:paired])), lines[paired:], existing[paired:]
+
+
+def sync_lines(parent, lines, by_id=True):
+    """
+    Make ``parent``'s stored lines equal ``lines`` (as returned by
+    ``parse_lines``) with the fewest writes. ``parent`` must already have an
+    id. Callers set the header total and commit.
+    """
+    model, fk = LINE_MODELS[type(parent)]
+    columns = [getattr(model, name) for name in FIELDS]
+    existing = db.session.execute(
+        db.select(model.id, *columns)
+        .where(getattr(model, fk) == parent.id)
+        .order_by(model.id)
+    ).all()
+
+    pairs, new, removed = _match(existing, lines, by_id)
+
+    updates = [
+        dict({name: line[name] for name in FIELDS}, id=row.id)
+        for row, line in pairs
+        if any(_stored(column, getattr(row, name)) != _stored(column, line[name])
+               for name, column in zip(FIELDS, columns))
+    ]
+    inserts = [dict({name: line[name] for name in FIELDS}, **{fk: parent.id}) for line in new]
+    deletes = [row.id for row in removed]
+
+    if deletes:
+        db.session.execute(
+            db.delete(model).where(model.id.in_(deletes))
+            .execution_options(synchronize_session=False)
+        )
+    if updates:
+        db.session.execute(db.update(model), updates)
+    if inserts:
+        db.session.execute(db.insert(model), inserts)
+    if deletes or updates or inserts:
+        db.session.expire(parent, ['lines'])
+
+    return SyncResult(len(inserts), len(updates), len(deletes), sum(line['total'] for line in lines))
@@ -0,0 +1,75 @@
+# Loader profiles
+"""
+Named eager-loading profiles for the document models.
+
+Relationships stay ``lazy=True`` on the models; routes pick what they need:
+
+``list``
+    Many-to-one partners joined in, collections left unloaded. For paginated
+    list views, which only show header columns.
+``detail``
+    Lines (and payments where they exist) and partners joined into the single
+    query that fetches one document.
+``export``
+    Lines fetched with ``selectinload`` (one extra ``IN`` query per batch of
+    parents rather than one per parent), for ``to_dict()`` over many rows.
+
+Usage: ``PurchaseOrder.query.options(*loading.profile(PurchaseOrder, 'detail'))``
+or the shortcut ``loading.query(PurchaseOrder, 'detail')``.
+"""
+from sqlalchemy.orm import joinedload, selectinload
+from app.models import PurchaseOrder, VendorBill, Invoice, SaleOrder, Payment
+
+PROFILES = ('list', 'detail', 'export')
+
+
+def _profiles():
+    return {
+        PurchaseOrder: {
+            'list': [joinedload(PurchaseOrder.vendor), joinedload(PurchaseOrder.created_by)],
+            'detail': [joinedload(PurchaseOrder.lines), joinedload(PurchaseOrder.vendor),
+                       joinedload(PurchaseOrder.created_by)],
+            'export': [selectinload(PurchaseOrder.lines)],
+        },
+        VendorBill: {
+            'list': [joinedload(VendorBill.vendor), joinedload(VendorBill.purchase_order)],
+            'detail': [joinedload(VendorBill.lines), selectinload(VendorBill.payments),
+                       joinedload(VendorBill.vendor), joinedload(VendorBill.purchase_order)],
+            'export': [selectinload(VendorBill.lines)],
+        },
+        Invoice: {
+            'list': [joinedload(Invoice.customer)],
+            'detail': [joinedload(Invoice.lines), selectinload(Invoice.payments),
+                       joinedload(Invoice.customer)],
+            'export': [selectinload(Invoice.lines)],
+        },
+        SaleOrder: {
+            'list': [joinedload(SaleOrder.customer)],
+            'detail': [joinedload(SaleOrder.lines), joinedload(SaleOrder.customer)],
+            'export': [selectinload(SaleOrder.lines)],
+        },
+        Payment: {
+            'list': [joinedload(Payment.bill), joinedload(Payment.invoice)],
+            'detail': [joinedload(Payment.bill), joinedload(Payment.invoice)],
+            'export': [],
+        },
+    }
+
+
+_cache = {}
+
+
+def profile(model, name):
+    """Loader options of profile ``name`` for ``model``."""
+    if name not in PROFILES:
+        raise ValueError(f"Unknown loader profile {name!r}")
+    if not _cache:
+        # Built lazily: backref attributes (e.g. VendorBill.payments) exist
+        # only once every mapper is configured
+        _cache.update(_profiles())
+    return _cache.get(model, {}).get(name, [])
+
+
+def query(model, name):
+    """``model.query`` with the options of profile ``name`` applied."""
+    return model.query.options(*profile(model, name))
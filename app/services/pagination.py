@@ -0,0 +1,132 @@
+# Keyset pagination helper
+"""
+Cursor-based (keyset) pagination for list views.
+
+Lists are ordered newest first on ``(date, id)`` or just ``id``. Instead of
+OFFSET, the page boundary is passed back as a cursor (``?after=`` /
+``?before=``) and turned into a ``WHERE (date, id) < (...)`` predicate, so
+every page costs the same index range scan however deep the user goes.
+Rows with a NULL date sort after all dated rows.
+"""
+from datetime import date
+from flask import current_app, request
+from app import db
+
+DEFAULT_PAGE_SIZE = 50
+
+
+class KeysetPage:
+    def __init__(self, items, per_page, next_cursor=None, prev_cursor=None, arg_prefix=''):
+        self.items = items
+        self.per_page = per_page
+        self.next_cursor = next_cursor
+        self.prev_cursor = prev_cursor
+        self.arg_prefix = arg_prefix
+
+    @property
+    def has_next(self):
+        return self.next_cursor is not None
+
+    @property
+    def has_prev(self):
+        return self.prev_cursor is not None
+
+    def __iter__(self):
+        return iter(self.items)
+
+    def __len__(self):
+        return len(self.items)
+
+    def url_args(self, cursor_arg, cursor):
+        """Current query string with the cursor args replaced."""
+        args = {k: v for k, v in request.args.items()
+                if k not in (self.arg_prefix + 'after', self.arg_prefix + 'before')}
+        if cursor is not None:
+            args[self.arg_prefix + cursor_arg] = cursor
+        return dict(request.view_args or {}, **args)
+
+
+def _encode(row, id_column, date_column):
+    row_id = getattr(row, id_column.key)
+    if date_column is None:
+        return str(row_id)
+    row_date = getattr(row, date_column.key)
+    return f"{row_date.isoformat() if row_date else ''}~{row_id}"
+
+
+def _decode(cursor, date_column):
+    try:
+        if date_column is None:
+            return None, int(cursor)
+        raw_date, raw_id = cursor.split('~', 1)
+        return (date.fromisoformat(raw_date) if raw_date else None), int(raw_id)
+    except ValueError:
+        return None, None
+
+
+def _after(id_column, date_column, cursor_date, cursor_id):
+    """Rows that come after the cursor in (date DESC NULLS LAST, id DESC) order."""
+    if date_column is None:
+        return id_column < cursor_id
+    if cursor_date is None:
+        return db.and_(date_column.is_(None), id_column < cursor_id)
+    return db.or_(
+        date_column < cursor_date,
+        db.and_(date_column == cursor_date, id_column < cursor_id),
+        date_column.is_(None),
+    )
+
+
+def _before(id_column, date_column, cursor_date, cursor_id):
+    """Rows that come before the cursor in the same order."""
+    if date_column is None:
+        return id_column > cursor_id
+    if cursor_date is None:
+        return db.or_(date_column.isnot(None), id_column > cursor_id)
+    return db.or_(
+        date_column > cursor_date,
+        db.and_(date_column == cursor_date, id_column > cursor_id),
+    )
+
+
+def ordering(id_column, date_column=None):
+    """``(forward, backward)`` ORDER BY clauses of a list; newest first going forward."""
+    if date_column is None:
+        return [id_column.desc()], [id_column.asc()]
+    return ([date_column.desc().nulls_last(), id_column.desc()],
+            [date_column.asc().nulls_first(), id_column.asc()])
+
+
+def paginate(query, id_column, date_column=None, arg_prefix='', per_page=None):
+    """
+    Return one ``KeysetPage`` of ``query`` using the ``after``/``before``
+    cursor from the request args (prefixed with ``arg_prefix`` when a page
+    shows several lists). Page size comes from ``LIST_PAGE_SIZE``.
+    """
+    per_page = per_page or current_app.config.get('LIST_PAGE_SIZE', DEFAULT_PAGE_SIZE)
+    after = request.args.get(arg_prefix + 'after')
+    before = request.args.get(arg_prefix + 'before')
+
+    forward, backward = ordering(id_column, date_column)
+
+    cursor = before or after
+    cursor_date, cursor_id = _decode(cursor, date_column) if cursor else (None, None)
+    if cursor_id is None:
+        after = before = None
+
+    if before:
+        rows = query.filter(_before(id_column, date_column, cursor_date, cursor_id)) \
+            .order_by(None).order_by(*backward).limit(per_page + 1).all()
+        has_more = len(rows) > per_page
+        items = list(reversed(rows[:per_page]))
+        prev_cursor = _encode(items[0], id_column, date_column) if has_more and items else None
+        next_cursor = _encode(items[-1], id_column, date_column) if items else None
+    else:
+        if after:
+            query = query.filter(_after(id_column, date_column, cursor_date, cursor_id))
+        rows = query.order_by(None).order_by(*forward).limit(per_page + 1).all()
+        items = rows[:per_page]
+        next_cursor = _encode(items[-1], id_column, date_column) if len(rows) > per_page else None
+        prev_cursor = _encode(items[0], id_column, date_column) if after and items else None
+
+    return KeysetPage(items, per_page, next_cursor, prev_cursor, arg_prefix)
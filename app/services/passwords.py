@@ -0,0 +1,82 @@
+# Password hashing service logic
+"""
+Password hashing with configurable cost and off-thread verification.
+
+``PASSWORD_HASH_METHOD`` is any Werkzeug method string, e.g.
+``scrypt:32768:8:1`` (the default) or ``pbkdf2:sha256:600000``. Stored hashes
+carry their own parameters, so old hashes keep verifying after the setting
+changes; ``verify`` re-hashes a password with the current parameters the
+next time its owner signs in successfully.
+
+Verification runs on a small bounded pool (``PASSWORD_HASH_POOL`` =
+``thread`` or ``process``, ``PASSWORD_HASH_WORKERS`` workers). Both scrypt
+and PBKDF2 release the GIL, so a thread pool already spreads a login storm
+over every core, and the pool size caps how much CPU logins may take from
+the other requests a worker is serving.
+"""
+import os
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from functools import lru_cache
+from threading import Lock
+from flask import current_app
+from werkzeug.security import check_password_hash, generate_password_hash
+
+DEFAULT_METHOD = 'scrypt:32768:8:1'
+DEFAULT_TIMEOUT = 30
+
+_pool = None
+_pool_lock = Lock()
+
+
+def hash_method():
+    return current_app.config.get('PASSWORD_HASH_METHOD') or DEFAULT_METHOD
+
+
+def _get_pool():
+    global _pool
+    if _pool is None:
+        with _pool_lock:
+            if _pool is None:
+                kind = current_app.config.get('PASSWORD_HASH_POOL', 'thread')
+                workers = current_app.config.get('PASSWORD_HASH_WORKERS') or os.cpu_count() or 1
+                if kind == 'process':
+                    _pool = ProcessPoolExecutor(max_workers=workers)
+                else:
+                    _pool = ThreadPoolExecutor(max_workers=workers, thread_name_prefix='password-hash')
+    return _pool
+
+
+def _run(fn, *args):
+    if not current_app.config.get('PASSWORD_HASH_WORKERS', 1):
+        return fn(*args)
+    return _get_pool().submit(fn, *args).result(timeout=DEFAULT_TIMEOUT)
+
+
+def hash_password(password):
+    """Hash ``password`` with the configured method (on the pool)."""
+    return _run(generate_password_hash, password, hash_method())
+
+
+@lru_cache(maxsize=8)
+def _method_prefix(method):
+    # Werkzeug fills in defaults ('scrypt' -> 'scrypt:32768:8:1'); compare what it actually writes
+    return generate_password_hash('', method).split('$', 1)[0]
+
+
+def needs_rehash(password_hash):
+    """True when ``password_hash`` was made with other parameters than the configured ones."""
+    return (password_hash or '').split('$', 1)[0] != _method_prefix(hash_method())
+
+
+def verify(user, password):
+    """
+    Check ``password`` for ``user`` on the pool. On success with outdated
+    parameters the user's hash is upgraded; callers commit.
+    """
+    if not user.password_hash or password is None:
+        return False
+    if not _run(check_password_hash, user.password_hash, password):
+        return False
+    if needs_rehash(user.password_hash):
+        user.password_hash = hash_password(password)
+    return True
@@ -1 +1,197 @@
 # Payments service logic
+"""
+Payment allocation and posting.
+
+A payment is recorded as one ``Payment`` ledger row per document it settles,
+all sharing a payment number. Posting inserts the ledger rows with a single
+executemany and then recomputes the paid/balance columns of every touched
+document with one set-based UPDATE, so a payment run over thousands of bills
+costs a handful of statements. The open documents are read ``FOR UPDATE``,
+so concurrent payments against one document wait for each other instead of
+both paying the same balance. Callers own the transaction and commit.
+"""
+from collections import namedtuple
+from datetime import datetime
+import math
+from app import db
+from app.models import Payment, VendorBill, Invoice
+from app.services import dashboard, portal_stats, sequences
+
+# Amounts are stored as whole cents and come back as floats in currency
+# units; in Python, treat anything below half a cent as settled
+TOLERANCE = 0.005
+
+Allocation = namedtuple('Allocation', ['document_id', 'partner_id', 'partner_name', 'amount'])
+PostedPayment = namedtuple('PostedPayment', ['payment_number', 'allocations', 'total'])
+
+
+class PaymentError(ValueError):
+    pass
+
+
+def parse_amount(raw):
+    """The payment amount typed in a form; a ``PaymentError`` unless it is a positive number."""
+    try:
+        amount = float((raw or '').strip())
+    except ValueError:
+        amount = None
+    if amount is None or not math.isfinite(amount) or amount <= TOLERANCE:
+        raise PaymentError(f"Enter a payment amount greater than zero (got '{raw or ''}').")
+    return amount
+
+
+def _open_bills(bill_ids):
+    query = db.select(
+        VendorBill.id, VendorBill.vendor_id, VendorBill.vendor_name,
+        VendorBill.total_amount - db.func.coalesce(VendorBill.amount_paid, 0),
+    ).where(
+        VendorBill.id.in_(bill_ids),
+        VendorBill.status != 'cancelled',
+        db.func.coalesce(VendorBill.payment_status, 'not_paid') != 'paid',
+    ).order_by(VendorBill.due_date, VendorBill.bill_date, VendorBill.id).with_for_update()
+    return db.session.execute(query).all()
+
+
+def _open_invoices(invoice_ids):
+    query = db.select(
+        Invoice.id, Invoice.customer_id, Invoice.customer_name,
+        Invoice.total_amount - db.func.coalesce(Invoice.paid_amount, 0),
+    ).where(
+        Invoice.id.in_(invoice_ids),
+        Invoice.status.notin_(('draft', 'paid', 'cancelled')),
+    ).order_by(Invoice.due_date, Invoice.invoice_date, Invoice.id).with_for_update()
+    return db.session.execute(query).all()
+
+
+def allocate(open_documents, amount=None):
+    """
+    Spread ``amount`` over ``(id, partner_id, partner_name, balance)`` rows in
+    the given order (oldest due first). ``amount=None`` settles every balance
+    (payment runs only); any other amount must be positive.
+    """
+    if amount is not None and not amount > TOLERANCE:
+        raise PaymentError('Enter a payment amount greater than zero.')
+    remaining = amount
+    allocations = []
+    for doc_id, partner_id, partner_name, balance in open_documents:
+        balance = balance or 0.0
+        if balance <= TOLERANCE:
+            continue
+        if remaining is None:
+            share = balance
+        else:
+            if remaining <= TOLERANCE:
+                break
+            share = min(balance, remaining)
+            remaining -= share
+        allocations.append(Allocation(doc_id, partner_id, partner_name, round(share, 2)))
+    return allocations
+
+
+def _insert_ledger(allocations, payment_type, document_column, payment_date, method, memo):
+    if not allocations:
+        raise PaymentError('Nothing left to pay on the selected documents.')
+    payment_date = payment_date or datetime.utcnow().date()
+    payment_number = sequences.next_number(f"PAY/{payment_date.year}")
+    now = datetime.utcnow()
+    db.session.execute(db.insert(Payment), [
+        {
+            'payment_number': payment_number,
+            'payment_type': payment_type,
+            'partner_id': a.partner_id,
+            'partner_name': a.partner_name,
+            document_column: a.document_id,
+            'amount': a.amount,
+            'payment_date': payment_date,
+            'payment_method': method or 'bank',
+            'memo': memo,
+            'status': 'posted',
+            'created_at': now,
+        }
+        for a in allocations
+    ])
+    return PostedPayment(payment_number, allocations, round(sum(a.amount for a in allocations), 2))
+
+
+def recompute_bill_balances(bill_ids):
+    """Set amount_paid/payment_status of the given bills from the ledger."""
+    paid = db.select(db.func.coalesce(db.func.sum(Payment.amount), 0)).where(
+        Payment.bill_id == VendorBill.id,
+        Payment.status == 'posted',
+    ).scalar_subquery()
+    db.session.execute(
+        db.update(VendorBill)
+        .where(VendorBill.id.in_(list(bill_ids)))
+        .values(
+            amount_paid=paid,
+            # Amounts are whole cents in the database, so these compare exactly
+            payment_status=db.case(
+                (paid >= VendorBill.total_amount, 'paid'),
+                (paid > 0, 'partial'),
+                else_='not_paid',
+            ),
+            updated_at=datetime.utcnow(),
+        )
+        .execution_options(synchronize_session=False)
+    )
+
+
+def recompute_invoice_balances(invoice_ids):
+    """Set paid_amount/balance_due/status of the given invoices from the ledger."""
+    paid = db.select(db.func.coalesce(db.func.sum(Payment.amount), 0)).where(
+        Payment.invoice_id == Invoice.id,
+        Payment.status == 'posted',
+    ).scalar_subquery()
+    db.session.execute(
+        db.update(Invoice)
+        .where(Invoice.id.in_(list(invoice_ids)))
+        .values(
+            paid_amount=paid,
+            balance_due=Invoice.total_amount - paid,
+            status=db.case(
+                (paid >= Invoice.total_amount, 'paid'),
+                (paid > 0, 'partial'),
+                else_=Invoice.status,
+            ),
+            updated_at=datetime.utcnow(),
+        )
+        .execution_options(synchronize_session=False)
+    )
+
+
+def pay_bills(bill_ids, amount=None, payment_date=None, method='bank', memo=None):
+    """
+    Post one outgoing payment across ``bill_ids``. With ``amount`` it is
+    allocated oldest-due first; without, every open balance is settled
+    (a payment run). Form input goes through ``parse_amount`` first.
+    """
+    allocations = allocate(_open_bills(list(bill_ids)), amount)
+    posted = _insert_ledger(allocations, 'send', 'bill_id', payment_date, method, memo)
+    recompute_bill_balances([a.document_id for a in allocations])
+    # The UPDATE above bypasses the ORM flush hooks that maintain the dashboard
+    dashboard.record_deltas(balance_outstanding=-posted.total)
+    portal_stats.mark_changed(db.session(), [a.partner_id for a in allocations])
+    db.session.expire_all()
+    return posted
+
+
+def pay_invoices(invoice_ids, amount=None, payment_date=None, method='bank', memo=None):
+    """Post one incoming payment across ``invoice_ids`` (see ``pay_bills``)."""
+    allocations = allocate(_open_invoices(list(invoice_ids)), amount)
+    posted = _insert_ledger(allocations, 'receive', 'invoice_id', payment_date, method, memo)
+    recompute_invoice_balances([a.document_id for a in allocations])
+    portal_stats.mark_changed(db.session(), [a.partner_id for a in allocations])
+    db.session.expire_all()
+    return posted
+
+
+def due_bill_ids(due_before=None):
+    """Ids of confirmed, unpaid bills due on or before ``due_before``."""
+    query = db.select(VendorBill.id).where(
+        VendorBill.status == 'confirmed',
+        db.func.coalesce(VendorBill.payment_status, 'not_paid') != 'paid',
+        VendorBill.is_archived.isnot(True),
+    )
+    if due_before:
+        query = query.where(db.or_(VendorBill.due_date.is_(None), VendorBill.due_date <= due_before))
+    return db.session.execute(query).scalars().all()
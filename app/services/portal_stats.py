@@ -0,0 +1,158 @@
+# Portal statistics service logic
+"""
+Per-user figures for the portal home page.
+
+Each document table is aggregated once with conditional sums
+(``SUM(CASE ...)``); the two order counts share a single statement, so a cold
+page costs three queries. Results are cached per user for
+``PORTAL_STATS_TTL`` seconds, in an LRU of ``PORTAL_STATS_CACHE_SIZE`` users. The cache is dropped for a user as soon as a
+transaction that touched one of their invoices, bills or orders commits;
+changes committed by other worker processes are picked up when the TTL
+expires.
+"""
+from collections import namedtuple
+from flask import current_app
+from sqlalchemy import event
+from sqlalchemy.orm import attributes
+from app import db
+from app.models import Invoice, VendorBill, SaleOrder, PurchaseOrder
+from app.services.caching import LRUCache
+
+DEFAULT_SIZE = 1024
+DEFAULT_TTL = 30
+
+PortalStats = namedtuple('PortalStats', [
+    'total_invoices', 'paid_invoices', 'unpaid_invoices',
+    'total_amount_due', 'total_payments_made',
+    'pending_vendor_payments', 'total_vendor_sales',
+    'active_orders', 'new_purchase_orders',
+])
+
+# Model -> column holding the portal user the document belongs to
+_OWNER_COLUMNS = {
+    Invoice: 'customer_id',
+    VendorBill: 'vendor_id',
+    SaleOrder: 'customer_id',
+    PurchaseOrder: 'vendor_id',
+}
+
+_cache = None
+
+
+def _get_cache():
+    global _cache
+    if _cache is None:
+        _cache = LRUCache(
+            maxsize=current_app.config.get('PORTAL_STATS_CACHE_SIZE', DEFAULT_SIZE),
+            ttl=current_app.config.get('PORTAL_STATS_TTL', DEFAULT_TTL),
+        )
+    return _cache
+
+
+def _invoice_stats(user_id):
+    return db.session.query(
+        db.func.count(Invoice.id),
+        db.func.sum(db.case((Invoice.status == 'paid', 1), else_=0)),
+        db.func.sum(db.case((Invoice.status.in_(['sent', 'partial', 'overdue']), 1), else_=0)),
+        db.func.sum(Invoice.balance_due),
+        db.func.sum(Invoice.paid_amount),
+    ).filter_by(customer_id=user_id, is_archived=False).one()
+
+
+def _bill_stats(user_id):
+    return db.session.query(
+        db.func.sum(db.case(
+            (VendorBill.payment_status != 'paid', VendorBill.total_amount - VendorBill.amount_paid),
+        )),
+        db.func.sum(VendorBill.total_amount),
+    ).filter_by(vendor_id=user_id, is_archived=False).one()
+
+
+def _order_stats(user_id):
+    active_sale_orders = db.select(db.func.count(SaleOrder.id)).where(
+        SaleOrder.customer_id == user_id,
+        SaleOrder.status == 'sent',
+        SaleOrder.is_archived == False,
+    ).scalar_subquery()
+    new_purchase_orders = db.select(db.func.count(PurchaseOrder.id)).where(
+        PurchaseOrder.vendor_id == user_id,
+        PurchaseOrder.status.in_(['sent']),
+        PurchaseOrder.is_archived == False,
+    ).scalar_subquery()
+    return db.session.execute(db.select(active_sale_orders, new_purchase_orders)).one()
+
+
+def compute_stats(user_id):
+    """Figures for ``user_id`` straight from the database (three queries)."""
+    total_invoices, paid, unpaid, amount_due, payments_made = _invoice_stats(user_id)
+    pending_payments, vendor_sales = _bill_stats(user_id)
+    active_orders, new_purchase_orders = _order_stats(user_id)
+    return PortalStats(
+        total_invoices=total_invoices or 0,
+        paid_invoices=paid or 0,
+        unpaid_invoices=unpaid or 0,
+        total_amount_due=amount_due or 0,
+        total_payments_made=payments_made or 0,
+        pending_vendor_payments=pending_payments or 0,
+        total_vendor_sales=vendor_sales or 0,
+        active_orders=active_orders or 0,
+        new_purchase_orders=new_purchase_orders or 0,
+    )
+
+
+def get_stats(user_id):
+    """Cached figures for ``user_id``."""
+    if not current_app.config.get('PORTAL_STATS_TTL', DEFAULT_TTL):
+        return compute_stats(user_id)
+
+    cache = _get_cache()
+    stats = cache.get(user_id)
+    if stats is None:
+        stats = compute_stats(user_id)
+        cache.set(user_id, stats)
+    return stats
+
+
+def invalidate(user_ids=None):
+    """Forget cached figures for ``user_ids`` (everyone when None)."""
+    if _cache is None:
+        return
+    if user_ids is None:
+        _cache.clear()
+    else:
+        for user_id in user_ids:
+            _cache.pop(user_id)
+
+
+def mark_changed(session, user_ids):
+    """Invalidate ``user_ids`` when ``session`` commits (for set-based writes)."""
+    session.info.setdefault('portal_stats_changed', set()).update(
+        user_id for user_id in user_ids if user_id is not None
+    )
+
+
+@event.listens_for(db.session, 'after_flush')
+def _collect_owners(session, flush_context):
+    owners = set()
+    for obj in list(session.new) + list(session.dirty) + list(session.deleted):
+        key = _OWNER_COLUMNS.get(type(obj))
+        if key is None:
+            continue
+        history = attributes.get_history(obj, key)
+        owners.update(history.added or ())
+        owners.update(history.unchanged or ())
+        owners.update(history.deleted or ())
+    if owners:
+        mark_changed(session, owners)
+
+
+@event.listens_for(db.session, 'after_commit')
+def _invalidate_committed(session):
+    changed = session.info.pop('portal_stats_changed', None)
+    if changed:
+        invalidate(changed)
+
+
+@event.listens_for(db.session, 'after_rollback')
+def _discard_changes(session):
+    session.info.pop('portal_stats_changed', None)
@@ -0,0 +1,208 @@
+# Request profiling
+"""
+Opt-in per-endpoint request profiling.
+
+When ``PROFILING_ENABLED`` is set, a ``PROFILING_SAMPLE_RATE`` fraction of
+requests is measured: wall time, number and total time of SQL statements
+(engine ``before/after_cursor_execute``), template render time (Flask's
+template signals) and, with ``PROFILING_TRACE_MEMORY``, the peak Python
+allocation. Unsampled requests pay one ``random()`` call.
+
+The last ``PROFILING_WINDOW`` samples of every endpoint are kept in memory
+(per process) and summarised as p50/p95/p99 on the admin ``/admin/_perf``
+page and in Prometheus text format on ``/admin/_perf/metrics``. The
+Prometheus ``_count``/``_sum`` series come from running totals kept next to
+the window, so they only ever grow, as ``rate()`` expects.
+
+``tracemalloc`` tracks the whole process, so with concurrent requests in one
+process the peak of a sample includes its neighbours' allocations; it also
+slows every allocation while on, which is why it is a separate setting.
+"""
+import random
+import time
+import tracemalloc
+from collections import deque, namedtuple
+from threading import Lock
+from flask import before_render_template, g, has_request_context, request, template_rendered
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+
+DEFAULT_SAMPLE_RATE = 0.01
+DEFAULT_WINDOW = 1000
+QUANTILES = (0.5, 0.95, 0.99)
+
+Sample = namedtuple('Sample', ['wall', 'sql_count', 'sql_time', 'template_time', 'peak_bytes'])
+
+# Sample field -> (Prometheus metric name, help text)
+METRICS = {
+    'wall': ('app_request_duration_seconds', 'Request wall time'),
+    'sql_count': ('app_request_sql_statements', 'SQL statements per request'),
+    'sql_time': ('app_request_sql_duration_seconds', 'Time spent in SQL per request'),
+    'template_time': ('app_request_template_duration_seconds', 'Template render time per request'),
+    'peak_bytes': ('app_request_peak_allocation_bytes', 'Peak Python allocation per request'),
+}
+
+_samples = {}
+# endpoint -> {field: [count, sum]} over every sample since start (or reset)
+_totals = {}
+_lock = Lock()
+
+
+class _Measurement:
+    __slots__ = ('start', 'sql_count', 'sql_time', 'template_time', 'template_starts')
+
+    def __init__(self):
+        self.start = time.perf_counter()
+        self.sql_count = 0
+        self.sql_time = 0.0
+        self.template_time = 0.0
+        self.template_starts = []
+
+
+def _current():
+    if has_request_context():
+        return g.get('perf_measurement')
+    return None
+
+
+def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    if _current() is not None:
+        conn.info['perf_query_start'] = time.perf_counter()
+
+
+def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    measurement = _current()
+    start = conn.info.pop('perf_query_start', None)
+    if measurement is not None and start is not None:
+        measurement.sql_count += 1
+        measurement.sql_time += time.perf_counter() - start
+
+
+def _before_render(sender, template, context, **extra):
+    measurement = _current()
+    if measurement is not None:
+        measurement.template_starts.append(time.perf_counter())
+
+
+def _rendered(sender, template, context, **extra):
+    measurement = _current()
+    if measurement is not None and measurement.template_starts:
+        measurement.template_time += time.perf_counter() - measurement.template_starts.pop()
+
+
+def _start(app):
+    rate = app.config.get('PROFILING_SAMPLE_RATE', DEFAULT_SAMPLE_RATE)
+    trace_memory = app.config.get('PROFILING_TRACE_MEMORY', False)
+
+    def start():
+        if random.random() >= rate:
+            return
+        if trace_memory:
+            if not tracemalloc.is_tracing():
+                tracemalloc.start()
+            tracemalloc.reset_peak()
+        g.perf_measurement = _Measurement()
+    return start
+
+
+def _finish(app):
+    window = app.config.get('PROFILING_WINDOW', DEFAULT_WINDOW)
+
+    def finish(response):
+        measurement = g.pop('perf_measurement', None)
+        if measurement is None:
+            return response
+        peak = tracemalloc.get_traced_memory()[1] if tracemalloc.is_tracing() else None
+        record(request.endpoint or 'unmatched', Sample(
+            time.perf_counter() - measurement.start, measurement.sql_count, measurement.sql_time,
+            measurement.template_time, peak,
+        ), window)
+        return response
+    return finish
+
+
+def record(endpoint, sample, window=DEFAULT_WINDOW):
+    with _lock:
+        samples = _samples.get(endpoint)
+        if samples is None:
+            samples = _samples[endpoint] = deque(maxlen=window)
+        samples.append(sample)
+        totals = _totals.get(endpoint)
+        if totals is None:
+            totals = _totals[endpoint] = {field: [0, 0] for field in Sample._fields}
+        for field, value in zip(Sample._fields, sample):
+            if value is not None:
+                totals[field][0] += 1
+                totals[field][1] += value
+
+
+def reset():
+    with _lock:
+        _samples.clear()
+        _totals.clear()
+
+
+def _quantile(ordered, q):
+    # Nearest-rank
+    return ordered[min(len(ordered) - 1, max(0, int(round(q * len(ordered))) - 1))]
+
+
+def summary():
+    """
+    ``{endpoint: {'count': n, field: {'sum': s, 0.5: p50, 0.95: p95, 0.99: p99,
+    'total_count': N, 'total_sum': S}}}``: ``count``, ``sum`` and the quantiles
+    over the window, ``total_*`` over every sample.
+    """
+    with _lock:
+        snapshot = {endpoint: list(samples) for endpoint, samples in _samples.items()}
+        totals = {endpoint: {field: tuple(total) for field, total in fields.items()}
+                  for endpoint, fields in _totals.items()}
+    result = {}
+    for endpoint, samples in sorted(snapshot.items()):
+        stats = {'count': len(samples)}
+        for field in Sample._fields:
+            values = sorted(getattr(sample, field) for sample in samples if getattr(sample, field) is not None)
+            if values:
+                total_count, total_sum = totals[endpoint][field]
+                stats[field] = {'sum': sum(values), **{q: _quantile(values, q) for q in QUANTILES},
+                                'total_count': total_count, 'total_sum': total_sum}
+        result[endpoint] = stats
+    return result
+
+
+def _label(value):
+    return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+def prometheus_text():
+    """
+    The summary in the Prometheus text exposition format (one summary per
+    measured field): quantiles over the window, cumulative ``_sum``/``_count``.
+    """
+    stats = summary()
+    lines = []
+    for field, (name, help_text) in METRICS.items():
+        lines.append(f'# HELP {name} {help_text} (sampled requests)')
+        lines.append(f'# TYPE {name} summary')
+        for endpoint, endpoint_stats in stats.items():
+            values = endpoint_stats.get(field)
+            if not values:
+                continue
+            label = f'endpoint="{_label(endpoint)}"'
+            for q in QUANTILES:
+                lines.append(f'{name}{{{label},quantile="{q}"}} {values[q]:.6g}')
+            lines.append(f'{name}_sum{{{label}}} {values["total_sum"]!r}')
+            lines.append(f'{name}_count{{{label}}} {values["total_count"]}')
+    return '\n'.join(lines) + '\n'
+
+
+def init_app(app):
+    if not app.config.get('PROFILING_ENABLED'):
+        return
+    if not event.contains(Engine, 'before_cursor_execute', _before_cursor_execute):
+        event.listen(Engine, 'before_cursor_execute', _before_cursor_execute)
+        event.listen(Engine, 'after_cursor_execute', _after_cursor_execute)
+    before_render_template.connect(_before_render, app)
+    template_rendered.connect(_rendered, app)
+    app.before_request(_start(app))
+    app.after_request(_finish(app))
@@ -0,0 +1,96 @@
+# Column-projected reads for the JSON API
+"""
+The ``to_dict()`` shapes of contacts, products, budgets, purchase orders,
+invoices and sale orders, read without building ORM objects.
+
+Each resource selects only the columns its ``to_dict()`` returns and turns
+the rows straight into dicts. Document lines for a whole page come from one
+``IN`` query on the line table (again only the ``to_dict()`` columns) and
+are attached in memory, instead of a lazy ``lines`` load per document.
+Pages are keyset-paginated in the order of the admin lists, so deep pages
+cost the same as the first one and use the same indexes.
+"""
+from collections import namedtuple
+from app import db
+from app.models import (Contact, Product, Budget, PurchaseOrder, PurchaseOrderLine, Invoice, InvoiceLine,
+                        SaleOrder, SaleOrderLine)
+from app.services import pagination
+
+Resource = namedtuple('Resource', ['model', 'date_column', 'columns', 'line_model', 'line_fk', 'line_columns'])
+
+_ORDER_LINE_COLUMNS = ['id', 'product_name', 'budget_analytics', 'quantity', 'unit_price', 'total']
+
+# API name -> columns as in the model's to_dict() (lines as in the line model's)
+RESOURCES = {
+    'contacts': Resource(Contact, None,
+                         ['id', 'name', 'email', 'phone', 'company', 'address', 'image_url', 'is_archived'],
+                         None, None, None),
+    'products': Resource(Product, None,
+                         ['id', 'name', 'category', 'description', 'sales_price', 'purchase_price', 'price', 'cost',
+                          'quantity', 'image_url', 'is_archived'],
+                         None, None, None),
+    'budgets': Resource(Budget, None,
+                        ['id', 'name', 'period_start', 'period_end', 'analytical_account', 'total_amount',
+                         'description', 'is_archived'],
+                        None, None, None),
+    'purchase-orders': Resource(PurchaseOrder, PurchaseOrder.order_date,
+                                ['id', 'order_number', 'reference', 'vendor_name', 'order_date', 'expected_delivery',
+                                 'total_amount', 'status', 'notes', 'is_archived'],
+                                PurchaseOrderLine, 'po_id', _ORDER_LINE_COLUMNS),
+    'invoices': Resource(Invoice, Invoice.invoice_date,
+                         ['id', 'invoice_number', 'customer_id', 'customer_name', 'invoice_date', 'due_date',
+                          'subtotal', 'tax_amount', 'total_amount', 'paid_amount', 'balance_due', 'status',
+                          'payment_terms', 'notes', 'is_archived'],
+                         InvoiceLine, 'invoice_id',
+                         ['id', 'product_name', 'description', 'budget_analytics', 'quantity', 'unit_price',
+                          'tax_rate', 'tax_amount', 'total']),
+    'sale-orders': Resource(SaleOrder, SaleOrder.order_date,
+                            ['id', 'order_number', 'customer_id', 'customer_name', 'order_date', 'total_amount',
+                             'status', 'notes', 'is_archived'],
+                            SaleOrderLine, 'so_id', _ORDER_LINE_COLUMNS),
+}
+
+
+def _query(resource, include_archived):
+    query = db.session.query(*[getattr(resource.model, name) for name in resource.columns])
+    if not include_archived:
+        query = query.filter(resource.model.is_archived == False)  # noqa: E712
+    return query
+
+
+def _attach_lines(resource, records):
+    if resource.line_model is None or not records:
+        return records
+    fk = getattr(resource.line_model, resource.line_fk)
+    columns = [getattr(resource.line_model, name) for name in resource.line_columns]
+    lines = {record['id']: [] for record in records}
+    rows = db.session.execute(
+        db.select(fk, *columns).where(fk.in_(list(lines))).order_by(fk, resource.line_model.id)
+    )
+    names = resource.line_columns
+    for parent_id, *values in rows:
+        lines[parent_id].append(dict(zip(names, values)))
+    for record in records:
+        record['lines'] = lines[record['id']]
+    return records
+
+
+def page(kind, include_archived=False, per_page=None):
+    """
+    One ``KeysetPage`` of ``kind`` (cursor from the request args, as in
+    ``pagination.paginate``) whose items are ``to_dict()``-shaped dicts.
+    """
+    resource = RESOURCES[kind]
+    result = pagination.paginate(_query(resource, include_archived), resource.model.id, resource.date_column,
+                                 per_page=per_page)
+    result.items = _attach_lines(resource, [dict(zip(resource.columns, row)) for row in result.items])
+    return result
+
+
+def get(kind, id):
+    """The ``to_dict()``-shaped dict of one ``kind`` row (archived included), None when missing."""
+    resource = RESOURCES[kind]
+    row = _query(resource, include_archived=True).filter(resource.model.id == id).first()
+    if row is None:
+        return None
+    return _attach_lines(resource, [dict(zip(resource.columns, row))])[0]
@@ -0,0 +1,60 @@
+# N+1 query detection
+"""
+Debug-mode detector for N+1 query patterns.
+
+Every statement executed while handling a request is counted by its SQL text
+(parameters are bound separately, so the text identifies the statement
+shape). After the request, any statement run more than
+``NPLUSONE_THRESHOLD`` times is logged as a warning together with the
+endpoint, which almost always means a lazy relationship is loaded inside a
+loop and the route should use a loader profile (see ``loading``).
+
+Enabled with ``NPLUSONE_DETECT``. Left unset, it follows the app's debug
+flag at request time, so ``app.run(debug=True)`` turns it on too.
+"""
+from collections import Counter
+from flask import current_app, g, has_request_context, request
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+
+DEFAULT_THRESHOLD = 10
+
+
+def _count_statement(conn, cursor, statement, parameters, context, executemany):
+    if has_request_context() and 'sql_statement_counts' in g:
+        g.sql_statement_counts[statement] += 1
+
+
+def _start_request():
+    detect = current_app.config.get('NPLUSONE_DETECT')
+    if not (current_app.debug if detect is None else detect):
+        return
+    g.sql_statement_counts = Counter()
+
+
+def _report(app):
+    def report(response):
+        counts = g.pop('sql_statement_counts', None)
+        if not counts:
+            return response
+        threshold = app.config.get('NPLUSONE_THRESHOLD', DEFAULT_THRESHOLD)
+        for statement, count in counts.most_common():
+            if count <= threshold:
+                break
+            app.logger.warning(
+                'Possible N+1: %s %s (%s) ran the same statement %d times: %s',
+                request.method, request.path, request.endpoint, count,
+                ' '.join(statement.split())[:300],
+            )
+        return response
+    return report
+
+
+def init_app(app):
+    # Unset means "in debug mode", which app.run(debug=...) may still change
+    if app.config.get('NPLUSONE_DETECT') is False:
+        return
+    if not event.contains(Engine, 'before_cursor_execute', _count_statement):
+        event.listen(Engine, 'before_cursor_execute', _count_statement)
+    app.before_request(_start_request)
+    app.after_request(_report(app))
@@ -0,0 +1,104 @@
+# Query plan checks
+"""
+EXPLAIN-based regression check for the indexes behind the hot queries.
+
+Each entry of ``_checks()`` rebuilds one query the way its route or service
+builds it, through the same ``loading`` profile (first page of a list with
+its joined partners, a document with its joined lines, portal filters, line
+lookups), and names the index its plan must use. ``run()`` explains every query on the current
+database and reports the ones whose plan does not mention that index;
+``flask indexes check`` and ``benchmarks/test_query_plans.py`` fail when
+there are any, so a model or query change that silently drops an index
+shows up in CI or after a migration.
+
+On PostgreSQL sequential scans are disabled for the check (``SET LOCAL``),
+since on small tables the planner rightly prefers them and the question here
+is whether the index *can* serve the query.
+"""
+from collections import namedtuple
+from sqlalchemy import text
+from app import db
+from app.models import (Contact, PurchaseOrder, PurchaseOrderLine, VendorBill, VendorBillLine,
+                        Invoice, InvoiceLine, SaleOrder, SaleOrderLine)
+from app.services import loading, pagination
+
+PlanCheck = namedtuple('PlanCheck', ['name', 'index', 'ok', 'plan'])
+
+# A user id and page size for the parameterised shapes; the values do not matter
+_USER_ID = 1
+_PAGE = 51
+
+
+def _list_page(query, id_column, date_column=None):
+    forward, _ = pagination.ordering(id_column, date_column)
+    return query.order_by(*forward).limit(_PAGE)
+
+
+def _detail(model):
+    return loading.query(model, 'detail').filter(model.id == 1)
+
+
+def _checks():
+    billed = db.select(VendorBill.id).where(VendorBill.po_id == PurchaseOrder.id).exists()
+    purchase_orders, vendor_bills, invoices, sale_orders = (
+        loading.query(model, 'list') for model in (PurchaseOrder, VendorBill, Invoice, SaleOrder))
+    return [
+        ('admin purchase order list', 'ix_purchase_orders_active_list',
+         _list_page(purchase_orders.filter_by(is_archived=False), PurchaseOrder.id, PurchaseOrder.order_date)),
+        ('admin vendor bill list', 'ix_vendor_bills_active_list',
+         _list_page(vendor_bills.filter_by(is_archived=False), VendorBill.id, VendorBill.bill_date)),
+        ('admin sale order list', 'ix_sale_orders_active_list',
+         _list_page(sale_orders.filter_by(is_archived=False), SaleOrder.id, SaleOrder.order_date)),
+        ('portal invoice list', 'ix_invoices_customer_list',
+         _list_page(invoices.filter_by(customer_id=_USER_ID, is_archived=False), Invoice.id, Invoice.invoice_date)),
+        ('portal sale order list', 'ix_sale_orders_customer_list',
+         _list_page(sale_orders.filter_by(customer_id=_USER_ID, is_archived=False), SaleOrder.id, SaleOrder.order_date)),
+        ('portal draft purchase orders', 'ix_purchase_orders_user_status',
+         _list_page(purchase_orders.filter_by(user_id=_USER_ID, is_archived=False, status='draft'),
+                    PurchaseOrder.id, PurchaseOrder.order_date)),
+        ('portal received purchase orders', 'ix_purchase_orders_vendor_status',
+         _list_page(purchase_orders.filter_by(vendor_id=_USER_ID, is_archived=False)
+                    .filter(PurchaseOrder.status.in_(['sent', 'received'])), PurchaseOrder.id, PurchaseOrder.order_date)),
+        ('purchase order detail', 'ix_purchase_order_lines_po_id', _detail(PurchaseOrder)),
+        ('vendor bill detail', 'ix_vendor_bill_lines_bill_id', _detail(VendorBill)),
+        ('invoice detail', 'ix_invoice_lines_invoice_id', _detail(Invoice)),
+        ('sale order detail', 'ix_sale_order_lines_so_id', _detail(SaleOrder)),
+        ('portal bill totals', 'ix_vendor_bills_vendor_payment_status',
+         db.session.query(db.func.sum(VendorBill.total_amount)).filter_by(vendor_id=_USER_ID, is_archived=False)),
+        ('vendor contact by name', 'ix_contacts_name',
+         Contact.query.filter_by(name='x').limit(1)),
+        # The export profile's selectinload and lazy loads of lines
+        ('purchase order lines', 'ix_purchase_order_lines_po_id',
+         PurchaseOrderLine.query.filter(PurchaseOrderLine.po_id.in_([1, 2]))),
+        ('vendor bill lines', 'ix_vendor_bill_lines_bill_id', VendorBillLine.query.filter(VendorBillLine.bill_id.in_([1, 2]))),
+        ('invoice lines', 'ix_invoice_lines_invoice_id', InvoiceLine.query.filter(InvoiceLine.invoice_id.in_([1, 2]))),
+        ('sale order lines', 'ix_sale_order_lines_so_id', SaleOrderLine.query.filter(SaleOrderLine.so_id.in_([1, 2]))),
+        ('unbilled purchase orders', 'ix_vendor_bills_po_id',
+         db.select(PurchaseOrder.id).where(PurchaseOrder.status == 'confirmed', ~billed)),
+        ('confirmed sale orders', 'ix_sale_orders_status',
+         db.select(SaleOrder.id).where(SaleOrder.status == 'confirmed', SaleOrder.is_archived.isnot(True))),
+    ]
+
+
+def explain(statement):
+    """The plan of ``statement`` (a Select or ORM query) as text."""
+    statement = getattr(statement, 'statement', statement)
+    sql = statement.compile(db.engine, compile_kwargs={'literal_binds': True})
+    if db.engine.dialect.name == 'sqlite':
+        rows = db.session.execute(text(f'EXPLAIN QUERY PLAN {sql}'))
+        return '\n'.join(row[-1] for row in rows)
+    return '\n'.join(row[0] for row in db.session.execute(text(f'EXPLAIN {sql}')))
+
+
+def run():
+    """``PlanCheck`` for every entry of the check list; leaves the transaction rolled back."""
+    try:
+        if db.engine.dialect.name == 'postgresql':
+            db.session.execute(text('SET LOCAL enable_seqscan = off'))
+        results = []
+        for name, index, query in _checks():
+            plan = explain(query)
+            results.append(PlanCheck(name, index, index in plan, plan))
+        return results
+    finally:
+        db.session.rollback()
@@ -0,0 +1,168 @@
+# Reference data service logic
+"""
+Cached pick-lists for the order, budget and rule forms: active contacts,
+products and analytical accounts, and portal users; plus the active
+auto-analytical rules the line matcher is compiled from.
+
+Each list is materialised once per process as light namedtuples (only the
+columns the forms render) and tagged with a version from the
+``cache_versions`` table. Any flush that inserts, updates or deletes one of
+the underlying rows bumps that version in the same transaction, so every
+worker process notices the change on its next request. A request reads all
+versions with a single primary-key query, however many lists it renders.
+Writes that bypass the ORM must call ``bump`` themselves.
+"""
+from collections import namedtuple
+from threading import Lock
+from flask import g, has_request_context
+from sqlalchemy import event
+from sqlalchemy.exc import IntegrityError
+from app import db
+from app.models import AutoAnalyticalModel, CacheVersion, Contact, Product, AnalyticalAccount, Users
+
+ContactRef = namedtuple('ContactRef', ['id', 'name', 'email'])
+ProductRef = namedtuple('ProductRef', ['id', 'name', 'sales_price', 'purchase_price'])
+AccountRef = namedtuple('AccountRef', ['id', 'name', 'code', 'account_type'])
+PortalUserRef = namedtuple('PortalUserRef', ['id', 'name', 'username', 'email'])
+RuleRef = namedtuple('RuleRef', ['id', 'product_name', 'vendor_name', 'analytical_account_name'])
+
+
+def _contacts():
+    return Contact.query.filter_by(is_archived=False).order_by(Contact.id) \
+        .with_entities(Contact.id, Contact.name, Contact.email)
+
+
+def _products():
+    return Product.query.filter_by(is_archived=False).order_by(Product.id) \
+        .with_entities(Product.id, Product.name, Product.sales_price, Product.purchase_price)
+
+
+def _analytical_accounts():
+    return AnalyticalAccount.query.filter_by(is_archived=False).order_by(AnalyticalAccount.id) \
+        .with_entities(AnalyticalAccount.id, AnalyticalAccount.name, AnalyticalAccount.code,
+                       AnalyticalAccount.account_type)
+
+
+def _portal_users():
+    return Users.query.filter_by(role='portal').order_by(Users.id) \
+        .with_entities(Users.id, Users.name, Users.username, Users.email)
+
+
+def _analytics_rules():
+    return AutoAnalyticalModel.query.filter_by(is_active=True).order_by(AutoAnalyticalModel.id) \
+        .with_entities(AutoAnalyticalModel.id, AutoAnalyticalModel.product_name, AutoAnalyticalModel.vendor_name,
+                       AutoAnalyticalModel.analytical_account_name)
+
+
+# Cache name -> (model whose writes invalidate it, row type, query)
+KINDS = {
+    'contacts': (Contact, ContactRef, _contacts),
+    'products': (Product, ProductRef, _products),
+    'analytical_accounts': (AnalyticalAccount, AccountRef, _analytical_accounts),
+    'portal_users': (Users, PortalUserRef, _portal_users),
+    'analytics_rules': (AutoAnalyticalModel, RuleRef, _analytics_rules),
+}
+_KIND_BY_MODEL = {model: kind for kind, (model, _, _) in KINDS.items()}
+
+_store = {}
+_store_lock = Lock()
+
+
+def _ensure_version_rows(missing):
+    # Tables created without the migration have no counters yet; add them
+    # in their own transaction so a concurrent insert cannot fail the request
+    with db.engine.begin() as conn:
+        for name in missing:
+            try:
+                with conn.begin_nested():
+                    conn.execute(db.insert(CacheVersion).values(name=name, version=0))
+            except IntegrityError:
+                pass
+
+
+def _versions():
+    if has_request_context() and 'reference_versions' in g:
+        return g.reference_versions
+    query = db.select(CacheVersion.name, CacheVersion.version)
+    versions = dict(db.session.execute(query).all())
+    missing = [name for name in KINDS if name not in versions]
+    if missing:
+        _ensure_version_rows(missing)
+        versions = dict(db.session.execute(query).all())
+    if has_request_context():
+        g.reference_versions = versions
+    return versions
+
+
+def version(kind):
+    """The current version of ``kind``; changes whenever its rows do."""
+    return _versions().get(kind)
+
+
+def is_pending():
+    """True while the session holds an uncommitted bump (results must not be cached yet)."""
+    return bool(db.session.info.get('reference_data_bumped'))
+
+
+def get(kind):
+    """The cached rows of ``kind`` (see ``KINDS``) as namedtuples."""
+    _, row_type, query = KINDS[kind]
+    version = _versions().get(kind)
+    cached = _store.get(kind)
+    if version is not None and cached and cached[0] == version:
+        return cached[1]
+
+    rows = [row_type(*row) for row in query()]
+    # Rows read after an uncommitted bump may still be rolled back
+    if version is not None and not is_pending():
+        with _store_lock:
+            _store[kind] = (version, rows)
+    return rows
+
+
+def contacts():
+    return get('contacts')
+
+
+def products():
+    return get('products')
+
+
+def analytical_accounts():
+    return get('analytical_accounts')
+
+
+def portal_users():
+    return get('portal_users')
+
+
+def bump(*kinds, connection=None):
+    """Invalidate ``kinds`` everywhere by advancing their versions (part of the current transaction)."""
+    if not kinds:
+        return
+    connection = connection or db.session.connection()
+    connection.execute(
+        db.update(CacheVersion.__table__)
+        .where(CacheVersion.__table__.c.name.in_(list(kinds)))
+        .values(version=CacheVersion.__table__.c.version + 1)
+    )
+    db.session.info['reference_data_bumped'] = True
+    if has_request_context():
+        g.pop('reference_versions', None)
+
+
+@event.listens_for(db.session, 'after_flush')
+def _bump_changed(session, flush_context):
+    kinds = {
+        _KIND_BY_MODEL[type(obj)]
+        for obj in list(session.new) + list(session.dirty) + list(session.deleted)
+        if type(obj) in _KIND_BY_MODEL
+    }
+    if kinds:
+        bump(*sorted(kinds), connection=session.connection())
+
+
+@event.listens_for(db.session, 'after_commit')
+@event.listens_for(db.session, 'after_rollback')
+def _clear_bumped(session):
+    session.info.pop('reference_data_bumped', None)
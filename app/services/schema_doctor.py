@@ -0,0 +1,144 @@
+# Schema drift check and repair
+"""
+Compare the live database schema with the models and repair the difference.
+
+The live schema is reflected once (``MetaData.reflect``, which on PostgreSQL
+reads every table's columns, indexes and foreign keys with one catalog query
+per kind instead of a few per table) and diffed in memory against
+``db.metadata``. ``check()`` lists what is missing as ``Issue`` rows:
+
+    table     a model table that does not exist (created with its indexes)
+    column    a model column that does not exist (added; NOT NULL without a
+              server default is added nullable and reported, since existing
+              rows have no value for it)
+    index     a named model index that does not exist
+    fk        a foreign key that does not exist (PostgreSQL; SQLite cannot
+              add constraints to an existing table)
+    nullable  a NOT NULL model column that is nullable in the database
+              (PostgreSQL; fails if the column holds NULLs)
+
+Only missing things are reported: extra live columns, indexes (e.g. the
+search indexes) and tables are left alone. ``repair()`` applies every
+fixable issue in one transaction, so a failing statement leaves the schema
+as it was (on SQLite too, where the transaction is begun explicitly: pysqlite
+would otherwise run each DDL statement outside it). Type differences are out of scope; they are migrations.
+"""
+from collections import namedtuple
+from contextlib import contextmanager
+from sqlalchemy import MetaData
+from sqlalchemy.schema import AddConstraint, CreateColumn, CreateIndex, CreateTable
+from app import db
+
+Issue = namedtuple('Issue', ['kind', 'table', 'name', 'detail', 'statements'])
+
+
+def _fk_key(constraint):
+    """(local columns, referred table, referred columns) of a foreign key."""
+    return (tuple(element.parent.name for element in constraint.elements), constraint.referred_table.name,
+            tuple(element.column.name for element in constraint.elements))
+
+
+def _column_ddl(column, dialect, nullable):
+    spec = str(CreateColumn(column).compile(dialect=dialect))
+    if not nullable:
+        return spec
+    # Drop NOT NULL (and the primary key clause SQLite rejects in ADD COLUMN)
+    return spec.replace(' NOT NULL', '').replace(' PRIMARY KEY', '')
+
+
+def _missing_table(table, dialect):
+    statements = [str(CreateTable(table).compile(dialect=dialect)).strip()]
+    statements += [str(CreateIndex(index).compile(dialect=dialect)) for index in table.indexes]
+    return Issue('table', table.name, table.name, 'table missing', statements)
+
+
+def _table_issues(table, live, dialect):
+    issues = []
+    live_columns = {column.name: column for column in live.columns}
+    preparer = dialect.identifier_preparer
+    for column in table.columns:
+        existing = live_columns.get(column.name)
+        if existing is None:
+            nullable = not column.nullable and column.server_default is None
+            detail = 'column missing'
+            if nullable:
+                detail += '; added without NOT NULL, set it once existing rows have values'
+            issues.append(Issue('column', table.name, column.name, detail, [
+                f"ALTER TABLE {preparer.format_table(table)} ADD COLUMN {_column_ddl(column, dialect, nullable)}"
+            ]))
+        elif not column.nullable and existing.nullable and not column.primary_key:
+            statements = []
+            if dialect.name == 'postgresql':
+                statements.append(f"ALTER TABLE {preparer.format_table(table)} "
+                                  f"ALTER COLUMN {preparer.format_column(column)} SET NOT NULL")
+            issues.append(Issue('nullable', table.name, column.name, 'column allows NULL', statements))
+
+    live_indexes = {index.name for index in live.indexes}
+    live_indexes |= {constraint.name for constraint in live.constraints if constraint.name}
+    for index in table.indexes:
+        if index.name not in live_indexes:
+            issues.append(Issue('index', table.name, index.name, 'index missing',
+                                [str(CreateIndex(index).compile(dialect=dialect))]))
+
+    live_fks = {_fk_key(constraint) for constraint in live.foreign_key_constraints}
+    for constraint in table.foreign_key_constraints:
+        key = _fk_key(constraint)
+        if key in live_fks:
+            continue
+        statements = []
+        if dialect.name != 'sqlite':
+            statements.append(str(AddConstraint(constraint).compile(dialect=dialect)))
+        issues.append(Issue('fk', table.name, ', '.join(key[0]),
+                            f"foreign key to {key[1]}({', '.join(key[2])}) missing", statements))
+    return issues
+
+
+def check(connection=None):
+    """Every ``Issue`` between the models and the database on ``connection`` (default: a new one)."""
+    if connection is None:
+        with db.engine.connect() as connection:
+            return check(connection)
+    dialect = connection.dialect
+    live = MetaData()
+    live.reflect(bind=connection, only=lambda name, _: name in db.metadata.tables)
+    issues = []
+    for table in db.metadata.sorted_tables:
+        if table.name not in live.tables:
+            issues.append(_missing_table(table, dialect))
+        else:
+            issues += _table_issues(table, live.tables[table.name], dialect)
+    return issues
+
+
+@contextmanager
+def _transaction():
+    """A connection inside one transaction that also covers DDL."""
+    engine = db.engine
+    if engine.dialect.name != 'sqlite':
+        with engine.begin() as connection:
+            yield connection
+        return
+    with engine.connect() as connection:
+        connection = connection.execution_options(isolation_level='AUTOCOMMIT')
+        connection.exec_driver_sql('BEGIN')
+        try:
+            yield connection
+        except BaseException:
+            connection.exec_driver_sql('ROLLBACK')
+            raise
+        connection.exec_driver_sql('COMMIT')
+
+
+def repair(issues=None):
+    """
+    Apply the fixable ``issues`` (default: a fresh ``check()``) in one
+    transaction; returns ``(applied, unfixable)``.
+    """
+    with _transaction() as connection:
+        if issues is None:
+            issues = check(connection)
+        applied = [issue for issue in issues if issue.statements]
+        for issue in applied:
+            for statement in issue.statements:
+                connection.exec_driver_sql(statement)
+    return applied, [issue for issue in issues if not issue.statements]
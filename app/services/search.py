@@ -0,0 +1,150 @@
+# Typeahead search service logic
+"""
+Top-K name lookups for the form typeaheads (products, vendors, customers).
+
+The lookup uses whatever text index the database has:
+
+PostgreSQL
+    ``ILIKE '%term%'`` served by ``pg_trgm`` GIN indexes on the name columns;
+    prefix matches rank first, then trigram ``similarity()``.
+SQLite
+    FTS5 external-content tables (``<table>_fts``, kept in sync by triggers)
+    queried with per-word prefix terms (``"desk"* "la"*``), ranked by bm25.
+anything else
+    A plain case-insensitive prefix match.
+
+Customers are searched (and indexed) by ``coalesce(name, username)``, the
+name the forms show for portal users without one.
+
+The indexes are created by migrations 9d3b7e21c4a8 and 6e0d4b8c2a95;
+``ensure_indexes()`` (``flask search reindex``) adds or rebuilds them on
+databases built with ``create_all``.
+"""
+from collections import namedtuple
+from sqlalchemy import case, func, table as sql_table, text
+from app import db
+from app.models import Contact, Product, Users
+
+DEFAULT_LIMIT = 10
+MAX_LIMIT = 50
+
+_customer_name = func.coalesce(Users.name, Users.username)
+
+# Search name -> (model, searched expression, extra filters, columns returned)
+SEARCHES = {
+    'products': (Product, Product.name, [Product.is_archived == False],  # noqa: E712
+                 [Product.id, Product.name, Product.sales_price, Product.purchase_price]),
+    'vendors': (Contact, Contact.name, [Contact.is_archived == False],  # noqa: E712
+                [Contact.id, Contact.name, Contact.email]),
+    'customers': (Users, _customer_name, [Users.role == 'portal'],
+                  [Users.id, _customer_name.label('name'), Users.username]),
+}
+
+# Indexed text of a table as SQL over a row prefix ('new.', 'old.' or ''),
+# the columns it reads and the name of its pg_trgm index
+IndexedText = namedtuple('IndexedText', ['sql', 'columns', 'trgm_index'])
+_INDEXED_TEXT = {
+    'users': IndexedText('coalesce({row}name, {row}username)', ('name', 'username'), 'ix_users_display_name_trgm'),
+}
+
+
+def _indexed_text(table):
+    return _INDEXED_TEXT.get(table) or IndexedText('{row}name', ('name',), f'ix_{table}_name_trgm')
+
+_fts_tables = {}
+
+
+def _escape_like(term):
+    return term.replace('\\', '\\\\').replace('%', '\\%').replace('_', '\\_')
+
+
+def _fts_query(term):
+    # Each word becomes a quoted prefix term so FTS5 syntax in the input is inert
+    words = [word.replace('"', '""') for word in term.split()]
+    return ' '.join(f'"{word}"*' for word in words)
+
+
+def _has_fts(table):
+    url = str(db.engine.url)
+    tables = _fts_tables.get(url)
+    if tables is None:
+        rows = db.session.execute(text(
+            "SELECT name FROM sqlite_master WHERE type = 'table' AND name LIKE '%\\_fts' ESCAPE '\\'"))
+        tables = _fts_tables[url] = {row[0] for row in rows}
+    return f'{table}_fts' in tables
+
+
+def typeahead(kind, term, limit=DEFAULT_LIMIT):
+    """Up to ``limit`` best matches for ``term`` in search ``kind``, as dicts."""
+    model, column, filters, columns = SEARCHES[kind]
+    term = (term or '').strip()
+    if not term:
+        return []
+    limit = max(1, min(int(limit or DEFAULT_LIMIT), MAX_LIMIT))
+
+    query = db.select(*columns).where(*filters).limit(limit)
+    dialect = db.engine.dialect.name
+    table = model.__table__.name
+    prefix = _escape_like(term) + '%'
+
+    if dialect == 'postgresql':
+        query = query.where(column.ilike('%' + prefix, escape='\\')).order_by(
+            case((column.ilike(prefix, escape='\\'), 0), else_=1),
+            func.similarity(column, term).desc(),
+            column,
+        )
+    elif dialect == 'sqlite' and _has_fts(table):
+        fts = f'{table}_fts'
+        query = (
+            query.join(sql_table(fts), text(f'{fts}.rowid = {table}.id'))
+            .where(text(f'{fts} MATCH :match').bindparams(match=_fts_query(term)))
+            .order_by(text(f'{fts}.rank'))
+        )
+    else:
+        query = query.where(column.ilike(prefix, escape='\\')).order_by(column)
+
+    return [row._asdict() for row in db.session.execute(query)]
+
+
+def _sqlite_fts_ddl(table):
+    fts = f'{table}_fts'
+    indexed = _indexed_text(table)
+    new, old, current = (indexed.sql.format(row=row) for row in ('new.', 'old.', ''))
+    # Triggers are recreated and the index refilled, so a rebuild picks up a changed indexed text
+    return [
+        f"CREATE VIRTUAL TABLE IF NOT EXISTS {fts} USING fts5("
+        f"name, content='{table}', content_rowid='id', prefix='2 3', "
+        f"tokenize='unicode61 remove_diacritics 2')",
+        *[f"DROP TRIGGER IF EXISTS {fts}_{suffix}" for suffix in ('ai', 'ad', 'au')],
+        f"CREATE TRIGGER {fts}_ai AFTER INSERT ON {table} BEGIN "
+        f"INSERT INTO {fts}(rowid, name) VALUES (new.id, {new}); END",
+        f"CREATE TRIGGER {fts}_ad AFTER DELETE ON {table} BEGIN "
+        f"INSERT INTO {fts}({fts}, rowid, name) VALUES ('delete', old.id, {old}); END",
+        f"CREATE TRIGGER {fts}_au AFTER UPDATE OF {', '.join(indexed.columns)} ON {table} BEGIN "
+        f"INSERT INTO {fts}({fts}, rowid, name) VALUES ('delete', old.id, {old}); "
+        f"INSERT INTO {fts}(rowid, name) VALUES (new.id, {new}); END",
+        f"INSERT INTO {fts}({fts}) VALUES ('delete-all')",
+        f"INSERT INTO {fts}(rowid, name) SELECT id, {current} FROM {table}",
+    ]
+
+
+def index_ddl(dialect, table):
+    """Statements that create (or rebuild) the typeahead index on ``table``."""
+    if dialect == 'postgresql':
+        indexed = _indexed_text(table)
+        return [f"CREATE INDEX IF NOT EXISTS {indexed.trgm_index} ON {table} "
+                f"USING gin (({indexed.sql.format(row='')}) gin_trgm_ops)"]
+    if dialect == 'sqlite':
+        return _sqlite_fts_ddl(table)
+    return []
+
+
+def ensure_indexes():
+    """Create missing typeahead indexes for every search; callers commit."""
+    dialect = db.engine.dialect.name
+    if dialect == 'postgresql':
+        db.session.execute(text('CREATE EXTENSION IF NOT EXISTS pg_trgm'))
+    for model, *_ in SEARCHES.values():
+        for statement in index_ddl(dialect, model.__table__.name):
+            db.session.execute(text(statement))
+    _fts_tables.clear()
@@ -0,0 +1,148 @@
+# Document number sequences
+"""
+Concurrency-safe document number allocation.
+
+Each prefix (``PO``, ``PPO``, ``SO``, ``PSO``, ``INV-``, ``Bill/2026``,
+``PAY/2026`` ...) has a counter row in the ``sequences`` table. Counters are
+advanced in their own short transaction, separate from the request's session,
+under a row lock (``SELECT ... FOR UPDATE`` on PostgreSQL, ``BEGIN IMMEDIATE``
+on SQLite), so two requests never get the same number and a slow request
+never holds the counter. Like database sequences, numbers consumed by a
+request that later rolls back leave a gap.
+
+With ``SEQUENCE_BLOCK_SIZE`` > 1 each worker reserves a block of numbers at
+once and hands them out from memory; numbers stay unique but are no longer
+strictly ordered across workers.
+"""
+from threading import Lock
+from flask import current_app
+from sqlalchemy.exc import IntegrityError
+from app import db
+from app.models import Sequence, PurchaseOrder, SaleOrder, Invoice, VendorBill, Payment
+
+# Number column each prefix family is stored in, used to seed a new counter
+# from documents numbered before the sequences table existed
+_NUMBER_COLUMNS = {
+    'PO': PurchaseOrder.order_number,
+    'PPO': PurchaseOrder.order_number,
+    'SO': SaleOrder.order_number,
+    'PSO': SaleOrder.order_number,
+    'INV-': Invoice.invoice_number,
+    'Bill': VendorBill.bill_number,
+    'PAY': Payment.payment_number,
+}
+
+_blocks = {}
+_blocks_lock = Lock()
+
+
+def _separator(prefix):
+    return '/' if '/' in prefix else ''
+
+
+def format_number(prefix, value):
+    return f"{prefix}{_separator(prefix)}{value:04d}"
+
+
+def _seed_value(conn, prefix):
+    """Highest number already used with this prefix, 0 when none."""
+    column = _NUMBER_COLUMNS.get(prefix.split('/')[0])
+    if column is None:
+        return 0
+    head = prefix + _separator(prefix)
+    highest = 0
+    rows = conn.execute(db.select(column).where(column.like(head + '%')))
+    for (number,) in rows:
+        tail = number[len(head):]
+        if tail.isdigit():
+            highest = max(highest, int(tail))
+    return highest
+
+
+def _advance(conn, prefix, size):
+    """Reserve ``size`` values on ``conn``; returns the first one."""
+    row = conn.execute(
+        db.select(Sequence.next_value).where(Sequence.name == prefix).with_for_update()
+    ).first()
+    if row is None:
+        start = _seed_value(conn, prefix) + 1
+        conn.execute(db.insert(Sequence).values(name=prefix, next_value=start + size))
+    else:
+        start = row[0]
+        conn.execute(
+            db.update(Sequence).where(Sequence.name == prefix).values(next_value=start + size)
+        )
+    return start
+
+
+def _is_memory_sqlite(engine):
+    return engine.dialect.name == 'sqlite' and engine.url.database in (None, '', ':memory:')
+
+
+def _reserve(prefix, size, retries=3):
+    engine = db.engine
+    if _is_memory_sqlite(engine):
+        # A single shared connection; there is no second transaction to use
+        return _advance(db.session.connection(), prefix, size)
+
+    for attempt in range(retries):
+        try:
+            if engine.dialect.name == 'sqlite':
+                with engine.connect() as conn:
+                    conn = conn.execution_options(isolation_level='AUTOCOMMIT')
+                    conn.exec_driver_sql('BEGIN IMMEDIATE')
+                    try:
+                        start = _advance(conn, prefix, size)
+                    except Exception:
+                        conn.exec_driver_sql('ROLLBACK')
+                        raise
+                    conn.exec_driver_sql('COMMIT')
+                    return start
+            with engine.begin() as conn:
+                return _advance(conn, prefix, size)
+        except IntegrityError:
+            # Another worker created the counter row first; lock it and retry
+            if attempt == retries - 1:
+                raise
+
+
+def next_value(prefix):
+    """Allocate the next integer for ``prefix``."""
+    block_size = max(int(current_app.config.get('SEQUENCE_BLOCK_SIZE', 1)), 1)
+    if block_size == 1:
+        return _reserve(prefix, 1)
+
+    key = (id(db.engine), prefix)
+    with _blocks_lock:
+        current, end = _blocks.get(key, (0, 0))
+        if current >= end:
+            current = _reserve(prefix, block_size)
+            end = current + block_size
+        _blocks[key] = (current + 1, end)
+        return current
+
+
+def next_number(prefix):
+    """Allocate and format the next document number, e.g. ``PO0042``."""
+    return format_number(prefix, next_value(prefix))
+
+
+def next_numbers(prefix, count):
+    """Allocate ``count`` consecutive document numbers in one round-trip."""
+    if count <= 0:
+        return []
+    start = _reserve(prefix, count)
+    return [format_number(prefix, value) for value in range(start, start + count)]
+
+
+def peek_number(prefix):
+    """
+    The number the next allocation will probably get, without consuming it.
+    A prefix without a counter row gets one (seeded, nothing reserved), so
+    only the first peek scans the existing document numbers.
+    """
+    row = db.session.execute(
+        db.select(Sequence.next_value).where(Sequence.name == prefix)
+    ).first()
+    value = row[0] if row else _reserve(prefix, 0)
+    return format_number(prefix, value)
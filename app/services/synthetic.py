@@ -0,0 +1,389 @@
+# Synthetic data generation
+"""
+Fill every model with generated data at a chosen scale, to see how the app
+behaves at production volume.
+
+``COUNTS`` is the volume at scale 1; ``generate(scale=100)`` writes 100 times
+as much (100k contacts, 200k purchase orders with about a million lines).
+Statuses, payment states and dates follow rough real-world proportions
+(``*_STATUSES``), dates are spread over the last ``days`` days with more
+recent documents than old ones, and portal users are linked as vendors and
+customers the same way the routes link them (a contact with the user's
+email).
+
+Rows are written with executemany ``INSERT``s, ``batch_size`` documents per
+statement and one commit per batch; parent ids come back from ``RETURNING``
+so lines, bills, invoices and payments are written from memory without
+reading anything back. Document numbers are reserved from ``sequences`` once
+per prefix and batch, so numbering continues correctly afterwards.
+Session hooks do not see core inserts, so the dashboard metrics are
+reconciled and the reference data caches bumped at the end. The same seed
+gives the same data on an empty database.
+"""
+import random
+from collections import Counter, namedtuple
+from datetime import date, datetime, timedelta
+from app import db
+from app.models import (Contact, Product, AnalyticalAccount, Budget, Users, PurchaseOrder, PurchaseOrderLine,
+                        VendorBill, VendorBillLine, Invoice, InvoiceLine, SaleOrder, SaleOrderLine, Payment,
+                        AutoAnalyticalModel)
+from app.services import dashboard, reference_data, sequences
+
+DEFAULT_BATCH_SIZE = 5000
+DEFAULT_DAYS = 730
+PASSWORD = 'password123'
+
+# Rows written at scale 1; documents get 1..2*lines-1 lines each
+COUNTS = {
+    'contacts': 1000,
+    'products': 500,
+    'analytical_accounts': 20,
+    'portal_users': 100,
+    'budgets': 40,
+    'auto_analytical_models': 20,
+    'purchase_orders': 2000,
+    'sale_orders': 2000,
+}
+LINES_PER_DOCUMENT = 5
+
+# (value, weight) pairs
+PO_STATUSES = [('draft', 15), ('sent', 15), ('confirmed', 40), ('received', 25), ('cancelled', 5)]
+SO_STATUSES = [('draft', 20), ('confirmed', 30), ('sent', 45), ('cancelled', 5)]
+PAYMENT_STATES = [('not_paid', 35), ('partial', 15), ('paid', 50)]
+TAX_RATES = [(0.0, 10), (5.0, 30), (12.0, 30), (18.0, 30)]
+ARCHIVED_SHARE = 0.02
+BILLED_SHARE = 0.85  # of confirmed and received purchase orders
+
+GenerateResult = namedtuple('GenerateResult', ['counts', 'seconds'])
+
+_FIRST = ['Aarav', 'Diya', 'Ishaan', 'Kavya', 'Rohan', 'Ananya', 'Vihaan', 'Meera', 'Arjun', 'Saanvi',
+          'Kabir', 'Riya', 'Aditya', 'Nisha', 'Dev', 'Pooja', 'Rahul', 'Sneha', 'Vikram', 'Tara']
+_LAST = ['Sharma', 'Patel', 'Mehta', 'Iyer', 'Reddy', 'Gupta', 'Nair', 'Joshi', 'Rao', 'Das',
+         'Kapoor', 'Shah', 'Verma', 'Bose', 'Pillai', 'Singh', 'Khan', 'Desai', 'Menon', 'Jain']
+_MATERIALS = ['Oak', 'Teak', 'Walnut', 'Pine', 'Steel', 'Glass', 'Leather', 'Fabric', 'Rattan', 'Marble']
+_ITEMS = ['Chair', 'Desk', 'Table', 'Sofa', 'Cabinet', 'Shelf', 'Bed', 'Stool', 'Wardrobe', 'Bench']
+_CATEGORIES = ['Office', 'Living Room', 'Bedroom', 'Dining', 'Outdoor', 'Storage']
+_ACCOUNTS = ['Raw Materials', 'Office Supplies', 'Maintenance', 'Marketing', 'Logistics', 'Design',
+             'Showroom', 'Deepawali Sale', 'Exhibitions', 'Upholstery']
+
+
+class _Generator:
+    def __init__(self, scale, seed, days, batch_size, echo):
+        self.rng = random.Random(seed)
+        self.scale = scale
+        self.batch_size = batch_size
+        self.echo = echo or (lambda message: None)
+        self.today = date.today()
+        self.days = days
+        self.now = datetime.utcnow()
+        self.counts = Counter()
+
+    # -- helpers -------------------------------------------------------------
+
+    def count(self, name):
+        return int(round(COUNTS[name] * self.scale))
+
+    def pick(self, choices):
+        values, weights = zip(*choices)
+        return self.rng.choices(values, weights)[0]
+
+    def recent_date(self):
+        # Triangular towards today: there is more recent activity than old
+        return self.today - timedelta(days=int(self.rng.triangular(0, self.days, 0)))
+
+    def money(self, low, high):
+        return round(self.rng.uniform(low, high), 2)
+
+    def archived(self):
+        return self.rng.random() < ARCHIVED_SHARE
+
+    def next_id(self, model):
+        return (db.session.execute(db.select(db.func.max(model.id))).scalar() or 0) + 1
+
+    def insert(self, model, rows, returning=False):
+        if not rows:
+            return []
+        self.counts[model.__tablename__] += len(rows)
+        table = model.__table__
+        if returning:
+            statement = table.insert().returning(table.c.id, sort_by_parameter_order=True)
+            return list(db.session.execute(statement, rows).scalars())
+        db.session.execute(table.insert(), rows)
+        return []
+
+    def batches(self, total):
+        for start in range(0, total, self.batch_size):
+            yield min(self.batch_size, total - start)
+
+    def numbers(self, prefix_of, rows, column):
+        """Fill ``column`` of ``rows`` with numbers reserved per prefix (one round-trip per prefix)."""
+        by_prefix = {}
+        for row in rows:
+            by_prefix.setdefault(prefix_of(row), []).append(row)
+        for prefix, group in by_prefix.items():
+            for row, number in zip(group, sequences.next_numbers(prefix, len(group))):
+                row[column] = number
+
+    def lines(self, quantity_range=(1, 20)):
+        count = self.rng.randint(1, 2 * LINES_PER_DOCUMENT - 1)
+        result = []
+        for _ in range(count):
+            product = self.rng.choice(self.products)
+            quantity = float(self.rng.randint(*quantity_range))
+            unit_price = product[1]
+            result.append({
+                'product_name': product[0],
+                'budget_analytics': self.rng.choice(self.accounts),
+                'quantity': quantity,
+                'unit_price': unit_price,
+                'total': round(quantity * unit_price, 2),
+            })
+        return result
+
+    def commit(self, label):
+        db.session.commit()
+        self.echo(f"{label}: {sum(self.counts.values())} rows so far")
+
+    # -- reference data ------------------------------------------------------
+
+    def reference_data(self):
+        start = self.next_id(AnalyticalAccount)
+        accounts = []
+        for i in range(start, start + max(self.count('analytical_accounts'), 1)):
+            account_type = 'expense' if i % 3 else 'income'
+            accounts.append({
+                'name': f"{_ACCOUNTS[i % len(_ACCOUNTS)]} {i}", 'code': f"GEN-{account_type[:3].upper()}-{i:05d}",
+                'description': None, 'account_type': account_type, 'is_archived': False, 'created_at': self.now,
+            })
+        self.insert(AnalyticalAccount, accounts)
+        self.accounts = [row['name'] for row in accounts]
+
+        self.products = []
+        start = self.next_id(Product)
+        total = max(self.count('products'), 1)
+        for size in self.batches(total):
+            rows = []
+            for i in range(start, start + size):
+                cost = self.money(500, 40000)
+                price = round(cost * self.rng.uniform(1.2, 1.8), 2)
+                name = f"{self.rng.choice(_MATERIALS)} {self.rng.choice(_ITEMS)} {i}"
+                rows.append({
+                    'name': name, 'category': self.rng.choice(_CATEGORIES), 'description': None,
+                    'sales_price': price, 'purchase_price': cost, 'price': price, 'cost': cost,
+                    'quantity': self.rng.randint(0, 500), 'is_archived': self.archived(),
+                    'created_at': self.now, 'updated_at': self.now,
+                })
+                self.products.append((name, cost))
+            start += size
+            self.insert(Product, rows)
+            self.commit('products')
+
+        start = self.next_id(Contact)
+        for size in self.batches(self.count('contacts')):
+            rows = []
+            for i in range(start, start + size):
+                first, last = self.rng.choice(_FIRST), self.rng.choice(_LAST)
+                rows.append({
+                    'name': f"{first} {last}"[:20] + f" {i % 10000}", 'email': f"{first}.{last}.{i}@example.com".lower(),
+                    'phone': self.rng.randint(7000000000, 9999999999), 'company': f"{last} {self.rng.choice(_ITEMS)}s",
+                    'address': None, 'is_archived': self.archived(), 'created_at': self.now, 'updated_at': self.now,
+                })
+            start += size
+            self.insert(Contact, rows)
+            self.commit('contacts')
+
+        # Portal users double as vendors and customers, each with its contact
+        hasher = Users()
+        hasher.set_password(PASSWORD)
+        start = self.next_id(Users)
+        users, contacts = [], []
+        for i in range(start, start + max(self.count('portal_users'), 1)):
+            name = f"{self.rng.choice(_FIRST)} {self.rng.choice(_LAST)}"[:16] + f" {i}"
+            email = f"portal{i}@example.com"
+            users.append({
+                'username': f"portal{i}", 'email': email, 'name': name, 'password_hash': hasher.password_hash,
+                'role': 'portal', 'is_active': True, 'created_at': self.now,
+            })
+            contacts.append({
+                'name': name, 'email': email, 'phone': self.rng.randint(7000000000, 9999999999),
+                'company': f"{name.split()[1]} Furnishings", 'address': None, 'is_archived': False,
+                'created_at': self.now, 'updated_at': self.now,
+            })
+        self.partners = list(zip(self.insert(Users, users, returning=True), (row['name'] for row in users)))
+        self.insert(Contact, contacts)
+
+        budgets = []
+        for _ in range(self.count('budgets')):
+            period_start = self.recent_date().replace(day=1)
+            budgets.append({
+                'name': f"{self.rng.choice(self.accounts)} {period_start:%b %Y}",
+                'period_start': period_start, 'period_end': period_start + timedelta(days=89),
+                'analytical_account': self.rng.choice(self.accounts), 'total_amount': self.money(1e5, 5e6),
+                'description': None, 'is_archived': self.archived(), 'created_at': self.now, 'updated_at': self.now,
+            })
+        self.insert(Budget, budgets)
+        self.insert(AutoAnalyticalModel, [{
+            'product_name': self.rng.choice(self.products)[0], 'vendor_name': None,
+            'analytical_account_name': self.rng.choice(self.accounts), 'is_active': True, 'created_at': self.now,
+        } for _ in range(self.count('auto_analytical_models'))])
+        self.commit('reference data')
+
+    # -- purchasing ----------------------------------------------------------
+
+    def payment_state(self, total):
+        state = self.pick(PAYMENT_STATES)
+        if state == 'paid':
+            return state, total
+        if state == 'partial':
+            return state, round(total * self.rng.uniform(0.1, 0.9), 2)
+        return state, 0.0
+
+    def purchase_orders(self):
+        for size in self.batches(self.count('purchase_orders')):
+            orders, order_lines = [], []
+            for _ in range(size):
+                vendor_id, vendor_name = self.rng.choice(self.partners)
+                status = self.pick(PO_STATUSES)
+                # Portal drafts carry their creator, admin orders only the vendor (as in the routes)
+                portal_draft = status == 'draft' and self.rng.random() < 0.5
+                lines = self.lines()
+                order_date = self.recent_date()
+                orders.append({
+                    'order_number': 'PPO' if portal_draft else 'PO',
+                    'reference': f"REQ-{order_date:%y}-{self.rng.randint(1, 9999):04d}", 'vendor_name': vendor_name,
+                    'order_date': order_date, 'expected_delivery': order_date + timedelta(days=self.rng.randint(3, 45)),
+                    'total_amount': round(sum(line['total'] for line in lines), 2), 'status': status, 'notes': None,
+                    'user_id': vendor_id if portal_draft else None,
+                    'vendor_id': None if portal_draft else vendor_id,
+                    'is_archived': self.archived(), 'created_at': self.now, 'updated_at': self.now,
+                })
+                order_lines.append(lines)
+            billed = [i for i, order in enumerate(orders)
+                      if order['status'] in ('confirmed', 'received') and self.rng.random() < BILLED_SHARE]
+            bills = [self.bill(orders[i]) for i in billed]
+            payments = [(j, self.payment('send', bill['vendor_id'], bill['vendor_name'], bill['amount_paid'],
+                                         bill['bill_date']))
+                        for j, bill in enumerate(bills) if bill['amount_paid']]
+
+            # Numbers first: on SQLite they are reserved in a separate write transaction
+            self.numbers(lambda row: row['order_number'], orders, 'order_number')
+            self.numbers(lambda row: f"Bill/{row['bill_date'].year}", bills, 'bill_number')
+            self.numbers(lambda row: f"PAY/{row['payment_date'].year}", [row for _, row in payments], 'payment_number')
+
+            ids = self.insert(PurchaseOrder, orders, returning=True)
+            self.insert(PurchaseOrderLine, [
+                {'po_id': po_id, **line} for po_id, lines in zip(ids, order_lines) for line in lines
+            ])
+            for i, bill in zip(billed, bills):
+                bill['po_id'] = ids[i]
+            bill_ids = self.insert(VendorBill, bills, returning=True)
+            self.insert(VendorBillLine, [
+                {'bill_id': bill_id, **line} for bill_id, i in zip(bill_ids, billed) for line in order_lines[i]
+            ])
+            for j, payment in payments:
+                payment['bill_id'] = bill_ids[j]
+            self.insert(Payment, [payment for _, payment in payments])
+            self.commit('purchase orders')
+
+    def bill(self, order):
+        bill_date = min(order['order_date'] + timedelta(days=self.rng.randint(0, 20)), self.today)
+        payment_status, amount_paid = self.payment_state(order['total_amount'])
+        return {
+            'vendor_name': order['vendor_name'], 'bill_date': bill_date, 'due_date': bill_date + timedelta(days=30),
+            'reference': None, 'total_amount': order['total_amount'], 'amount_paid': amount_paid,
+            'status': 'confirmed', 'payment_status': payment_status, 'vendor_id': order['vendor_id'],
+            'is_archived': order['is_archived'], 'created_at': self.now, 'updated_at': self.now,
+        }
+
+    # -- sales ---------------------------------------------------------------
+
+    def sale_orders(self):
+        for size in self.batches(self.count('sale_orders')):
+            orders, order_lines = [], []
+            for _ in range(size):
+                customer_id, customer_name = self.rng.choice(self.partners)
+                status = self.pick(SO_STATUSES)
+                lines = self.lines((1, 8))
+                orders.append({
+                    'order_number': 'PSO' if status == 'draft' and self.rng.random() < 0.5 else 'SO',
+                    'customer_id': customer_id, 'customer_name': customer_name, 'order_date': self.recent_date(),
+                    'total_amount': round(sum(line['total'] for line in lines), 2), 'status': status, 'notes': None,
+                    'is_archived': self.archived(), 'created_at': self.now, 'updated_at': self.now,
+                })
+                order_lines.append(lines)
+            # Sent orders are the invoiced ones (as in the send route)
+            invoiced = [i for i, order in enumerate(orders) if order['status'] == 'sent']
+            invoices, invoice_lines = [], []
+            for i in invoiced:
+                invoice, lines = self.invoice(orders[i], order_lines[i])
+                invoices.append(invoice)
+                invoice_lines.append(lines)
+            payments = [(j, self.payment('receive', invoice['customer_id'], invoice['customer_name'],
+                                         invoice['paid_amount'], invoice['invoice_date']))
+                        for j, invoice in enumerate(invoices) if invoice['paid_amount']]
+
+            self.numbers(lambda row: row['order_number'], orders, 'order_number')
+            self.numbers(lambda row: 'INV-', invoices, 'invoice_number')
+            self.numbers(lambda row: f"PAY/{row['payment_date'].year}", [row for _, row in payments], 'payment_number')
+
+            ids = self.insert(SaleOrder, orders, returning=True)
+            self.insert(SaleOrderLine, [
+                {'so_id': so_id, **line} for so_id, lines in zip(ids, order_lines) for line in lines
+            ])
+            invoice_ids = self.insert(Invoice, invoices, returning=True)
+            self.insert(InvoiceLine, [
+                {'invoice_id': invoice_id, **line} for invoice_id, lines in zip(invoice_ids, invoice_lines)
+                for line in lines
+            ])
+            for j, payment in payments:
+                payment['invoice_id'] = invoice_ids[j]
+            self.insert(Payment, [payment for _, payment in payments])
+            self.commit('sale orders')
+
+    def invoice(self, order, lines):
+        invoice_date = min(order['order_date'] + timedelta(days=self.rng.randint(0, 10)), self.today)
+        due_date = invoice_date + timedelta(days=30)
+        tax_rate = self.pick(TAX_RATES)
+        lines = [{**line, 'description': None, 'tax_rate': tax_rate,
+                  'tax_amount': round(line['total'] * tax_rate / 100, 2)} for line in lines]
+        subtotal = order['total_amount']
+        tax_amount = round(sum(line['tax_amount'] for line in lines), 2)
+        total = round(subtotal + tax_amount, 2)
+        payment_status, paid = self.payment_state(total)
+        status = payment_status if payment_status != 'not_paid' else (
+            'overdue' if due_date < self.today else 'sent')
+        return {
+            'customer_id': order['customer_id'], 'customer_name': order['customer_name'],
+            'invoice_date': invoice_date, 'due_date': due_date, 'subtotal': subtotal, 'tax_amount': tax_amount,
+            'total_amount': total, 'paid_amount': paid, 'balance_due': round(total - paid, 2), 'status': status,
+            'payment_terms': '30 Days', 'notes': None, 'is_archived': order['is_archived'],
+            'created_at': self.now, 'updated_at': self.now,
+        }, lines
+
+    # -- payments ------------------------------------------------------------
+
+    def payment(self, payment_type, partner_id, partner_name, amount, after):
+        return {
+            'payment_type': payment_type, 'partner_id': partner_id, 'partner_name': partner_name,
+            'bill_id': None, 'invoice_id': None, 'amount': amount,
+            'payment_date': min(after + timedelta(days=self.rng.randint(0, 40)), self.today),
+            'payment_method': self.pick([('bank', 80), ('cash', 20)]), 'memo': None, 'status': 'posted',
+            'created_at': self.now,
+        }
+
+
+def generate(scale=1.0, seed=0, days=DEFAULT_DAYS, batch_size=None, echo=None):
+    """
+    Write ``COUNTS`` scaled by ``scale`` (see module docstring), committing
+    every batch; ``echo`` receives progress messages.
+    """
+    started = datetime.utcnow()
+    generator = _Generator(scale, seed, days, batch_size or DEFAULT_BATCH_SIZE, echo)
+    generator.reference_data()
+    generator.purchase_orders()
+    generator.sale_orders()
+    # Core inserts bypass the session hooks that maintain these
+    dashboard.reconcile()
+    reference_data.bump(*reference_data.KINDS)
+    db.session.commit()
+    return GenerateResult(dict(generator.counts), (datetime.utcnow() - started).total_seconds())
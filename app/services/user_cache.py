@@ -0,0 +1,91 @@
+# User identity cache
+"""
+Cache in front of the Flask-Login user loader.
+
+Column values of loaded users are kept in a bounded LRU (``USER_CACHE_SIZE``
+entries, ``USER_CACHE_TTL`` seconds) keyed by user id. On a hit the user is
+rebuilt from that snapshot and attached to the request's session without a
+query, so lazy relationships and later writes behave as if it was loaded.
+
+Entries are dropped when a transaction that changed or deleted the user
+commits in this process; other worker processes see the change once the TTL
+expires, which bounds how long e.g. a deactivated account stays signed in.
+"""
+from flask import current_app
+from sqlalchemy import event, inspect
+from sqlalchemy.orm import make_transient_to_detached
+from app import db
+from app.models import Users
+from app.services.caching import LRUCache
+
+DEFAULT_SIZE = 1024
+DEFAULT_TTL = 60
+
+_cache = None
+
+
+def _get_cache():
+    global _cache
+    if _cache is None:
+        _cache = LRUCache(
+            maxsize=current_app.config.get('USER_CACHE_SIZE', DEFAULT_SIZE),
+            ttl=current_app.config.get('USER_CACHE_TTL', DEFAULT_TTL),
+        )
+    return _cache
+
+
+def _snapshot(user):
+    return {attr.key: getattr(user, attr.key) for attr in inspect(Users).column_attrs}
+
+
+def load_user(user_id):
+    """The user with ``user_id`` bound to the current session, or None."""
+    if not current_app.config.get('USER_CACHE_TTL', DEFAULT_TTL):
+        return db.session.get(Users, user_id)
+
+    cache = _get_cache()
+    snapshot = cache.get(user_id)
+    if snapshot is None:
+        user = db.session.get(Users, user_id)
+        if user is not None:
+            cache.set(user_id, _snapshot(user))
+        return user
+
+    user = Users(**snapshot)
+    make_transient_to_detached(user)
+    return db.session.merge(user, load=False)
+
+
+def invalidate(user_ids=None):
+    """Forget ``user_ids`` (everyone when None)."""
+    if _cache is None:
+        return
+    if user_ids is None:
+        _cache.clear()
+    else:
+        for user_id in user_ids:
+            _cache.pop(user_id)
+
+
+@event.listens_for(db.session, 'after_flush')
+def _collect_changed_users(session, flush_context):
+    changed = set()
+    for obj in list(session.dirty) + list(session.deleted):
+        if isinstance(obj, Users):
+            identity = inspect(obj).identity
+            if identity:
+                changed.add(identity[0])
+    if changed:
+        session.info.setdefault('user_cache_changed', set()).update(changed)
+
+
+@event.listens_for(db.session, 'after_commit')
+def _invalidate_committed(session):
+    changed = session.info.pop('user_cache_changed', None)
+    if changed:
+        invalidate(changed)
+
+
+@event.listens_for(db.session, 'after_rollback')
+def _discard_changes(session):
+    session.info.pop('user_cache_changed', None)
@@ -0,0 +1,25 @@
+// Typeahead for <datalist data-typeahead-url="...">: suggestions are fetched as the user types
+// into any input whose list attribute names the datalist, instead of embedding the catalogue
+(function () {
+    const timers = {};
+    document.addEventListener('input', function (e) {
+        const listId = e.target.getAttribute('list');
+        const list = listId && document.getElementById(listId);
+        if (!list || !list.dataset.typeaheadUrl) return;
+        const term = e.target.value.trim();
+        clearTimeout(timers[listId]);
+        if (!term) return;
+        timers[listId] = setTimeout(function () {
+            fetch(list.dataset.typeaheadUrl + '?' + new URLSearchParams({ q: term }))
+                .then(response => response.json())
+                .then(data => {
+                    list.innerHTML = '';
+                    data.results.forEach(item => {
+                        const option = document.createElement('option');
+                        option.value = item.name;
+                        list.appendChild(option);
+                    });
+                });
+        }, 150);
+    });
+})();
@@ -0,0 +1,127 @@
+"""
+Fixtures for the route benchmarks: one app per session on a database filled
+by the synthetic data generator, and signed-in admin and portal clients.
+
+    BENCH_SCALE         generator scale (default 1; 10 = 10k contacts, 20k orders of each kind)
+    BENCH_DATABASE_URL  database to fill instead of a temporary SQLite file (must be empty)
+"""
+import html
+import os
+import re
+import sys
+
+import pytest
+from sqlalchemy import event
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from app import create_app, db  # noqa: E402
+from config import Config  # noqa: E402
+
+ADMIN_PASSWORD = 'bench-password'
+
+
+@pytest.fixture(scope='session')
+def app(tmp_path_factory):
+    class BenchConfig(Config):
+        SQLALCHEMY_DATABASE_URI = os.environ.get('BENCH_DATABASE_URL') or \
+            f"sqlite:///{tmp_path_factory.mktemp('bench') / 'bench.db'}"
+        TESTING = True
+        NPLUSONE_DETECT = False
+        PROFILING_ENABLED = False
+
+    app = create_app(BenchConfig)
+    with app.app_context():
+        from app.models import Users
+        from app.services import search, synthetic
+        db.create_all()
+        search.ensure_indexes()
+        admin = Users(username='bench-admin', email='bench-admin@example.com', name='Bench Admin', role='admin')
+        admin.set_password(ADMIN_PASSWORD)
+        db.session.add(admin)
+        db.session.commit()
+        synthetic.generate(float(os.environ.get('BENCH_SCALE', 1)), seed=0)
+    yield app
+    with app.app_context():
+        db.session.remove()
+        if os.environ.get('BENCH_DATABASE_URL'):
+            db.drop_all()
+        db.engine.dispose()
+
+
+def _signed_in(app, username, password):
+    client = app.test_client()
+    response = client.post('/auth/login', data={'username': username, 'password': password})
+    assert response.status_code == 302, f"login as {username} failed"
+    return client
+
+
+@pytest.fixture(scope='session')
+def ids(app):
+    """Representative record ids for the detail routes, and the busiest portal user."""
+    from app.models import Users, PurchaseOrder, VendorBill, Invoice, SaleOrder, Contact, Product, Budget
+    with app.app_context():
+        vendor_id = db.session.execute(
+            db.select(PurchaseOrder.vendor_id).where(PurchaseOrder.vendor_id.isnot(None))
+            .group_by(PurchaseOrder.vendor_id).order_by(db.func.count().desc()).limit(1)
+        ).scalar()
+        latest = {
+            name: db.session.execute(db.select(db.func.max(model.id))).scalar()
+            for name, model in [('purchase_order', PurchaseOrder), ('vendor_bill', VendorBill), ('invoice', Invoice),
+                                ('sale_order', SaleOrder), ('contact', Contact), ('product', Product),
+                                ('budget', Budget)]
+        }
+        portal = db.session.get(Users, vendor_id)
+        latest['portal_username'] = portal.username
+        latest['portal_purchase_order'] = db.session.execute(
+            db.select(db.func.max(PurchaseOrder.id)).where(PurchaseOrder.vendor_id == vendor_id)
+        ).scalar()
+        latest['portal_invoice'] = db.session.execute(
+            db.select(db.func.max(Invoice.id)).where(Invoice.customer_id == vendor_id)
+        ).scalar()
+        latest['portal_sale_order'] = db.session.execute(
+            db.select(db.func.max(SaleOrder.id)).where(SaleOrder.customer_id == vendor_id)
+        ).scalar()
+        return latest
+
+
+@pytest.fixture(scope='session')
+def admin_client(app):
+    return _signed_in(app, 'bench-admin', ADMIN_PASSWORD)
+
+
+def _next_link(client, url):
+    """The href of the "Next" pagination link on ``url`` (carries the keyset cursor)."""
+    page = client.get(url).get_data(as_text=True)
+    match = re.search(r'href="([^"]*)">Next', page)
+    assert match, f"{url} has no next page"
+    return html.unescape(match.group(1))
+
+
+@pytest.fixture(scope='session')
+def page_links(admin_client):
+    """Second-page URLs of the paginated admin lists, read from their first page's "Next" link."""
+    return {
+        'purchase_orders_page_2': _next_link(admin_client, '/admin/purchase-orders'),
+    }
+
+
+@pytest.fixture(scope='session')
+def portal_client(app, ids):
+    from app.services import synthetic
+    return _signed_in(app, ids['portal_username'], synthetic.PASSWORD)
+
+
+@pytest.fixture
+def sql_counter(app):
+    """A list that collects every statement the engine executes while the test runs."""
+    statements = []
+
+    def count(conn, cursor, statement, parameters, context, executemany):
+        statements.append(statement)
+
+    with app.app_context():
+        engine = db.engine
+    event.listen(engine, 'before_cursor_execute', count)
+    yield statements
+    event.remove(engine, 'before_cursor_execute', count)
@@ -0,0 +1,383 @@
+"""
+Concurrent load test of the purchase and sales flows.
+
+Starts the app in a separate process (threaded Werkzeug server) on a
+database filled by the synthetic data generator, then runs ``--users``
+simulated admin/portal pairs in parallel. Each pair repeats:
+
+    purchase flow  admin creates a PO for its vendor -> finds it in the list -> sends it;
+                   the vendor accepts it (creating the bill) -> admin sees the bill in the list
+    sales flow     admin creates a sale order for its customer -> finds it -> sends it (invoicing it);
+                   the customer opens their invoices
+
+Every step checks the response it gets (status, redirect target, content),
+so a step that "succeeds" with the wrong page counts as an error. The report
+gives throughput, per-step error rates, latency percentiles and histograms.
+With ``--baseline`` the run fails when throughput or a step's p95 is worse
+than the stored run by more than ``--tolerance``; ``--save-baseline`` stores
+this run:
+
+    python benchmarks/load_test.py --users 8 --duration 30 --save-baseline benchmarks/baseline.json
+    python benchmarks/load_test.py --users 8 --duration 30 --baseline benchmarks/baseline.json
+    python benchmarks/load_test.py --database-url postgresql://... --scale 10
+"""
+import argparse
+import http.client
+import json
+import multiprocessing
+import os
+import re
+import socket
+import sys
+import tempfile
+import threading
+import time
+from collections import defaultdict
+from concurrent.futures import ThreadPoolExecutor
+from datetime import date
+from http.cookies import SimpleCookie
+from urllib.parse import urlencode
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from app import create_app, db  # noqa: E402
+from config import Config  # noqa: E402
+
+PASSWORD = 'load-password'
+HISTOGRAM_MS = (1, 2, 5, 10, 20, 50, 100, 200, 500, 1000, 2000, 5000)
+QUANTILES = (0.5, 0.95, 0.99)
+
+
+def build_app(database_url):
+    class LoadTestConfig(Config):
+        SQLALCHEMY_DATABASE_URI = database_url
+        NPLUSONE_DETECT = False
+        PROFILING_ENABLED = False
+
+    return create_app(LoadTestConfig)
+
+
+def prepare(database_url, users, scale):
+    """Create the schema, background data and one vendor/customer account per simulated user."""
+    app = build_app(database_url)
+    with app.app_context():
+        from app.models import Users, Contact
+        from app.services import search, synthetic
+        db.create_all()
+        search.ensure_indexes()
+        db.session.commit()
+        if scale:
+            synthetic.generate(scale, seed=0)
+
+        admin = Users(username='load-admin', email='load-admin@example.com', name='Load Admin', role='admin')
+        admin.set_password(PASSWORD)
+        db.session.add(admin)
+        partners = []
+        for i in range(users):
+            # The admin PO form links the vendor through a contact with the user's name and email
+            partner = Users(username=f'load-partner{i}', email=f'load-partner{i}@example.com',
+                            name=f'Load Partner {i}', role='portal')
+            partner.set_password(PASSWORD)
+            db.session.add(partner)
+            db.session.add(Contact(name=partner.name, email=partner.email))
+            partners.append(partner)
+        db.session.commit()
+        return [(partner.id, partner.username, partner.name) for partner in partners]
+
+
+def serve(database_url, port):
+    from werkzeug.serving import WSGIRequestHandler, make_server
+
+    class KeepAliveHandler(WSGIRequestHandler):
+        protocol_version = 'HTTP/1.1'
+
+        def log_request(self, *args, **kwargs):
+            pass
+
+    make_server('127.0.0.1', port, build_app(database_url), threaded=True,
+                request_handler=KeepAliveHandler).serve_forever()
+
+
+def _free_port():
+    with socket.socket() as sock:
+        sock.bind(('127.0.0.1', 0))
+        return sock.getsockname()[1]
+
+
+def _wait_for(port, timeout=30):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        try:
+            socket.create_connection(('127.0.0.1', port), timeout=1).close()
+            return
+        except OSError:
+            time.sleep(0.1)
+    raise RuntimeError(f"server did not start on port {port}")
+
+
+class StepError(Exception):
+    pass
+
+
+class Session:
+    """One browser: a keep-alive connection and its cookies."""
+
+    def __init__(self, port):
+        self.port = port
+        self.cookies = {}
+        self.connection = http.client.HTTPConnection('127.0.0.1', port, timeout=60)
+
+    def request(self, method, path, form=None):
+        body = urlencode(form, doseq=True) if form is not None else None
+        headers = {'Cookie': '; '.join(f'{k}={v}' for k, v in self.cookies.items())}
+        if body is not None:
+            headers['Content-Type'] = 'application/x-www-form-urlencoded'
+        for attempt in (1, 2):
+            try:
+                self.connection.request(method, path, body=body, headers=headers)
+                response = self.connection.getresponse()
+                data = response.read().decode('utf-8', 'replace')
+                break
+            except (http.client.HTTPException, OSError):
+                # The server closed the kept-alive connection; retry once on a new one
+                self.connection.close()
+                self.connection = http.client.HTTPConnection('127.0.0.1', self.port, timeout=60)
+                if attempt == 2:
+                    raise
+        for header in response.headers.get_all('Set-Cookie') or []:
+            for name, morsel in SimpleCookie(header).items():
+                self.cookies[name] = morsel.value
+        return response.status, response.headers.get('Location') or '', data
+
+
+class Stats:
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.latencies = defaultdict(list)
+        self.errors = defaultdict(int)
+        self.samples = {}
+        self.flows = 0
+
+    def step(self, name, call):
+        started = time.perf_counter()
+        try:
+            result = call()
+        except Exception as e:  # every failure is counted against the step
+            elapsed = time.perf_counter() - started
+            with self.lock:
+                self.latencies[name].append(elapsed)
+                self.errors[name] += 1
+                self.samples.setdefault(name, f"{type(e).__name__}: {e}")
+            raise StepError(name) from e
+        elapsed = time.perf_counter() - started
+        with self.lock:
+            self.latencies[name].append(elapsed)
+        return result
+
+    def flow_done(self):
+        with self.lock:
+            self.flows += 1
+
+
+def _expect(response, status, location=None, contains=None):
+    code, target, body = response
+    if code != status:
+        raise AssertionError(f"status {code}, expected {status}")
+    if location is not None and not target.split('?')[0].endswith(location):
+        raise AssertionError(f"redirected to {target}, expected {location}")
+    if contains is not None and contains not in body:
+        raise AssertionError(f"{contains!r} not in page")
+    return body
+
+
+def _row(body, marker, link):
+    """Id and first cell of the list row containing ``marker``."""
+    for row in body.split('<tr class="link-row"')[1:]:
+        if marker in row:
+            found = re.search(link + r'(\d+)', row)
+            first = re.search(r'<td>\s*([^<]*?)\s*</td>', row)
+            if found:
+                return int(found.group(1)), first.group(1) if first else ''
+    raise AssertionError(f"{marker!r} not on the first page of the list")
+
+
+def _login(session, username):
+    _expect(session.request('POST', '/auth/login', {'username': username, 'password': PASSWORD}), 302)
+
+
+def _line(price):
+    return {'product_name[]': ['Load Test Chair'], 'budget_analytics[]': ['Load Test'],
+            'quantity[]': ['1'], 'unit_price[]': [f'{price:.2f}']}
+
+
+def purchase_flow(stats, admin, vendor, partner_name, tag):
+    reference = f'LOAD-{tag}'
+    stats.step('po.create', lambda: _expect(admin.request('POST', '/admin/purchase-order/new', {
+        'vendor_name': partner_name, 'order_date': date.today().isoformat(), 'reference': reference,
+        **_line(500),
+    }), 302, '/admin/purchase-orders'))
+    po_id, order_number = stats.step('po.list', lambda: _row(
+        _expect(admin.request('GET', '/admin/purchase-orders'), 200), f'>{reference}<', '/admin/purchase-order/'))
+    stats.step('po.send', lambda: _expect(admin.request('GET', f'/admin/purchase-order/{po_id}/status/sent'),
+                                          302, f'/admin/purchase-order/{po_id}'))
+    stats.step('po.accept', lambda: _expect(vendor.request('GET', f'/purchase-order/{po_id}/accept'),
+                                            302, '/purchase-orders'))
+    stats.step('bill.list', lambda: _expect(admin.request('GET', '/admin/vendor-bills'), 200, contains=order_number))
+    stats.flow_done()
+
+
+def sales_flow(stats, admin, customer, partner_id, tag):
+    # A unique amount identifies the order in the list, which shows no reference
+    price = 1000 + tag[1] + tag[0] / 1000
+    stats.step('so.create', lambda: _expect(admin.request('POST', '/admin/sale-order/new', {
+        'customer_id': partner_id, 'order_date': date.today().isoformat(), **_line(price),
+    }), 302, '/admin/sale-orders'))
+    so_id, _ = stats.step('so.list', lambda: _row(
+        _expect(admin.request('GET', '/admin/sale-orders'), 200), f'₹{price:,.2f}<', '/admin/sale-order/'))
+    stats.step('so.send', lambda: _expect(admin.request('GET', f'/admin/sale-order/{so_id}/send'),
+                                          302, f'/admin/sale-order/{so_id}'))
+    stats.step('invoice.portal', lambda: _expect(customer.request('GET', '/invoices'), 200))
+    stats.flow_done()
+
+
+def run(port, partners, args, stats):
+    deadline = time.perf_counter() + args.duration
+
+    def simulated_user(index):
+        partner_id, username, name = partners[index]
+        admin, partner = Session(port), Session(port)
+        _login(admin, 'load-admin')
+        _login(partner, username)
+        iteration = 0
+        while time.perf_counter() < deadline and (not args.iterations or iteration < args.iterations):
+            tag = (index, iteration)
+            for flow in (lambda: purchase_flow(stats, admin, partner, name, f'{index}-{iteration}'),
+                         lambda: sales_flow(stats, admin, partner, partner_id, tag)):
+                try:
+                    flow()
+                except StepError:
+                    pass
+            iteration += 1
+
+    started = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=args.users) as pool:
+        list(pool.map(simulated_user, range(args.users)))
+    return time.perf_counter() - started
+
+
+def _quantile(ordered, q):
+    return ordered[min(len(ordered) - 1, max(0, int(round(q * len(ordered))) - 1))]
+
+
+def summarize(stats, elapsed):
+    steps = {}
+    for name, latencies in sorted(stats.latencies.items()):
+        ordered = sorted(latencies)
+        buckets = [0] * (len(HISTOGRAM_MS) + 1)
+        for latency in ordered:
+            ms = latency * 1000
+            buckets[next((i for i, bound in enumerate(HISTOGRAM_MS) if ms <= bound), len(HISTOGRAM_MS))] += 1
+        steps[name] = {
+            'requests': len(ordered),
+            'errors': stats.errors[name],
+            'error_rate': stats.errors[name] / len(ordered),
+            **{f'p{int(q * 100)}_ms': round(_quantile(ordered, q) * 1000, 2) for q in QUANTILES},
+            'max_ms': round(ordered[-1] * 1000, 2),
+            'histogram': buckets,
+        }
+    requests = sum(step['requests'] for step in steps.values())
+    errors = sum(step['errors'] for step in steps.values())
+    return {
+        'seconds': round(elapsed, 2),
+        'flows': stats.flows,
+        'requests': requests,
+        'requests_per_second': round(requests / elapsed, 2) if elapsed else 0.0,
+        'flows_per_second': round(stats.flows / elapsed, 2) if elapsed else 0.0,
+        'error_rate': errors / requests if requests else 0.0,
+        'steps': steps,
+    }
+
+
+def report(summary, samples):
+    print(f"{summary['flows']} flows, {summary['requests']} requests in {summary['seconds']}s: "
+          f"{summary['requests_per_second']} req/s, {summary['flows_per_second']} flows/s, "
+          f"{summary['error_rate']:.2%} errors")
+    print(f"{'step':<16}{'requests':>9}{'errors':>8}{'p50 ms':>9}{'p95 ms':>9}{'p99 ms':>9}{'max ms':>9}")
+    for name, step in summary['steps'].items():
+        print(f"{name:<16}{step['requests']:>9}{step['errors']:>8}{step['p50_ms']:>9}{step['p95_ms']:>9}"
+              f"{step['p99_ms']:>9}{step['max_ms']:>9}")
+    labels = [f'<={bound}ms' for bound in HISTOGRAM_MS] + [f'>{HISTOGRAM_MS[-1]}ms']
+    for name, step in summary['steps'].items():
+        print(f"\n{name}")
+        peak = max(step['histogram']) or 1
+        for label, count in zip(labels, step['histogram']):
+            if count:
+                print(f"  {label:>9} {count:>7} {'#' * max(1, round(40 * count / peak))}")
+    for name, sample in samples.items():
+        print(f"\nfirst {name} error: {sample}")
+
+
+def regressions(summary, baseline, tolerance):
+    problems = []
+    floor = baseline['requests_per_second'] * (1 - tolerance)
+    if summary['requests_per_second'] < floor:
+        problems.append(f"throughput {summary['requests_per_second']} req/s < {floor:.2f} "
+                        f"(baseline {baseline['requests_per_second']})")
+    for name, step in summary['steps'].items():
+        before = baseline['steps'].get(name)
+        if before and step['p95_ms'] > before['p95_ms'] * (1 + tolerance):
+            problems.append(f"{name} p95 {step['p95_ms']}ms > {before['p95_ms'] * (1 + tolerance):.2f}ms "
+                            f"(baseline {before['p95_ms']}ms)")
+    return problems
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--users', type=int, default=4, help='simulated admin/portal pairs')
+    parser.add_argument('--duration', type=float, default=20.0, help='seconds to run')
+    parser.add_argument('--iterations', type=int, default=0, help='stop each user after this many rounds (0 = no limit)')
+    parser.add_argument('--scale', type=float, default=0.1, help='synthetic background data scale (0 = none)')
+    parser.add_argument('--database-url', help='empty database to use instead of a temporary SQLite file')
+    parser.add_argument('--baseline', help='fail when worse than this stored run')
+    parser.add_argument('--save-baseline', help='store this run here')
+    parser.add_argument('--tolerance', type=float, default=0.25, help='allowed slowdown against the baseline')
+    parser.add_argument('--max-error-rate', type=float, default=0.0, help='fail above this share of failed steps')
+    parser.add_argument('--json', action='store_true', help='print the summary as JSON')
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        database_url = args.database_url or f"sqlite:///{os.path.join(tmp, 'load.db')}"
+        partners = prepare(database_url, args.users, args.scale)
+        port = _free_port()
+        server = multiprocessing.Process(target=serve, args=(database_url, port), daemon=True)
+        server.start()
+        try:
+            _wait_for(port)
+            stats = Stats()
+            elapsed = run(port, partners, args, stats)
+        finally:
+            server.terminate()
+            server.join()
+
+    summary = summarize(stats, elapsed)
+    if args.json:
+        print(json.dumps(summary, indent=2))
+    else:
+        report(summary, stats.samples)
+
+    failures = []
+    if summary['error_rate'] > args.max_error_rate:
+        failures.append(f"error rate {summary['error_rate']:.2%} > {args.max_error_rate:.2%}")
+    if args.baseline:
+        with open(args.baseline) as fp:
+            failures += regressions(summary, json.load(fp), args.tolerance)
+    if args.save_baseline:
+        with open(args.save_baseline, 'w') as fp:
+            json.dump(summary, fp, indent=2)
+    for failure in failures:
+        print(f"FAIL {failure}", file=sys.stderr)
+    return 1 if failures else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
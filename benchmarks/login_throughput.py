@@ -0,0 +1,90 @@
+"""
+Login throughput benchmark.
+
+Signs users in through ``POST /auth/login`` from several client threads
+against an in-memory database and reports logins/sec overall and per core,
+so hashing parameters and pool settings can be compared:
+
+    python benchmarks/login_throughput.py --method scrypt:32768:8:1 --clients 8
+    python benchmarks/login_throughput.py --method pbkdf2:sha256:600000 --pool process
+"""
+import argparse
+import os
+import sys
+import threading
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from app import create_app, db  # noqa: E402
+from config import Config  # noqa: E402
+
+
+def build_app(args):
+    class BenchConfig(Config):
+        SQLALCHEMY_DATABASE_URI = 'sqlite://'
+        TESTING = True
+        PASSWORD_HASH_METHOD = args.method
+        PASSWORD_HASH_POOL = args.pool
+        PASSWORD_HASH_WORKERS = args.workers
+        USER_CACHE_TTL = 0
+
+    app = create_app(BenchConfig)
+    with app.app_context():
+        from app.models import Users
+        db.create_all()
+        for i in range(args.clients):
+            user = Users(username=f'bench{i}', email=f'bench{i}@example.com', role='portal')
+            user.set_password('bench-password')
+            db.session.add(user)
+        db.session.commit()
+    return app
+
+
+def run(app, args):
+    counts = [0] * args.clients
+    errors = [0] * args.clients
+    deadline = time.perf_counter() + args.seconds
+
+    def client_loop(index):
+        client = app.test_client()
+        while time.perf_counter() < deadline:
+            response = client.post('/auth/login', data={
+                'username': f'bench{index}', 'password': 'bench-password',
+            })
+            if response.status_code == 302 and '/home' in response.location:
+                counts[index] += 1
+            else:
+                errors[index] += 1
+
+    threads = [threading.Thread(target=client_loop, args=(i,)) for i in range(args.clients)]
+    started = time.perf_counter()
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    elapsed = time.perf_counter() - started
+    return sum(counts), sum(errors), elapsed
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--method', default=Config.PASSWORD_HASH_METHOD, help='Werkzeug hash method')
+    parser.add_argument('--pool', choices=('thread', 'process'), default='thread')
+    parser.add_argument('--workers', type=int, default=os.cpu_count() or 1, help='hash pool size (0 = inline)')
+    parser.add_argument('--clients', type=int, default=8, help='concurrent login threads')
+    parser.add_argument('--seconds', type=float, default=10.0)
+    args = parser.parse_args()
+
+    app = build_app(args)
+    logins, errors, elapsed = run(app, args)
+    cores = os.cpu_count() or 1
+    rate = logins / elapsed if elapsed else 0.0
+    print(f"method={args.method} pool={args.pool} workers={args.workers} clients={args.clients}")
+    print(f"{logins} logins, {errors} errors in {elapsed:.1f}s")
+    print(f"{rate:.1f} logins/sec, {rate / cores:.1f} logins/sec/core ({cores} cores)")
+    return 1 if errors else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
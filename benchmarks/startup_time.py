@@ -0,0 +1,76 @@
+"""
+Cold start and import-time profile of the app factories.
+
+Starts fresh interpreters that build the full app (``create_app``) or the
+database-only one (``create_db_app``) and reports the median wall time of
+each, then the modules with the highest cumulative import time for one of
+them (from ``python -X importtime``):
+
+    python benchmarks/startup_time.py
+    python benchmarks/startup_time.py --runs 10 --profile db --top 30
+"""
+import argparse
+import os
+import statistics
+import subprocess
+import sys
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+FACTORIES = {
+    'full': 'create_app',
+    'db': 'create_db_app',
+}
+
+_TIMED = (
+    "import time; started = time.perf_counter()\n"
+    "from app import {factory}\n"
+    "imported = time.perf_counter()\n"
+    "{factory}()\n"
+    "print(imported - started, time.perf_counter() - imported)\n"
+)
+
+
+def cold_start(factory):
+    """(import seconds, factory seconds) in a fresh interpreter."""
+    output = subprocess.run([sys.executable, '-c', _TIMED.format(factory=factory)], cwd=ROOT,
+                            capture_output=True, text=True, check=True).stdout
+    imported, built = output.split()
+    return float(imported), float(built)
+
+
+def import_profile(factory):
+    """``[(cumulative microseconds, self microseconds, module)]``, slowest first."""
+    stderr = subprocess.run([sys.executable, '-X', 'importtime', '-c', f"from app import {factory}; {factory}()"],
+                            cwd=ROOT, capture_output=True, text=True, check=True).stderr
+    rows = []
+    for line in stderr.splitlines():
+        if not line.startswith('import time:') or 'cumulative' in line:
+            continue
+        own, cumulative, module = line[len('import time:'):].split('|')
+        rows.append((int(cumulative), int(own), module.rstrip()))
+    return sorted(rows, reverse=True)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--runs', type=int, default=5, help='interpreters started per factory')
+    parser.add_argument('--profile', choices=sorted(FACTORIES), default='full', help='factory to profile imports of')
+    parser.add_argument('--top', type=int, default=20, help='modules listed in the import profile')
+    args = parser.parse_args()
+
+    for name, factory in FACTORIES.items():
+        runs = [cold_start(factory) for _ in range(args.runs)]
+        imported = statistics.median(run[0] for run in runs) * 1000
+        built = statistics.median(run[1] for run in runs) * 1000
+        print(f"{name:<5} {factory + '()':<16} import {imported:7.1f} ms  build {built:7.1f} ms  "
+              f"total {imported + built:7.1f} ms  (median of {args.runs})")
+
+    print(f"\nslowest imports for {FACTORIES[args.profile]}() (cumulative / self ms)")
+    for cumulative, own, module in import_profile(FACTORIES[args.profile])[:args.top]:
+        print(f"{cumulative / 1000:8.1f} {own / 1000:8.1f}  {module}")
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,69 @@
+"""
+Regression tests for the CSV import (see ``app/services/imports.py``): blank
+cells, both in the ``COPY`` text PostgreSQL reads and on update.
+
+    pytest benchmarks/test_imports.py
+"""
+import io
+
+import pytest
+from sqlalchemy.dialects import postgresql
+
+from app import create_app, db
+from config import Config
+
+
+@pytest.fixture
+def import_app(tmp_path):
+    class ImportConfig(Config):
+        SQLALCHEMY_DATABASE_URI = f"sqlite:///{tmp_path / 'imports.db'}"
+        TESTING = True
+        NPLUSONE_DETECT = False
+        PROFILING_ENABLED = False
+
+    app = create_app(ImportConfig)
+    with app.app_context():
+        db.create_all()
+        yield app
+        db.session.remove()
+        db.engine.dispose()
+
+
+def _import(kind, text):
+    from app.services import imports
+    return imports.import_csv(kind, io.BytesIO(text.encode('utf-8')))
+
+
+def test_copy_writes_blank_cells_as_null(import_app):
+    from app.models import Product
+    from app.services import imports
+    columns = ['name', 'sales_price', 'quantity', 'is_archived']
+    rows = [{'name': 'Chair', 'sales_price': None, 'quantity': None, 'is_archived': False}]
+    text = imports._copy_buffer(Product.__table__, columns, rows, postgresql.dialect()).getvalue()
+    # In COPY's csv format only an unquoted empty field is NULL
+    assert text.splitlines() == ['Chair,,,False']
+
+
+def test_blank_numeric_cell_imports(import_app):
+    from app.models import Product
+    result = _import('products', 'name,sales_price,quantity\nChair,,3\n')
+    assert (result.inserted, result.errors) == (1, [])
+    product = Product.query.filter_by(name='Chair').one()
+    assert product.sales_price is None
+    assert product.quantity == 3
+
+
+def test_blank_cell_keeps_value_on_update(import_app):
+    from app.models import Product
+    _import('products', 'name,sales_price,category\nChair,12.50,Seating\n')
+    result = _import('products', 'name,sales_price,category\nChair,,Office\n')
+    assert (result.updated, result.errors) == (1, [])
+    product = Product.query.filter_by(name='Chair').one()
+    assert product.sales_price == 12.5
+    assert product.category == 'Office'
+
+
+def test_non_utf8_file_is_a_file_error(import_app):
+    from app.services import imports
+    with pytest.raises(imports.ImportFileError):
+        imports.import_csv('products', io.BytesIO('naïve,price\nChair,1\n'.encode('cp1252')))
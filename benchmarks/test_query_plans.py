@@ -0,0 +1,54 @@
+"""
+Index regression test for the hot queries (see ``app/services/query_plans.py``).
+
+Every ``query_plans.run()`` check must use its index, on a schema built the
+two ways a database gets one: ``create_all`` from the models, and the
+migrations (the schema is built with ``create_all``, stamped at head, taken
+back to before the index migration and upgraded again, so the indexes under
+test are the ones the migrations create):
+
+    pytest benchmarks/test_query_plans.py
+"""
+import os
+
+import pytest
+
+from app import create_app, db
+from config import Config
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+# The revision before c41f6a8d2b07, which adds the foreign key and list indexes
+BEFORE_INDEXES = '9d3b7e21c4a8'
+
+
+@pytest.fixture(params=['create_all', 'migrations'])
+def schema_app(request, tmp_path):
+    class PlanConfig(Config):
+        SQLALCHEMY_DATABASE_URI = f"sqlite:///{tmp_path / 'plans.db'}"
+        TESTING = True
+        NPLUSONE_DETECT = False
+        PROFILING_ENABLED = False
+
+    app = create_app(PlanConfig)
+    with app.app_context():
+        from app.services import search
+        db.create_all()
+        search.ensure_indexes()
+        db.session.commit()
+        if request.param == 'migrations':
+            import flask_migrate
+            directory = os.path.join(ROOT, 'migrations')
+            flask_migrate.stamp(directory=directory, revision='head')
+            flask_migrate.downgrade(directory=directory, revision=BEFORE_INDEXES)
+            flask_migrate.upgrade(directory=directory, revision='head')
+        yield app
+        db.session.remove()
+        db.engine.dispose()
+
+
+def test_hot_queries_use_their_indexes(schema_app):
+    from app.services import query_plans
+    results = query_plans.run()
+    assert results
+    failed = [f"{check.name}: expected {check.index}\n{check.plan}" for check in results if not check.ok]
+    assert not failed, '\n\n'.join(failed)
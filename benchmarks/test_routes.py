@@ -0,0 +1,89 @@
+"""
+Hot route benchmarks.
+
+Times the list, detail and search routes of ``app/admin/routes.py`` and
+``app/portal/routes.py`` through the Flask test client on generated data
+(see ``conftest.py``), and records per route the number of SQL statements one
+request runs and the p50/p95/p99 latency in ``extra_info``:
+
+    pip install -r requirements-dev.txt
+    pytest benchmarks/ --benchmark-autosave
+    BENCH_SCALE=10 pytest benchmarks/ --benchmark-compare --benchmark-compare-fail=median:20%
+"""
+import pytest
+
+pytest.importorskip('pytest_benchmark')
+
+# (name, URL with ``ids`` / ``page_links`` fields)
+ADMIN_ROUTES = [
+    ('dashboard', '/admin/dashboard'),
+    ('contacts', '/admin/contacts'),
+    ('contact', '/admin/contact/{contact}'),
+    ('products', '/admin/products'),
+    ('product', '/admin/product/{product}'),
+    ('analytical accounts', '/admin/analytical-accounts'),
+    ('budgets', '/admin/budgets'),
+    ('budget', '/admin/budget/{budget}'),
+    ('purchase orders', '/admin/purchase-orders'),
+    ('purchase orders page 2', '{purchase_orders_page_2}'),
+    ('purchase order', '/admin/purchase-order/{purchase_order}'),
+    ('vendor bills', '/admin/vendor-bills'),
+    ('vendor bill', '/admin/vendor-bill/{vendor_bill}'),
+    ('invoices', '/admin/invoices'),
+    ('invoice', '/admin/invoice/{invoice}'),
+    ('sale orders', '/admin/sale-orders'),
+    ('sale order', '/admin/sale-order/{sale_order}'),
+    ('payments', '/admin/payments'),
+    ('new purchase order form', '/admin/purchase-order/new'),
+    ('product search', '/admin/search/products?q=oak+ch'),
+    ('vendor search', '/admin/search/vendors?q=sha'),
+]
+
+PORTAL_ROUTES = [
+    ('home', '/home'),
+    ('invoices', '/invoices'),
+    ('invoice', '/invoice/{portal_invoice}'),
+    ('orders', '/orders'),
+    ('payments', '/payments'),
+    ('purchase orders', '/purchase-orders'),
+    ('purchase order', '/purchase-order/{portal_purchase_order}'),
+    ('sales orders', '/sales-orders'),
+    ('sale order', '/sale-order/{portal_sale_order}'),
+    ('product search', '/search/products?q=teak'),
+]
+
+QUANTILES = (0.5, 0.95, 0.99)
+
+
+def _quantile(ordered, q):
+    return ordered[min(len(ordered) - 1, max(0, int(round(q * len(ordered))) - 1))]
+
+
+def _run(benchmark, client, url, sql_counter):
+    def fetch():
+        response = client.get(url)
+        assert response.status_code == 200, f"{url} returned {response.status_code}"
+        return response
+
+    # One counted request (also warms the caches the timed ones will hit)
+    fetch()
+    sql_counter.clear()
+    fetch()
+    benchmark.extra_info['sql_statements'] = len(sql_counter)
+
+    benchmark(fetch)
+    timings = sorted(benchmark.stats.stats.data)
+    for q in QUANTILES:
+        benchmark.extra_info[f'p{int(q * 100)}_ms'] = round(_quantile(timings, q) * 1000, 3)
+
+
+@pytest.mark.parametrize('name,url', ADMIN_ROUTES, ids=[name for name, _ in ADMIN_ROUTES])
+def test_admin_route(benchmark, admin_client, ids, page_links, sql_counter, name, url):
+    benchmark.group = 'admin'
+    _run(benchmark, admin_client, url.format(**ids, **page_links), sql_counter)
+
+
+@pytest.mark.parametrize('name,url', PORTAL_ROUTES, ids=[name for name, _ in PORTAL_ROUTES])
+def test_portal_route(benchmark, portal_client, ids, sql_counter, name, url):
+    benchmark.group = 'portal'
+    _run(benchmark, portal_client, url.format(**ids), sql_counter)
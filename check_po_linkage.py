@@ -1,7 +1,7 @@
-from app import create_app, db
+from app import create_db_app, db
 from app.models import PurchaseOrder, Contact, Users
 
-app = create_app()
+app = create_db_app()
 
 with app.app_context():
     print("--- PO Linkage Check (Last 5) ---")
@@ -1,10 +1,26 @@
 # Config file
 import os
-from dotenv import load_dotenv
 from urllib.parse import quote_plus
 
-# Load environment variables from .env file
-load_dotenv()
+
+def _find_dotenv():
+    # Same search as python-dotenv's: this file's directory, then its parents
+    directory = os.path.dirname(os.path.abspath(__file__))
+    while True:
+        path = os.path.join(directory, '.env')
+        if os.path.isfile(path):
+            return path
+        parent = os.path.dirname(directory)
+        if parent == directory:
+            return None
+        directory = parent
+
+
+# Load environment variables from .env file (python-dotenv is only imported when there is one)
+_dotenv_path = _find_dotenv()
+if _dotenv_path:
+    from dotenv import load_dotenv
+    load_dotenv(_dotenv_path)
 
 class Config:
     SECRET_KEY = os.environ.get('SECRET_KEY') or 'you-will-never-guess'
@@ -30,3 +46,54 @@ class Config:
     # Uploads
     UPLOAD_FOLDER = 'app/static/uploads'
     MAX_CONTENT_LENGTH = 16 * 1024 * 1024  # 16MB max size
+    # Thumbnail name -> longest edge in pixels, generated in the background after upload
+    IMAGE_THUMBNAIL_SIZES = {'small': 64, 'medium': 256}
+    
+    # Rows per page on list views (keyset paginated)
+    LIST_PAGE_SIZE = int(os.environ.get('LIST_PAGE_SIZE', 50))
+    
+    # Document numbering: numbers reserved per worker per round-trip to the sequences table
+    SEQUENCE_BLOCK_SIZE = int(os.environ.get('SEQUENCE_BLOCK_SIZE', 1))
+    
+    # Admin dashboard: recompute the cached metrics from scratch when older than this (0 = only via `flask metrics reconcile`)
+    DASHBOARD_RECONCILE_SECONDS = int(os.environ.get('DASHBOARD_RECONCILE_SECONDS', 3600))
+    
+    # Portal home: seconds a user's invoice/bill/order figures are cached (0 disables the cache) and users cached per process
+    PORTAL_STATS_TTL = int(os.environ.get('PORTAL_STATS_TTL', 30))
+    PORTAL_STATS_CACHE_SIZE = int(os.environ.get('PORTAL_STATS_CACHE_SIZE', 1024))
+    
+    # Batch conversion (orders -> bills/invoices): orders converted per transaction
+    CONVERSION_BATCH_SIZE = int(os.environ.get('CONVERSION_BATCH_SIZE', 500))
+    
+    # N+1 query detector: log requests repeating one statement more than NPLUSONE_THRESHOLD times (default: on in debug mode)
+    NPLUSONE_DETECT = os.environ.get('NPLUSONE_DETECT', '').lower() in ('1', 'true', 'yes') if os.environ.get('NPLUSONE_DETECT') else None
+    NPLUSONE_THRESHOLD = int(os.environ.get('NPLUSONE_THRESHOLD', 10))
+    
+    # Signed-in user lookups: cached users per process and seconds before re-reading them (0 disables the cache)
+    USER_CACHE_SIZE = int(os.environ.get('USER_CACHE_SIZE', 1024))
+    USER_CACHE_TTL = int(os.environ.get('USER_CACHE_TTL', 60))
+    
+    # Password hashing: Werkzeug method string (existing hashes are upgraded at next login),
+    # verification pool type (thread/process) and size (0 = verify inline)
+    PASSWORD_HASH_METHOD = os.environ.get('PASSWORD_HASH_METHOD', 'scrypt:32768:8:1')
+    PASSWORD_HASH_POOL = os.environ.get('PASSWORD_HASH_POOL', 'thread')
+    PASSWORD_HASH_WORKERS = int(os.environ.get('PASSWORD_HASH_WORKERS', os.cpu_count() or 1))
+    
+    # Exports: documents read per server-side cursor batch
+    EXPORT_BATCH_SIZE = int(os.environ.get('EXPORT_BATCH_SIZE', 1000))
+    
+    # Bulk import: CSV rows validated and written per batch (one commit each)
+    IMPORT_BATCH_SIZE = int(os.environ.get('IMPORT_BATCH_SIZE', 5000))
+    
+    # Request profiling (off by default): fraction of requests measured, samples kept per endpoint,
+    # peak allocation via tracemalloc (slows every allocation while on) and the bearer token for /admin/_perf/metrics
+    PROFILING_ENABLED = os.environ.get('PROFILING_ENABLED', '').lower() in ('1', 'true', 'yes')
+    PROFILING_SAMPLE_RATE = float(os.environ.get('PROFILING_SAMPLE_RATE', 0.01))
+    PROFILING_WINDOW = int(os.environ.get('PROFILING_WINDOW', 1000))
+    PROFILING_TRACE_MEMORY = os.environ.get('PROFILING_TRACE_MEMORY', '').lower() in ('1', 'true', 'yes')
+    PROFILING_METRICS_TOKEN = os.environ.get('PROFILING_METRICS_TOKEN')
+
+    # Read-only JSON API (/api/<resource>): default and maximum ?limit=, and the bearer token for integrations
+    API_PAGE_SIZE = int(os.environ.get('API_PAGE_SIZE', 1000))
+    API_MAX_PAGE_SIZE = int(os.environ.get('API_MAX_PAGE_SIZE', 10000))
+    API_TOKEN = os.environ.get('API_TOKEN')
@@ -1,8 +1,8 @@
-from app import create_app, db
+from app import create_db_app, db
 from app.models import Users, Contact, PurchaseOrder
 
 def inspect():
-    app = create_app()
+    app = create_db_app()
     with app.app_context():
         print("--- DEBUG DB ---")
         
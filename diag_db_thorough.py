@@ -5,9 +5,9 @@ from sqlalchemy import create_engine, inspect, text
 # Add current directory to path so we can import app
 sys.path.append(os.getcwd())
 
-from app import create_app, db
+from app import create_db_app, db
 
-app = create_app()
+app = create_db_app()
 with app.app_context():
     engine = db.engine
     inspector = inspect(engine)
@@ -2,11 +2,11 @@
 Database initialization script
 Creates all tables and optionally seeds with sample data
 """
-from app import create_app, db
+from app import create_db_app, db
 from app.models import Contact, Product, AnalyticalAccount, Budget, Users, PurchaseOrder
 
 def init_database():
-    app = create_app()
+    app = create_db_app()
     
     with app.app_context():
         print("Creating database tables...")
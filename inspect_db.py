@@ -1,8 +1,8 @@
 import os
 from sqlalchemy import inspect
-from app import create_app, db
+from app import create_db_app, db
 
-app = create_app()
+app = create_db_app()
 with app.app_context():
     engine = db.engine
     inspector = inspect(engine)
@@ -0,0 +1,51 @@
+"""Add payments ledger
+
+Revision ID: 2ae1b45d00b5
+Revises: ff32e09a1952
+Create Date: 2026-10-18 10:03:17.540912
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '2ae1b45d00b5'
+down_revision = 'ff32e09a1952'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_table('payments',
+    sa.Column('id', sa.Integer(), nullable=False),
+    sa.Column('payment_number', sa.String(length=50), nullable=False),
+    sa.Column('payment_type', sa.String(length=20), nullable=False),
+    sa.Column('partner_id', sa.Integer(), nullable=True),
+    sa.Column('partner_name', sa.String(length=128), nullable=True),
+    sa.Column('bill_id', sa.Integer(), nullable=True),
+    sa.Column('invoice_id', sa.Integer(), nullable=True),
+    sa.Column('amount', sa.Float(), nullable=False),
+    sa.Column('payment_date', sa.Date(), nullable=False),
+    sa.Column('payment_method', sa.String(length=20), nullable=True),
+    sa.Column('memo', sa.Text(), nullable=True),
+    sa.Column('status', sa.String(length=20), nullable=True),
+    sa.Column('created_at', sa.DateTime(), nullable=True),
+    sa.ForeignKeyConstraint(['bill_id'], ['vendor_bills.id'], ),
+    sa.ForeignKeyConstraint(['invoice_id'], ['invoices.id'], ),
+    sa.ForeignKeyConstraint(['partner_id'], ['users.id'], ),
+    sa.PrimaryKeyConstraint('id')
+    )
+    with op.batch_alter_table('payments', schema=None) as batch_op:
+        batch_op.create_index(batch_op.f('ix_payments_payment_number'), ['payment_number'], unique=False)
+        batch_op.create_index(batch_op.f('ix_payments_bill_id'), ['bill_id'], unique=False)
+        batch_op.create_index(batch_op.f('ix_payments_invoice_id'), ['invoice_id'], unique=False)
+
+
+def downgrade():
+    with op.batch_alter_table('payments', schema=None) as batch_op:
+        batch_op.drop_index(batch_op.f('ix_payments_invoice_id'))
+        batch_op.drop_index(batch_op.f('ix_payments_bill_id'))
+        batch_op.drop_index(batch_op.f('ix_payments_payment_number'))
+
+    op.drop_table('payments')
@@ -0,0 +1,30 @@
+"""Add dashboard_metrics table
+
+Revision ID: 3f8a61c0d2e4
+Revises: 7c4d2e9a6b13
+Create Date: 2026-10-18 11:32:07.514382
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '3f8a61c0d2e4'
+down_revision = '7c4d2e9a6b13'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    # Rows are filled by the first reconciliation (dashboard visit or `flask metrics reconcile`)
+    op.create_table('dashboard_metrics',
+    sa.Column('name', sa.String(length=64), nullable=False),
+    sa.Column('value', sa.Float(), nullable=False),
+    sa.Column('reconciled_at', sa.DateTime(), nullable=True),
+    sa.PrimaryKeyConstraint('name')
+    )
+
+
+def downgrade():
+    op.drop_table('dashboard_metrics')
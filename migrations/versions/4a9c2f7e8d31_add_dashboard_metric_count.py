@@ -0,0 +1,30 @@
+"""Keep dashboard count metrics in their own integer column
+
+Revision ID: 4a9c2f7e8d31
+Revises: e7a25c9f13b4
+Create Date: 2026-10-19 09:14:52.318047
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '4a9c2f7e8d31'
+down_revision = 'e7a25c9f13b4'
+branch_labels = None
+depends_on = None
+
+COUNT_METRICS = "('portal_drafts_count', 'sales_drafts_count', 'total_po_count')"
+
+
+def upgrade():
+    op.add_column('dashboard_metrics', sa.Column('count', sa.BigInteger(), nullable=False, server_default='0'))
+    # Counts were stored as money, i.e. a count of 7 as 700 cents
+    op.execute(f"UPDATE dashboard_metrics SET count = ROUND(value / 100.0), value = 0 WHERE name IN {COUNT_METRICS}")
+
+
+def downgrade():
+    op.execute(f"UPDATE dashboard_metrics SET value = count * 100 WHERE name IN {COUNT_METRICS}")
+    with op.batch_alter_table('dashboard_metrics') as batch_op:
+        batch_op.drop_column('count')
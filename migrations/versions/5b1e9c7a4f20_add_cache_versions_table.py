@@ -0,0 +1,32 @@
+"""Add cache_versions table for reference data caching
+
+Revision ID: 5b1e9c7a4f20
+Revises: 3f8a61c0d2e4
+Create Date: 2026-10-18 14:05:41.873209
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '5b1e9c7a4f20'
+down_revision = '3f8a61c0d2e4'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    cache_versions = op.create_table('cache_versions',
+    sa.Column('name', sa.String(length=64), nullable=False),
+    sa.Column('version', sa.BigInteger(), nullable=False),
+    sa.PrimaryKeyConstraint('name')
+    )
+    op.bulk_insert(cache_versions, [
+        {'name': name, 'version': 0}
+        for name in ('contacts', 'products', 'analytical_accounts', 'portal_users')
+    ])
+
+
+def downgrade():
+    op.drop_table('cache_versions')
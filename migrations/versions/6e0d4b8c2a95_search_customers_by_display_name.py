@@ -0,0 +1,50 @@
+"""Index portal users for typeahead by coalesce(name, username)
+
+Revision ID: 6e0d4b8c2a95
+Revises: 4a9c2f7e8d31
+Create Date: 2026-10-19 10:02:36.915448
+
+"""
+from alembic import op
+
+
+# revision identifiers, used by Alembic.
+revision = '6e0d4b8c2a95'
+down_revision = '4a9c2f7e8d31'
+branch_labels = None
+depends_on = None
+
+
+def _sqlite_triggers(text):
+    new, old = text.format(row='new.'), text.format(row='old.')
+    columns = 'name, username' if 'username' in text else 'name'
+    for suffix in ('ai', 'ad', 'au'):
+        op.execute(f'DROP TRIGGER IF EXISTS users_fts_{suffix}')
+    op.execute("CREATE TRIGGER users_fts_ai AFTER INSERT ON users BEGIN "
+               f"INSERT INTO users_fts(rowid, name) VALUES (new.id, {new}); END")
+    op.execute("CREATE TRIGGER users_fts_ad AFTER DELETE ON users BEGIN "
+               f"INSERT INTO users_fts(users_fts, rowid, name) VALUES ('delete', old.id, {old}); END")
+    op.execute(f"CREATE TRIGGER users_fts_au AFTER UPDATE OF {columns} ON users BEGIN "
+               f"INSERT INTO users_fts(users_fts, rowid, name) VALUES ('delete', old.id, {old}); "
+               f"INSERT INTO users_fts(rowid, name) VALUES (new.id, {new}); END")
+    op.execute("INSERT INTO users_fts(users_fts) VALUES ('delete-all')")
+    op.execute(f"INSERT INTO users_fts(rowid, name) SELECT id, {text.format(row='')} FROM users")
+
+
+def upgrade():
+    dialect = op.get_bind().dialect.name
+    if dialect == 'postgresql':
+        op.execute('DROP INDEX IF EXISTS ix_users_name_trgm')
+        op.execute('CREATE INDEX IF NOT EXISTS ix_users_display_name_trgm ON users '
+                   'USING gin ((coalesce(name, username)) gin_trgm_ops)')
+    elif dialect == 'sqlite':
+        _sqlite_triggers('coalesce({row}name, {row}username)')
+
+
+def downgrade():
+    dialect = op.get_bind().dialect.name
+    if dialect == 'postgresql':
+        op.execute('DROP INDEX IF EXISTS ix_users_display_name_trgm')
+        op.execute('CREATE INDEX IF NOT EXISTS ix_users_name_trgm ON users USING gin (name gin_trgm_ops)')
+    elif dialect == 'sqlite':
+        _sqlite_triggers('{row}name')
@@ -0,0 +1,29 @@
+"""Add sequences table for document numbering
+
+Revision ID: 7c4d2e9a6b13
+Revises: 2ae1b45d00b5
+Create Date: 2026-10-18 10:41:52.207731
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '7c4d2e9a6b13'
+down_revision = '2ae1b45d00b5'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    # Counters are seeded lazily from existing document numbers on first use
+    op.create_table('sequences',
+    sa.Column('name', sa.String(length=64), nullable=False),
+    sa.Column('next_value', sa.BigInteger(), nullable=False),
+    sa.PrimaryKeyConstraint('name')
+    )
+
+
+def downgrade():
+    op.drop_table('sequences')
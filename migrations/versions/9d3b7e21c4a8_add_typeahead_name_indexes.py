@@ -0,0 +1,53 @@
+"""Add typeahead name indexes (pg_trgm on PostgreSQL, FTS5 on SQLite)
+
+Revision ID: 9d3b7e21c4a8
+Revises: 5b1e9c7a4f20
+Create Date: 2026-10-18 15:12:07.402561
+
+"""
+from alembic import op
+
+
+# revision identifiers, used by Alembic.
+revision = '9d3b7e21c4a8'
+down_revision = '5b1e9c7a4f20'
+branch_labels = None
+depends_on = None
+
+TABLES = ('products', 'contacts', 'users')
+
+
+def upgrade():
+    dialect = op.get_bind().dialect.name
+    if dialect == 'postgresql':
+        op.execute('CREATE EXTENSION IF NOT EXISTS pg_trgm')
+        for table in TABLES:
+            op.execute(f'CREATE INDEX IF NOT EXISTS ix_{table}_name_trgm ON {table} USING gin (name gin_trgm_ops)')
+    elif dialect == 'sqlite':
+        # External-content tables: the index stores no copy of the names
+        for table in TABLES:
+            fts = f'{table}_fts'
+            op.execute(f"CREATE VIRTUAL TABLE IF NOT EXISTS {fts} USING fts5("
+                       f"name, content='{table}', content_rowid='id', prefix='2 3', "
+                       f"tokenize='unicode61 remove_diacritics 2')")
+            op.execute(f"CREATE TRIGGER IF NOT EXISTS {fts}_ai AFTER INSERT ON {table} BEGIN "
+                       f"INSERT INTO {fts}(rowid, name) VALUES (new.id, new.name); END")
+            op.execute(f"CREATE TRIGGER IF NOT EXISTS {fts}_ad AFTER DELETE ON {table} BEGIN "
+                       f"INSERT INTO {fts}({fts}, rowid, name) VALUES ('delete', old.id, old.name); END")
+            op.execute(f"CREATE TRIGGER IF NOT EXISTS {fts}_au AFTER UPDATE OF name ON {table} BEGIN "
+                       f"INSERT INTO {fts}({fts}, rowid, name) VALUES ('delete', old.id, old.name); "
+                       f"INSERT INTO {fts}(rowid, name) VALUES (new.id, new.name); END")
+            op.execute(f"INSERT INTO {fts}({fts}) VALUES ('rebuild')")
+
+
+def downgrade():
+    dialect = op.get_bind().dialect.name
+    if dialect == 'postgresql':
+        for table in TABLES:
+            op.execute(f'DROP INDEX IF EXISTS ix_{table}_name_trgm')
+    elif dialect == 'sqlite':
+        for table in TABLES:
+            fts = f'{table}_fts'
+            for suffix in ('ai', 'ad', 'au'):
+                op.execute(f'DROP TRIGGER IF EXISTS {fts}_{suffix}')
+            op.execute(f'DROP TABLE IF EXISTS {fts}')
@@ -0,0 +1,62 @@
+"""Add indexes on line foreign keys and the list/portal filter columns
+
+Revision ID: c41f6a8d2b07
+Revises: 9d3b7e21c4a8
+Create Date: 2026-10-18 16:03:29.518734
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'c41f6a8d2b07'
+down_revision = '9d3b7e21c4a8'
+branch_labels = None
+depends_on = None
+
+# name, table, columns
+PLAIN = [
+    ('ix_purchase_order_lines_po_id', 'purchase_order_lines', ['po_id']),
+    ('ix_vendor_bill_lines_bill_id', 'vendor_bill_lines', ['bill_id']),
+    ('ix_invoice_lines_invoice_id', 'invoice_lines', ['invoice_id']),
+    ('ix_sale_order_lines_so_id', 'sale_order_lines', ['so_id']),
+    ('ix_vendor_bills_po_id', 'vendor_bills', ['po_id']),
+    ('ix_contacts_name', 'contacts', ['name']),
+    ('ix_purchase_orders_status', 'purchase_orders', ['status']),
+    ('ix_invoices_status', 'invoices', ['status']),
+    ('ix_sale_orders_status', 'sale_orders', ['status']),
+]
+
+# name, table, leading columns, date column the list is ordered by (newest first)
+ACTIVE = [
+    ('ix_purchase_orders_active_list', 'purchase_orders', [], 'order_date'),
+    ('ix_purchase_orders_user_status', 'purchase_orders', ['user_id', 'status'], 'order_date'),
+    ('ix_purchase_orders_vendor_status', 'purchase_orders', ['vendor_id', 'status'], 'order_date'),
+    ('ix_vendor_bills_active_list', 'vendor_bills', [], 'bill_date'),
+    ('ix_vendor_bills_vendor_payment_status', 'vendor_bills', ['vendor_id', 'payment_status'], None),
+    ('ix_invoices_customer_list', 'invoices', ['customer_id'], 'invoice_date'),
+    ('ix_sale_orders_active_list', 'sale_orders', [], 'order_date'),
+    ('ix_sale_orders_customer_list', 'sale_orders', ['customer_id'], 'order_date'),
+]
+
+
+def upgrade():
+    for name, table, columns in PLAIN:
+        op.create_index(name, table, columns, unique=False)
+    for name, table, columns, newest_first in ACTIVE:
+        ops = {}
+        if newest_first:
+            columns = columns + [newest_first, 'id']
+            ops = {newest_first: 'DESC NULLS LAST', 'id': 'DESC'}
+        op.create_index(name, table, columns, unique=False,
+                        postgresql_ops=ops,
+                        postgresql_where=sa.text('is_archived = false'),
+                        sqlite_where=sa.text('is_archived = 0'))
+
+
+def downgrade():
+    for name, table, *_ in reversed(ACTIVE):
+        op.drop_index(name, table_name=table)
+    for name, table, _ in reversed(PLAIN):
+        op.drop_index(name, table_name=table)
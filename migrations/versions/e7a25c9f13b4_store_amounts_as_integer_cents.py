@@ -0,0 +1,61 @@
+"""Store money amounts as BIGINT cents
+
+Revision ID: e7a25c9f13b4
+Revises: c41f6a8d2b07
+Create Date: 2026-10-18 16:48:12.660381
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'e7a25c9f13b4'
+down_revision = 'c41f6a8d2b07'
+branch_labels = None
+depends_on = None
+
+MONEY_COLUMNS = {
+    'products': ['sales_price', 'purchase_price', 'price', 'cost'],
+    'budgets': ['total_amount'],
+    'purchase_orders': ['total_amount'],
+    'purchase_order_lines': ['unit_price', 'total'],
+    'vendor_bills': ['total_amount', 'amount_paid'],
+    'vendor_bill_lines': ['unit_price', 'total'],
+    'invoices': ['subtotal', 'tax_amount', 'total_amount', 'paid_amount', 'balance_due'],
+    'invoice_lines': ['unit_price', 'tax_amount', 'total'],
+    'sale_orders': ['total_amount'],
+    'sale_order_lines': ['unit_price', 'total'],
+    'payments': ['amount'],
+    'dashboard_metrics': ['value'],
+}
+
+
+def upgrade():
+    if op.get_bind().dialect.name == 'postgresql':
+        for table, columns in MONEY_COLUMNS.items():
+            for column in columns:
+                # Via numeric so e.g. 0.285 rounds to 29 cents, not to the 28.4999... of the double
+                op.alter_column(table, column, type_=sa.BigInteger(), existing_type=sa.Float(),
+                                postgresql_using=f'round({column}::numeric * 100)::bigint')
+        return
+
+    # SQLite: rescale in place. The columns keep their REAL affinity (whole
+    # cents, exact below 2**53); rebuilding the tables to change the declared
+    # type would drop the typeahead FTS triggers on products and the DESC
+    # order of the partial list indexes
+    for table, columns in MONEY_COLUMNS.items():
+        op.execute(f"UPDATE {table} SET " + ', '.join(
+            f'{column} = CAST(ROUND({column} * 100) AS INTEGER)' for column in columns))
+
+
+def downgrade():
+    if op.get_bind().dialect.name == 'postgresql':
+        for table, columns in MONEY_COLUMNS.items():
+            for column in columns:
+                op.alter_column(table, column, type_=sa.Float(), existing_type=sa.BigInteger(),
+                                postgresql_using=f'{column} / 100.0')
+        return
+
+    for table, columns in MONEY_COLUMNS.items():
+        op.execute(f"UPDATE {table} SET " + ', '.join(f'{column} = {column} / 100.0' for column in columns))
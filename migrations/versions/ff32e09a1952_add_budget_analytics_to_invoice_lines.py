@@ -0,0 +1,26 @@
+"""Add budget_analytics to invoice lines
+
+Revision ID: ff32e09a1952
+Revises: 1124368513f0, cb1e8d33fb45
+Create Date: 2026-10-18 09:12:41.118204
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'ff32e09a1952'
+down_revision = ('1124368513f0', 'cb1e8d33fb45')
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    with op.batch_alter_table('invoice_lines', schema=None) as batch_op:
+        batch_op.add_column(sa.Column('budget_analytics', sa.String(length=128), nullable=True))
+
+
+def downgrade():
+    with op.batch_alter_table('invoice_lines', schema=None) as batch_op:
+        batch_op.drop_column('budget_analytics')